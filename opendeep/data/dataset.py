@@ -2,12 +2,12 @@
 Generic structure for a dataset. This defines iterable objects (streams) for data and labels to use
 with any given subsets of the dataset.
 
-.. todo:: Add large dataset support with database connections, numpy.memmap, h5py, pytables
+.. todo:: Add large dataset support with database connections, pytables
     (and in the future grabbing from pipelines like spark)
 
 .. todo:: Add methods for cleaning data, like normalizing to mean0 std1, or scaling to [min,max].
 """
-# TODO: add large dataset support with database connections, numpy.memmap, h5py, pytables
+# TODO: add large dataset support with database connections, pytables
 # TODO: (and in the future grabbing from pipelines like spark)
 # TODO: Add methods for cleaning data, like normalizing to mean0 std1, or scaling to [min,max].
 
@@ -36,10 +36,18 @@ class Dataset(object):
         The input iterable to use as data to the model for testing.
     test_targets : iterable or None
         The target iterable (labels) to use as labels to the model for testing.
+    inputs_dtype : str or list(str) or None
+        The compact dtype the inputs are stored in (like uint8 for images), if they should be passed to the model's
+        compiled functions as-is and decoded inside the graph (see :func:`opendeep.utils.constructors.compact_inputs`).
+    inputs_scale : float or list(float) or None
+        The factor to multiply the stored inputs by when decoding them.
+    inputs_offset : float or list(float) or None
+        The amount to add to the scaled inputs when decoding them.
     """
     def __init__(self, train_inputs, train_targets=None,
                  valid_inputs=None, valid_targets=None,
-                 test_inputs=None, test_targets=None):
+                 test_inputs=None, test_targets=None,
+                 inputs_dtype=None, inputs_scale=None, inputs_offset=None):
         """
         Initialize a Dataset object that holds training, validation, and testing iterables for data
         and targets.
@@ -58,6 +66,15 @@ class Dataset(object):
             The input iterable to use as data to the model for testing.
         test_targets : iterable, optional
             The target iterable (labels) to use as labels to the model for testing.
+        inputs_dtype : str or list(str), optional
+            The compact storage dtype of the inputs (or a list with one for each input). If given, the Optimizer
+            compiles its functions to take the stored inputs and decode them in the graph as
+            ``cast(inputs) * inputs_scale + inputs_offset``, so minibatches are copied in the compact dtype. The
+            Model's `run` then takes inputs in either the compact or the regular dtype.
+        inputs_scale : float or list(float), optional
+            The factor to multiply the stored inputs by when decoding them (like 1/255. for uint8 pixels).
+        inputs_offset : float or list(float), optional
+            The amount to add to the scaled inputs when decoding them.
         """
         self.train_inputs = _check_type(train_inputs, "train_inputs")
         self.train_targets = _check_type(train_targets, "train_targets")
@@ -68,6 +85,10 @@ class Dataset(object):
         self.test_inputs = _check_type(test_inputs, "test_inputs")
         self.test_targets = _check_type(test_targets, "test_targets")
 
+        self.inputs_dtype = inputs_dtype
+        self.inputs_scale = inputs_scale
+        self.inputs_offset = inputs_offset
+
 def _check_type(iterable, name="Unknown"):
     """
     Helper method that checks the input to see if it is iterable as well as not a generator.
@@ -30,7 +30,7 @@ class FileDataset(Dataset):
         :mod:`opendeep.utils.file_ops` module.
     """
     def __init__(self, path, source=None, train_filter=None, valid_filter=None, test_filter=None,
-                 inputs_preprocess=None, targets_preprocess=None):
+                 inputs_preprocess=None, targets_preprocess=None, processes=None):
         """
         Creates a new :class:`FileDataset` from the path. It installs the file from the source
         if it isn't found in the path, and determines the filetype and full path location to the file.
@@ -63,6 +63,9 @@ class FileDataset(Dataset):
             the files in `path`, and if it creates a list of elements, each element will be yielded as the target
             label data separately. For example, the function could be ``lambda line: (line.split(',')[1]).lower()``
             to grab a label after a comma on each line and lowercase it.
+        processes : int, optional
+            The number of worker processes to use when reading and preprocessing the files (see
+            :class:`opendeep.data.stream.FileStream`). If None, files are processed in the main process.
         """
         try:
             self.path = os.path.realpath(path)
@@ -78,6 +81,7 @@ class FileDataset(Dataset):
         # preprocess functions
         self.inputs_preprocess = inputs_preprocess
         self.targets_preprocess = targets_preprocess
+        self.processes = processes
 
         # deal with tuples of filters
         train_inputs_filter, train_targets_filter = self._get_filters(train_filter)
@@ -127,9 +131,9 @@ class FileDataset(Dataset):
 
         # inputs filestream
         if inputs_filter is not None or is_train:
-            inputs = FileStream(self.path, inputs_filter, self.inputs_preprocess)
+            inputs = FileStream(self.path, inputs_filter, self.inputs_preprocess, processes=self.processes)
         # targets filestream
         if targets_filter is not None or (is_train and self.targets_preprocess is not None):
-            targets = FileStream(self.path, targets_filter, self.targets_preprocess)
+            targets = FileStream(self.path, targets_filter, self.targets_preprocess, processes=self.processes)
 
         return inputs, targets
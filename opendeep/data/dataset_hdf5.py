@@ -0,0 +1,207 @@
+"""
+Generic structure for a dataset reading lazily from an HDF5 file (through h5py).
+"""
+# standard libraries
+import logging
+import os
+# third party libraries
+import numpy
+from theano.compat.python2x import OrderedDict
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+# internal imports
+from opendeep.data.dataset import Dataset
+
+log = logging.getLogger(__name__)
+
+# number of bytes to read at a time from an HDF5 dataset that isn't chunked.
+_DEFAULT_READ_BYTES = 1 << 20
+
+
+class HDF5Dataset(Dataset):
+    """
+    Dataset object wrapper for an HDF5 file with train, valid, and test groups. Each group holds an inputs
+    and (optionally) a targets dataset. Nothing is read until minibatches are sliced - each subset is wrapped in an
+    :class:`HDF5Array` that reads whole chunks of the file at a time and keeps a small cache of them.
+
+    For the fastest reads, use a `batch_size` that is a multiple of the files' chunk size along the first
+    dimension (see the `chunk_rows` attribute of the subsets).
+    """
+    def __init__(self, path, train_group='train', valid_group='valid', test_group='test',
+                 inputs_key='inputs', targets_key='targets', cache_chunks=4):
+        """
+        Initialize training, validation, and testing data from the groups of an HDF5 file.
+
+        Parameters
+        ----------
+        path : str
+            The path to the HDF5 file.
+        train_group : str
+            The name of the group in the file containing the training data.
+        valid_group : str, optional
+            The name of the group in the file containing the validation data (if it exists).
+        test_group : str, optional
+            The name of the group in the file containing the testing data (if it exists).
+        inputs_key : str, optional
+            The name of the input dataset within each group.
+        targets_key : str, optional
+            The name of the target dataset within each group (if it exists).
+        cache_chunks : int, optional
+            The number of decompressed chunks to keep in the cache for each subset.
+        """
+        if not HAS_H5PY:
+            raise NotImplementedError("You need the h5py Python package to use HDF5Dataset.")
+        self.path = os.path.realpath(path)
+        log.info('Wrapping dataset from HDF5 file %s', self.path)
+        self.file = h5py.File(self.path, 'r')
+
+        train_inputs, train_targets = self._get_group(train_group, inputs_key, targets_key, cache_chunks)
+        assert train_inputs is not None, "Couldn't find %s/%s in HDF5 file %s" % (train_group, inputs_key, self.path)
+        valid_inputs, valid_targets = self._get_group(valid_group, inputs_key, targets_key, cache_chunks)
+        test_inputs, test_targets = self._get_group(test_group, inputs_key, targets_key, cache_chunks)
+
+        super(HDF5Dataset, self).__init__(train_inputs, train_targets,
+                                          valid_inputs, valid_targets,
+                                          test_inputs, test_targets)
+
+    def _get_group(self, group, inputs_key, targets_key, cache_chunks):
+        """
+        Helper method to return the (inputs, targets) HDF5Arrays for a group in the file, or None if they don't exist.
+        """
+        inputs, targets = None, None
+        if group is not None and group in self.file:
+            group = self.file[group]
+            if inputs_key in group:
+                inputs = HDF5Array(group[inputs_key], cache_chunks)
+            if targets_key is not None and targets_key in group:
+                targets = HDF5Array(group[targets_key], cache_chunks)
+        return inputs, targets
+
+    def close(self):
+        """
+        Closes the underlying HDF5 file.
+        """
+        self.file.close()
+
+
+class HDF5Array(object):
+    """
+    An array-like wrapper around an h5py dataset that reads along the first dimension in whole chunks.
+
+    A slice is served with one contiguous read covering the chunks it overlaps, and the most recently used
+    chunks are kept (decompressed) in a least-recently-used cache so neighboring minibatches don't read
+    the same chunk twice.
+
+    Parameters
+    ----------
+    dataset : h5py.Dataset
+        The HDF5 dataset to wrap.
+    cache_chunks : int, optional
+        The number of chunks to keep in the cache.
+    """
+    def __init__(self, dataset, cache_chunks=4):
+        self.dataset = dataset
+        self.shape = dataset.shape
+        self.dtype = dataset.dtype
+        self.ndim = len(self.shape)
+        if dataset.chunks is not None:
+            self.chunk_rows = dataset.chunks[0]
+        else:
+            row_bytes = max(1, int(numpy.prod(self.shape[1:])) * self.dtype.itemsize)
+            self.chunk_rows = max(1, _DEFAULT_READ_BYTES // row_bytes)
+        self.cache_chunks = max(1, cache_chunks)
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), self.chunk_rows):
+            for row in self[start:start + self.chunk_rows]:
+                yield row
+
+    def __array__(self, dtype=None):
+        return numpy.asarray(self.dataset[...], dtype=dtype)
+
+    def __getitem__(self, key):
+        # split off the first dimension's key from the rest
+        if isinstance(key, tuple):
+            key, rest = key[0], key[1:]
+        else:
+            rest = ()
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                data = self._read_rows(start, stop)
+            else:
+                data = self._gather(numpy.arange(start, stop, step))
+        elif isinstance(key, (int, numpy.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("Index %d is out of bounds for HDF5Array with length %d" % (key, len(self)))
+            data = self._read_rows(key, key + 1)[0]
+        else:
+            data = self._gather(numpy.asarray(key))
+
+        if rest:
+            # the first dimension has been resolved (or dropped for an integer key) already.
+            data = data[(slice(None),) + rest] if data.ndim == self.ndim else data[rest]
+        return data
+
+    def _read_rows(self, start, stop):
+        """
+        Returns the rows [start, stop) - reading the overlapping chunks that aren't in the cache in one call.
+        """
+        if stop <= start:
+            return numpy.empty((0,) + tuple(self.shape[1:]), dtype=self.dtype)
+        first, last = start // self.chunk_rows, (stop - 1) // self.chunk_rows
+        chunks = {}
+        missing = []
+        for c in range(first, last + 1):
+            if c in self._cache:
+                chunks[c] = self._get_from_cache(c)
+            else:
+                missing.append(c)
+        if missing:
+            # one contiguous read covering all the missing chunks
+            read_start = missing[0] * self.chunk_rows
+            read_stop = min((missing[-1] + 1) * self.chunk_rows, len(self))
+            block = self.dataset[read_start:read_stop]
+            for c in range(missing[0], missing[-1] + 1):
+                offset = c * self.chunk_rows - read_start
+                chunks[c] = block[offset:offset + self.chunk_rows]
+                self._add_to_cache(c, chunks[c])
+        chunks = [chunks[c] for c in range(first, last + 1)]
+        data = chunks[0] if len(chunks) == 1 else numpy.concatenate(chunks)
+        offset = first * self.chunk_rows
+        return data[start - offset:stop - offset]
+
+    def _gather(self, indices):
+        """
+        Returns the rows for an array of indices (grouped by chunk so each chunk is only read once).
+        """
+        indices = numpy.where(indices < 0, indices + len(self), indices)
+        data = numpy.empty((len(indices),) + tuple(self.shape[1:]), dtype=self.dtype)
+        chunk_ids = indices // self.chunk_rows
+        for c in numpy.unique(chunk_ids):
+            where = numpy.nonzero(chunk_ids == c)[0]
+            chunk_start = c * self.chunk_rows
+            chunk = self._read_rows(chunk_start, min(chunk_start + self.chunk_rows, len(self)))
+            data[where] = chunk[indices[where] - chunk_start]
+        return data
+
+    def _add_to_cache(self, chunk_id, chunk):
+        self._cache[chunk_id] = chunk
+        while len(self._cache) > self.cache_chunks:
+            self._cache.popitem(last=False)
+
+    def _get_from_cache(self, chunk_id):
+        # re-insert to mark it as the most recently used chunk.
+        chunk = self._cache.pop(chunk_id)
+        self._cache[chunk_id] = chunk
+        return chunk
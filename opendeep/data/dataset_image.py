@@ -4,9 +4,17 @@ Generic structure for a dataset reading from a file or directory.
 # standard libraries
 import logging
 import os
+import functools
+# third party libraries
+import numpy
+try:
+    from PIL import Image
+    has_pil = True
+except ImportError:
+    has_pil = False
 # internal imports
 from opendeep.data.dataset import Dataset
-from opendeep.data.stream.filestream import ImageStream
+from opendeep.data.stream.filestream import ImageStream, parallel_map
 import opendeep.utils.file_ops as files
 
 log = logging.getLogger(__name__)
@@ -27,9 +35,13 @@ class ImageDataset(Dataset):
     file_type : int
         The integer representing the type of file for this dataset. The file_type integer is assigned by the
         :mod:`opendeep.utils.file_ops` module.
+    train_index, valid_index, test_index : numpy.ndarray
+        With an `image_shape`, the structured array of (file, label) for each image in the subset's cache,
+        in the same order as the images.
     """
     def __init__(self, path, source=None, train_filter=None, valid_filter=None, test_filter=None,
-                 inputs_preprocess=None, targets_preprocess=None):
+                 inputs_preprocess=None, targets_preprocess=None, processes=None, chunksize=1,
+                 image_shape=None, crop=True, mode='RGB', layout='bc01', labels=None, cache_dir=None):
         """
         Creates a new FileDataset from the path. It installs the file from the source
         if it isn't found in the path, and determines the filetype and full path location to the file.
@@ -52,6 +64,32 @@ class ImageDataset(Dataset):
         targets_preprocess : function, optional
             A function to apply to the image returned from files found in the path. If a list is returned from
             the preprocess function, each element will be yielded separately during iteration.
+        processes : int, optional
+            The number of worker processes to use when decoding and preprocessing the images (see
+            :class:`opendeep.data.stream.ImageStream`). If None, images are decoded in the main process.
+        chunksize : int, optional
+            The number of image files to send to a worker process at a time.
+        image_shape : tuple(int), optional
+            The (height, width) to resize every image to. If given, each subset is decoded once (in parallel
+            across the `processes`) into a fixed-shape uint8 cache in `cache_dir`, and the subsets become
+            read-only `numpy.memmap` arrays of the cached pixels instead of streams that decode every file on
+            each pass. The pixels are passed to the model as uint8 (see `inputs_dtype` of
+            :class:`opendeep.data.Dataset`). The preprocess functions can't be used with the cache - use `labels`
+            for the targets.
+        crop : bool, optional
+            With an `image_shape`, whether to keep the aspect ratio by scaling the shorter side to fit and cropping
+            the center of the longer side. If False, images are stretched to the `image_shape`.
+        mode : str, optional
+            With an `image_shape`, the PIL mode to convert the images to (like 'RGB' or 'L' for grayscale), which
+            determines the number of channels.
+        layout : str, optional
+            With an `image_shape`, the axes of the cached images: 'bc01' for (images, channels, height, width)
+            or 'b01c' for (images, height, width, channels).
+        labels : function, optional
+            With an `image_shape`, a function from the file name to the integer label of the image. The labels
+            are saved in the index with the file names and become the subsets' targets.
+        cache_dir : str, optional
+            The directory for the decoded image cache. Defaults to an ``_images`` directory next to the `path`.
         """
         try:
             self.path = os.path.realpath(path)
@@ -64,24 +102,172 @@ class ImageDataset(Dataset):
         # install the dataset from source! (makes sure file is there and returns the type so you know how to read it)
         self.file_type = files.install(self.path, self.source)
 
+        if image_shape is not None:
+            if not has_pil:
+                raise NotImplementedError("You need the PIL (pillow) Python package to decode images for the cache.")
+            if inputs_preprocess is not None or targets_preprocess is not None:
+                raise ValueError("The preprocess functions can't be used with the decoded image cache "
+                                 "(image_shape %s). Use `labels` for the targets." % str(image_shape))
+            assert layout in ('bc01', 'b01c'), "Layout must be 'bc01' or 'b01c', found %s" % str(layout)
+            self.image_shape = tuple(image_shape)
+            self.crop = crop
+            self.mode = mode
+            self.layout = layout
+            self.labels = labels
+            self.processes = processes
+            self.chunksize = chunksize
+            self.cache_dir = os.path.realpath(cache_dir or self.path.rstrip(os.sep) + '_images')
+
+            subsets = {}
+            for name, subset_filter in [('train', train_filter), ('valid', valid_filter), ('test', test_filter)]:
+                if name == 'train' or subset_filter is not None:
+                    images, index = self.get_images(name, subset_filter)
+                    targets = index['label'] if labels is not None else None
+                    subsets[name] = (images, targets, index)
+                else:
+                    subsets[name] = (None, None, None)
+            self.train_index = subsets['train'][2]
+            self.valid_index = subsets['valid'][2]
+            self.test_index = subsets['test'][2]
+            super(ImageDataset, self).__init__(train_inputs=subsets['train'][0], train_targets=subsets['train'][1],
+                                               valid_inputs=subsets['valid'][0], valid_targets=subsets['valid'][1],
+                                               test_inputs=subsets['test'][0], test_targets=subsets['test'][1],
+                                               inputs_dtype='uint8')
+            return
+
         train_inputs, train_targets = None, None
         valid_inputs, valid_targets = None, None
         test_inputs, test_targets   = None, None
 
-        train_inputs = ImageStream(self.path, train_filter, inputs_preprocess)
+        pool_args = {"processes": processes, "chunksize": chunksize}
+
+        train_inputs = ImageStream(self.path, train_filter, inputs_preprocess, **pool_args)
         if targets_preprocess is not None:
-            train_targets = ImageStream(self.path, train_filter, targets_preprocess)
+            train_targets = ImageStream(self.path, train_filter, targets_preprocess, **pool_args)
 
         if valid_filter is not None:
-            valid_inputs = ImageStream(self.path, valid_filter, inputs_preprocess)
+            valid_inputs = ImageStream(self.path, valid_filter, inputs_preprocess, **pool_args)
             if targets_preprocess is not None:
-                valid_targets = ImageStream(self.path, valid_filter, targets_preprocess)
+                valid_targets = ImageStream(self.path, valid_filter, targets_preprocess, **pool_args)
 
         if test_filter is not None:
-            test_inputs = ImageStream(self.path, test_filter, inputs_preprocess)
+            test_inputs = ImageStream(self.path, test_filter, inputs_preprocess, **pool_args)
             if targets_preprocess is not None:
-                test_targets = ImageStream(self.path, test_filter, targets_preprocess)
+                test_targets = ImageStream(self.path, test_filter, targets_preprocess, **pool_args)
 
         super(ImageDataset, self).__init__(train_inputs=train_inputs, train_targets=train_targets,
                                            valid_inputs=valid_inputs, valid_targets=valid_targets,
                                            test_inputs=test_inputs, test_targets=test_targets)
+
+    def get_images(self, name, path_filter):
+        """
+        Returns the decoded images for the files in a subset - from the cache if it exists, otherwise decoding
+        the files (and saving them to the cache).
+
+        Parameters
+        ----------
+        name : str
+            The name of the subset (for the cache files).
+        path_filter : regex string or compiled regex object
+            The regular expression filter to match the subset's file names against.
+
+        Returns
+        -------
+        tuple(numpy.ndarray, numpy.ndarray)
+            The uint8 images with the shape of the `layout`, and the structured index array of (file, label) for
+            each image (labels are -1 without a `labels` function). Files that couldn't be decoded are left out.
+        """
+        fnames = [f for f in files.find_files(self.path, path_filter) if not f.startswith(self.cache_dir + os.sep)]
+        image_labels = [int(self.labels(f)) if self.labels is not None else -1 for f in fnames]
+        prefix = os.path.join(self.cache_dir, "%s_%s" % (
+            name, files.file_cache_key(fnames, image_labels, self.image_shape, self.crop, self.mode, self.layout)
+        ))
+        if os.path.isfile(prefix + '.index.npy'):
+            index = numpy.load(prefix + '.index.npy')
+            # can't memory-map an empty file
+            mmap_mode = 'r' if index.shape[0] > 0 else None
+            log.debug("Loading %d cached images from %s", index.shape[0], prefix)
+            return numpy.load(prefix + '.images.npy', mmap_mode=mmap_mode), index
+
+        files.mkdir_p(self.cache_dir)
+        with files.atomic_file(prefix + '.images.npy') as images_tmp:
+            images, decoded = _decode_images(images_tmp, fnames, self._image_shape(),
+                                    functools.partial(_decode_image, image_shape=self.image_shape, crop=self.crop,
+                                                      mode=self.mode, layout=self.layout),
+                                    self.processes, self.chunksize)
+            del images
+        index = _image_index([fnames[i] for i in decoded], [image_labels[i] for i in decoded])
+        # the index marks the cache as done, so it is moved into place last
+        files.atomic_save_npy(prefix + '.index.npy', index)
+        log.debug("Saved %d decoded images to %s", index.shape[0], prefix)
+        mmap_mode = 'r' if index.shape[0] > 0 else None
+        return numpy.load(prefix + '.images.npy', mmap_mode=mmap_mode), index
+
+    def _image_shape(self):
+        """
+        Helper method to return the shape of one decoded image in the `layout`.
+        """
+        channels = len(Image.new(self.mode, (1, 1)).getbands())
+        if self.layout == 'bc01':
+            return (channels,) + self.image_shape
+        return self.image_shape + (channels,)
+
+
+def _decode_images(filename, fnames, shape, decode, processes=None, chunksize=1):
+    """
+    Decodes the image files into a new uint8 .npy file of (images,) + `shape`, and returns the images array
+    and the indices of the files that were decoded.
+    """
+    images = numpy.lib.format.open_memmap(filename, mode='w+', dtype='uint8', shape=(len(fnames),) + shape)
+    decoded = []
+    for i, data in enumerate(parallel_map(decode, fnames, processes, chunksize)):
+        if data is not None:
+            images[len(decoded)] = data
+            decoded.append(i)
+    images.flush()
+    if len(decoded) < len(fnames):
+        # rewrite the file without the rows of the images that couldn't be decoded
+        kept = numpy.array(images[:len(decoded)])
+        del images
+        numpy.save(filename, kept)
+        images = kept
+    return images, decoded
+
+def _decode_image(fname, image_shape, crop=True, mode='RGB', layout='bc01'):
+    """
+    Decodes an image file and resizes it to the (height, width) `image_shape`, returning its uint8 array in the
+    `layout` (or None if it couldn't be decoded).
+    """
+    try:
+        with Image.open(fname) as im:
+            if im.mode != mode:
+                im = im.convert(mode)
+            height, width = image_shape
+            if crop:
+                # scale the shorter side to fit, then crop the center of the longer side
+                scale = max(height / float(im.size[1]), width / float(im.size[0]))
+                size = (max(width, int(round(im.size[0] * scale))), max(height, int(round(im.size[1] * scale))))
+                im = im.resize(size, Image.BILINEAR)
+                left, top = (size[0] - width) // 2, (size[1] - height) // 2
+                im = im.crop((left, top, left + width, top + height))
+            else:
+                im = im.resize((width, height), Image.BILINEAR)
+            data = numpy.asarray(im, dtype='uint8')
+    except Exception as err:
+        log.exception(err.__str__())
+        return None
+    if data.ndim == 2:
+        data = data[:, :, None]
+    if layout == 'bc01':
+        data = data.transpose(2, 0, 1)
+    return data
+
+def _image_index(fnames, labels):
+    """
+    Creates the structured (file, label) index array for the decoded images.
+    """
+    index = numpy.zeros((len(fnames),), dtype=[('file', 'U%d' % max([len(f) for f in fnames] or [1])),
+                                                ('label', 'int64')])
+    index['file'] = fnames
+    index['label'] = labels
+    return index
@@ -1,5 +1,5 @@
 """
-Generic structure for a dataset wrapper around array-like memory objects (like numpy array).
+Generic structure for a dataset wrapper around array-like memory objects (like numpy array or numpy.memmap).
 
 .. todo:: Add a class for Pandas dataframes.
 """
@@ -9,6 +9,7 @@ import logging
 import math
 # third party libraries
 import numpy
+from six import string_types
 # internal imports
 from opendeep.data.dataset import Dataset
 
@@ -22,7 +23,8 @@ class NumpyDataset(Dataset):
     def __init__(self, train_inputs, train_targets=None,
                  valid_inputs=None, valid_targets=None,
                  test_inputs=None, test_targets=None,
-                 train_split=1., valid_split=0.):
+                 train_split=1., valid_split=0.,
+                 inputs_dtype=None, inputs_scale=None, inputs_offset=None):
         """
         Initialize training, validation, and testing data from memory.
 
@@ -45,6 +47,13 @@ class NumpyDataset(Dataset):
         valid_split : float, optional
             The percentage of data to be used for validation. This is only used if valid and test inputs are None.
             (leftover percentage from train and valid splits will be for testing).
+        inputs_dtype : str or list(str), optional
+            The compact storage dtype of the inputs, to decode them inside the graph (see
+            :class:`opendeep.data.Dataset`).
+        inputs_scale : float or list(float), optional
+            The factor to multiply the stored inputs by when decoding them.
+        inputs_offset : float or list(float), optional
+            The amount to add to the scaled inputs when decoding them.
         """
         log.info('Wrapping dataset from memory object')
 
@@ -59,40 +68,146 @@ class NumpyDataset(Dataset):
         test_targets = _raise_to_array(test_targets)
 
         # if validation and test sets were None, use the given split.
-        if all([valid_inputs is None, valid_targets is None, test_inputs is None, test_targets is None]):
-            assert (0. < train_split <= 1.), \
-                "Train_split needs to be a fraction between (0, 1]. Was %f" % train_split
-            assert (0. <= valid_split < 1.), \
-                "Valid_split needs to be a fraction between [0, 1). Was %f" % valid_split
-            assert train_split + valid_split <= 1., \
-                "Train_split + valid_split can't be greater than 1. Was %f" % (train_split+valid_split)
-            # make test_split the leftover percentage!
-            test_split = 1 - (train_split + valid_split)
-
-            # split up train_X and train_Y into validation and test as well
-            length = train_inputs.shape[0]
-            train_len = int(math.floor(length * train_split))
-            valid_len = int(math.floor(length * valid_split))
-            test_len = int(math.floor(length * test_split))
-
-            # do the splits!
-            if valid_len > 0:
-                valid_inputs = train_inputs[train_len:train_len + valid_len]
-                if train_targets is not None:
-                    valid_targets = train_targets[train_len:train_len + valid_len]
-
-            if test_len > 0:
-                test_inputs = train_inputs[train_len + valid_len:]
-                if train_targets is not None:
-                    test_targets = train_targets[train_len + valid_len:]
-
-            train_inputs = train_inputs[:train_len]
-            if train_targets is not None:
-                train_targets = train_targets[:train_len]
+        (train_inputs, train_targets,
+         valid_inputs, valid_targets,
+         test_inputs, test_targets) = _split_subsets(train_inputs, train_targets,
+                                                     valid_inputs, valid_targets,
+                                                     test_inputs, test_targets,
+                                                     train_split, valid_split)
 
         super(NumpyDataset, self).__init__(train_inputs, train_targets,
                                            valid_inputs, valid_targets,
-                                           test_inputs, test_targets)
+                                           test_inputs, test_targets,
+                                           inputs_dtype, inputs_scale, inputs_offset)
+
+class MemmapDataset(Dataset):
+    """
+    Dataset object wrapper for arrays stored on disk that are too large to fit in memory. Each subset is opened
+    as a `numpy.memmap`, so minibatches are read straight from disk as they are sliced instead of materializing
+    the whole array. Subsets can be given as paths to `.npy` files, raw memmap descriptor dictionaries, or
+    already-opened `numpy.memmap` objects.
+    """
+    def __init__(self, train_inputs, train_targets=None,
+                 valid_inputs=None, valid_targets=None,
+                 test_inputs=None, test_targets=None,
+                 train_split=1., valid_split=0., mode='r',
+                 inputs_dtype=None, inputs_scale=None, inputs_offset=None):
+        """
+        Initialize training, validation, and testing data from memory-mapped files.
+
+        Parameters
+        ----------
+        train_inputs : str, dict, or numpy.memmap
+            The training input data. A string is the path to a `.npy` file. A dictionary describes a raw memmap
+            file with the keyword arguments to `numpy.memmap` (`filename`, `dtype`, `shape`, and optionally
+            `offset` and `order`).
+        train_targets : str, dict, or numpy.memmap, optional
+            The training target (label) data.
+        valid_inputs : str, dict, or numpy.memmap, optional
+            The validation input data.
+        valid_targets : str, dict, or numpy.memmap, optional
+            The validation target (label) data.
+        test_inputs : str, dict, or numpy.memmap, optional
+            The testing input data.
+        test_targets : str, dict, or numpy.memmap, optional
+            The testing target (label) data.
+        train_split : float, optional
+            The percentage of data to be used for training. This is only used if valid and test inputs are None.
+        valid_split : float, optional
+            The percentage of data to be used for validation. This is only used if valid and test inputs are None.
+            (leftover percentage from train and valid splits will be for testing).
+        mode : str, optional
+            The file mode to open the memmaps with (see `numpy.memmap`). Defaults to read-only.
+        inputs_dtype : str or list(str), optional
+            The compact storage dtype of the inputs, to decode them inside the graph (see
+            :class:`opendeep.data.Dataset`).
+        inputs_scale : float or list(float), optional
+            The factor to multiply the stored inputs by when decoding them.
+        inputs_offset : float or list(float), optional
+            The amount to add to the scaled inputs when decoding them.
+        """
+        log.info('Wrapping dataset from memory-mapped files')
+
+        # open the memmaps
+        train_inputs = _open_memmap(train_inputs, mode)
+        train_targets = _open_memmap(train_targets, mode)
+
+        valid_inputs = _open_memmap(valid_inputs, mode)
+        valid_targets = _open_memmap(valid_targets, mode)
+
+        test_inputs = _open_memmap(test_inputs, mode)
+        test_targets = _open_memmap(test_targets, mode)
+
+        # if validation and test sets were None, use the given split (slicing a memmap doesn't read it).
+        (train_inputs, train_targets,
+         valid_inputs, valid_targets,
+         test_inputs, test_targets) = _split_subsets(train_inputs, train_targets,
+                                                     valid_inputs, valid_targets,
+                                                     test_inputs, test_targets,
+                                                     train_split, valid_split)
+
+        super(MemmapDataset, self).__init__(train_inputs, train_targets,
+                                            valid_inputs, valid_targets,
+                                            test_inputs, test_targets,
+                                            inputs_dtype, inputs_scale, inputs_offset)
+
+def _split_subsets(train_inputs, train_targets,
+                   valid_inputs, valid_targets,
+                   test_inputs, test_targets,
+                   train_split, valid_split):
+    """
+    Helper method to split the train inputs and targets into train, valid, and test subsets with the given
+    percentages if the validation and test sets were None.
+    """
+    if all([valid_inputs is None, valid_targets is None, test_inputs is None, test_targets is None]):
+        assert (0. < train_split <= 1.), \
+            "Train_split needs to be a fraction between (0, 1]. Was %f" % train_split
+        assert (0. <= valid_split < 1.), \
+            "Valid_split needs to be a fraction between [0, 1). Was %f" % valid_split
+        assert train_split + valid_split <= 1., \
+            "Train_split + valid_split can't be greater than 1. Was %f" % (train_split+valid_split)
+        # make test_split the leftover percentage!
+        test_split = 1 - (train_split + valid_split)
+
+        # split up train_X and train_Y into validation and test as well
+        length = train_inputs.shape[0]
+        train_len = int(math.floor(length * train_split))
+        valid_len = int(math.floor(length * valid_split))
+        test_len = int(math.floor(length * test_split))
+
+        # do the splits!
+        if valid_len > 0:
+            valid_inputs = train_inputs[train_len:train_len + valid_len]
+            if train_targets is not None:
+                valid_targets = train_targets[train_len:train_len + valid_len]
+
+        if test_len > 0:
+            test_inputs = train_inputs[train_len + valid_len:]
+            if train_targets is not None:
+                test_targets = train_targets[train_len + valid_len:]
+
+        train_inputs = train_inputs[:train_len]
+        if train_targets is not None:
+            train_targets = train_targets[:train_len]
+
+    return (train_inputs, train_targets,
+            valid_inputs, valid_targets,
+            test_inputs, test_targets)
+
+def _open_memmap(input, mode='r'):
+    """
+    Helper method to open a numpy.memmap from a .npy filepath or a raw memmap descriptor dictionary while
+    preserving None.
+    """
+    if input is None or isinstance(input, numpy.memmap):
+        return input
+    elif isinstance(input, string_types):
+        return numpy.load(input, mmap_mode=mode)
+    elif isinstance(input, dict):
+        return numpy.memmap(mode=mode, **input)
+    else:
+        raise TypeError("Expected a .npy filepath, memmap descriptor dictionary, or numpy.memmap. Found %s" %
+                        str(type(input)))
 
 def _raise_to_array(input):
     """
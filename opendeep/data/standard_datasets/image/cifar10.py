@@ -99,3 +99,6 @@ class CIFAR10(FileDataset):
         else:
             self.test_inputs = None
             self.test_targets = None
+
+        # the pixels are passed to the model as uint8 and cast to floats inside the graph
+        self.inputs_dtype = 'uint8'
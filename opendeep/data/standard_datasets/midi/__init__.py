@@ -1,5 +1,6 @@
 from __future__ import division, absolute_import, print_function
 
+from .midi_dataset import MidiDataset, PianoRollArray
 from .jsb_chorales import JSBChorales
 from .musedata import MuseData
 from .nottingham import Nottingham
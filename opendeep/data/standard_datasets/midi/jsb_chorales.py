@@ -5,19 +5,14 @@ Pre-processed from here: http://www-etud.iro.umontreal.ca/~boulanni/icml2012
 """
 # standard libraries
 import logging
-# third party imports
-import numpy
-from theano import config
 # internal imports
-from opendeep.data.dataset_file import FileDataset
-from opendeep.utils.file_ops import find_files
-from opendeep.utils.midi import midiread
+from opendeep.data.standard_datasets.midi.midi_dataset import MidiDataset
 from opendeep.utils.decorators import inherit_docs
 
 log = logging.getLogger(__name__)
 
 @inherit_docs
-class JSBChorales(FileDataset):
+class JSBChorales(MidiDataset):
     """
     Object for the JSB Chorales midi dataset. Pickled file of midi piano roll provided by Montreal's
     Nicolas Boulanger-Lewandowski into train, valid, and test sets.
@@ -30,36 +25,34 @@ class JSBChorales(FileDataset):
         All the validation sequences concatenated into one matrix.
     test : numpy matrix
         All the testing sequences concatenated into one matrix.
+
+    Parameters
+    ----------
+    concatenate : bool, optional
+        Whether to concatenate the sequences of each subset into one matrix. If False, each subset is an object
+        array of the separate piano roll sequences instead, keeping their boundaries (for batching them by length
+        with the Optimizer's `bucket_width`).
+    sparse : bool, optional
+        Whether to keep the piano rolls as note intervals that are only made dense when minibatches are sliced
+        from them (see :class:`PianoRollArray`), instead of dense matrices.
+    cache : bool, optional
+        Whether to cache the notes parsed from the midi files, so later loads don't parse them again
+        (see :class:`MidiDataset`).
+    cache_dir : str, optional
+        The directory for the cache. Defaults to a ``_piano_rolls`` directory next to the dataset `path`.
+    processes : int, optional
+        The number of worker processes to parse the midi files in when they aren't cached.
     """
     def __init__(self, path='datasets/JSBChorales',
                  source='http://www-etud.iro.umontreal.ca/~boulanni/JSB%20Chorales.zip',
                  train_filter='.*train.*',
                  valid_filter='.*valid.*',
-                 test_filter='.*test.*',):
+                 test_filter='.*test.*',
+                 concatenate=True, sparse=False, cache=True, cache_dir=None, processes=None):
         super(JSBChorales, self).__init__(path=path, source=source,
                                           train_filter=train_filter,
                                           valid_filter=valid_filter,
-                                          test_filter=test_filter)
-
-        # grab the datasets from midireading the files
-        train_datasets = [
-            midiread(f, r=(21, 109), dt=0.3).piano_roll.astype(config.floatX)
-            for f in find_files(self.path, train_filter)
-        ]
-        valid_datasets = [
-            midiread(f, r=(21, 109), dt=0.3).piano_roll.astype(config.floatX)
-            for f in find_files(self.path, valid_filter)
-        ]
-        test_datasets = [
-            midiread(f, r=(21, 109), dt=0.3).piano_roll.astype(config.floatX)
-            for f in find_files(self.path, test_filter)
-        ]
-
-        self.train_inputs = numpy.concatenate(train_datasets)
-        self.train_targets = None
-
-        self.valid_inputs = numpy.concatenate(valid_datasets)
-        self.valid_targets = None
-
-        self.test_inputs = numpy.concatenate(test_datasets)
-        self.test_targets = None
+                                          test_filter=test_filter,
+                                          r=(21, 109), dt=0.3,
+                                          concatenate=concatenate, sparse=sparse, cache=cache, cache_dir=cache_dir,
+                                          processes=processes)
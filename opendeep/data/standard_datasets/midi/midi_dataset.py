@@ -0,0 +1,326 @@
+"""
+Generic structure for the midi datasets of piano rolls, with an on-disk cache of the notes parsed from the files.
+"""
+# standard libraries
+import logging
+import os
+import functools
+# third party imports
+import numpy
+from theano import config
+# internal imports
+from opendeep.data.dataset_file import FileDataset
+from opendeep.data.stream.filestream import parallel_map
+from opendeep.utils.batch import sequence_array
+from opendeep.utils.file_ops import find_files, mkdir_p, file_cache_key, atomic_save_npy
+from opendeep.utils.midi import MidiOutStream, read_notes, note_steps, piano_roll
+
+log = logging.getLogger(__name__)
+
+# number of rows to rasterize at a time when iterating over a PianoRollArray.
+_ITER_ROWS = 256
+
+
+class MidiDataset(FileDataset):
+    """
+    Dataset object for directories of midi files, split into train, valid, and test sets by file name. Each file
+    becomes a piano roll sequence: a (timesteps, pitches) matrix of 1s for the notes playing at each timestep.
+
+    Parsing midi files is slow, so the first load of a subset saves the notes of all of its pieces to a cache in
+    `cache_dir` as note intervals (pitch, start timestep, end timestep) with the offsets of each piece - a small
+    fraction of the size of the piano rolls. The cache is keyed by the files, `r`, and `dt`, and later loads
+    memory-map it and rasterize the piano rolls with numpy instead of parsing the files again.
+
+    Piano rolls are mostly zeros, so with `sparse` the subsets stay as note intervals in :class:`PianoRollArray`
+    objects that only create the dense rows sliced into each minibatch.
+
+    Attributes
+    ----------
+    train : numpy matrix
+        All the training sequences concatenated into one matrix.
+    valid : numpy matrix
+        All the validation sequences concatenated into one matrix.
+    test : numpy matrix
+        All the testing sequences concatenated into one matrix.
+    """
+    def __init__(self, path, source=None,
+                 train_filter='.*train.*',
+                 valid_filter='.*valid.*',
+                 test_filter='.*test.*',
+                 r=(21, 109), dt=0.3,
+                 concatenate=True, sparse=False, cache=True, cache_dir=None, processes=None):
+        """
+        Initialize the piano rolls of the training, validation, and testing files.
+
+        Parameters
+        ----------
+        path : str
+            The name of the directory for the dataset.
+        source : str, optional
+            The URL path for downloading the dataset (if applicable).
+        train_filter : regex string or compiled regex object, optional
+            The regular expression filter to match training file names against.
+        valid_filter : regex string or compiled regex object, optional
+            The regular expression filter to match validation file names against.
+        test_filter : regex string or compiled regex object, optional
+            The regular expression filter to match testing file names against.
+        r : tuple(int), optional
+            The (lowest, highest + 1) range of midi pitches to keep in the piano rolls.
+        dt : float, optional
+            The length of a piano roll timestep in seconds.
+        concatenate : bool, optional
+            Whether to concatenate the sequences of each subset into one matrix. If False, each subset is an object
+            array of the separate piano roll sequences instead, keeping their boundaries (for batching them by
+            length with the Optimizer's `bucket_width`).
+        sparse : bool, optional
+            Whether to keep the piano rolls as note intervals (:class:`PianoRollArray`) that are only made dense
+            when minibatches are sliced from them, instead of dense matrices.
+        cache : bool, optional
+            Whether to save the parsed notes to (and load them from) the cache in `cache_dir`.
+        cache_dir : str, optional
+            The directory for the cache. Defaults to a ``_piano_rolls`` directory next to the dataset `path`.
+        processes : int, optional
+            The number of worker processes to parse the midi files in when they aren't cached.
+        """
+        super(MidiDataset, self).__init__(path=path, source=source,
+                                          train_filter=train_filter,
+                                          valid_filter=valid_filter,
+                                          test_filter=test_filter,
+                                          processes=processes)
+        self.r = tuple(r)
+        self.dt = dt
+        self.sparse = sparse
+        self.cache_dir = None
+        if cache:
+            self.cache_dir = os.path.realpath(cache_dir or self.path.rstrip(os.sep) + '_piano_rolls')
+
+        self.train_inputs = self._get_rolls('train', train_filter, concatenate)
+        self.train_targets = None
+
+        self.valid_inputs = self._get_rolls('valid', valid_filter, concatenate)
+        self.valid_targets = None
+
+        self.test_inputs = self._get_rolls('test', test_filter, concatenate)
+        self.test_targets = None
+
+    def _get_rolls(self, name, path_filter, concatenate):
+        """
+        Helper method to return the piano rolls for the files in a subset (as one matrix or an object array of
+        each piece's matrix).
+        """
+        notes, pieces = self.get_notes(name, path_filter)
+        n_pitches = self.r[1] - self.r[0]
+        if self.sparse:
+            if concatenate:
+                return PianoRollArray(*_concatenate_notes(notes, pieces), n_pitches=n_pitches)
+            return sequence_array([PianoRollArray(notes[first:last, 0], notes[first:last, 1], notes[first:last, 2],
+                                                  length, n_pitches)
+                                   for first, last, length in pieces])
+        rolls = piano_rolls(notes, pieces, n_pitches)
+        if concatenate:
+            return rolls
+        starts = numpy.cumsum(pieces[:, 2]) - pieces[:, 2]
+        return sequence_array([rolls[start:start + length] for start, length in zip(starts, pieces[:, 2])])
+
+    def get_notes(self, name, path_filter):
+        """
+        Returns the notes for the files in a subset - from the cache if it exists, otherwise parsing the files
+        (and saving them to the cache).
+
+        Parameters
+        ----------
+        name : str
+            The name of the subset (for the cache files).
+        path_filter : regex string or compiled regex object
+            The regular expression filter to match the subset's file names against.
+
+        Returns
+        -------
+        tuple(numpy.ndarray, numpy.ndarray)
+            The (n_notes, 3) int32 array of (pitch, start timestep, end timestep) for the notes of all the pieces,
+            and the (n_pieces, 3) int64 array of (first note, last note + 1, timesteps) for each piece.
+        """
+        files = [f for f in find_files(self.path, path_filter)
+                 if self.cache_dir is None or not f.startswith(self.cache_dir + os.sep)]
+        prefix = None
+        if self.cache_dir is not None:
+            prefix = os.path.join(self.cache_dir, "%s_%s" % (name, file_cache_key(files, self.r, self.dt)))
+            if os.path.isfile(prefix + '.pieces.npy'):
+                pieces = numpy.load(prefix + '.pieces.npy')
+                # can't memory-map an empty file
+                mmap_mode = 'r' if pieces.shape[0] > 0 and pieces[-1, 1] > 0 else None
+                log.debug("Loading %d cached pieces from %s", pieces.shape[0], prefix)
+                return numpy.load(prefix + '.notes.npy', mmap_mode=mmap_mode), pieces
+
+        read_piece = functools.partial(_read_notes, r=self.r, dt=self.dt)
+        pieces_notes = list(parallel_map(read_piece, files, self.processes))
+        pieces = numpy.zeros((len(pieces_notes), 3), dtype='int64')
+        first = 0
+        for i, (piece_notes, length) in enumerate(pieces_notes):
+            pieces[i] = (first, first + piece_notes.shape[0], length)
+            first += piece_notes.shape[0]
+        notes = numpy.concatenate([piece_notes for piece_notes, _ in pieces_notes] or
+                                  [numpy.zeros((0, 3), dtype='int32')])
+        if prefix is not None:
+            _save_notes(prefix, notes, pieces)
+        return notes, pieces
+
+
+def piano_rolls(notes, pieces, n_pitches, dtype=None):
+    """
+    Rasterizes the notes of pieces into their piano rolls, concatenated into one matrix.
+
+    Parameters
+    ----------
+    notes : numpy.ndarray
+        The (n_notes, 3) array of (pitch, start timestep, end timestep) for the notes of all the pieces.
+    pieces : numpy.ndarray
+        The (n_pieces, 3) array of (first note, last note + 1, timesteps) for each piece, in the order of `notes`.
+    n_pitches : int
+        The number of pitches in the piano rolls.
+    dtype : str, optional
+        The dtype of the piano rolls. Defaults to theano.config.floatX.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (timesteps, n_pitches) matrix of the pieces' piano rolls one after another.
+    """
+    pitches, starts, ends, length = _concatenate_notes(notes, pieces)
+    return piano_roll(pitches, starts, ends, length, n_pitches, dtype or config.floatX)
+
+
+class PianoRollArray(object):
+    """
+    An array-like (timesteps, pitches) piano roll that keeps the note intervals instead of the dense matrix, and
+    only rasterizes the rows that are sliced from it (like minibatches). Notes are sorted by their start, so the
+    notes playing in a range of rows are found with a binary search.
+
+    Parameters
+    ----------
+    pitches : numpy.ndarray
+        The pitch index of each note.
+    starts : numpy.ndarray
+        The timestep each note starts at.
+    ends : numpy.ndarray
+        The timestep each note ends at (not included).
+    length : int
+        The number of timesteps in the piano roll.
+    n_pitches : int
+        The number of pitches in the piano roll.
+    dtype : str, optional
+        The dtype of the dense rows. Defaults to theano.config.floatX.
+    """
+    def __init__(self, pitches, starts, ends, length, n_pitches, dtype=None):
+        order = numpy.argsort(starts, kind='mergesort')
+        self.pitches = numpy.asarray(pitches)[order]
+        self.starts = numpy.asarray(starts, dtype='int64')[order]
+        self.ends = numpy.asarray(ends, dtype='int64')[order]
+        # the longest note bounds how far back a note playing in a row can start
+        self.max_duration = int((self.ends - self.starts).max()) if len(order) > 0 else 0
+        self.shape = (int(length), int(n_pitches))
+        self.dtype = numpy.dtype(dtype or config.floatX)
+        self.ndim = 2
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), _ITER_ROWS):
+            for row in self[start:start + _ITER_ROWS]:
+                yield row
+
+    def __array__(self, dtype=None):
+        return piano_roll(self.pitches, self.starts, self.ends, self.shape[0], self.shape[1], dtype or self.dtype)
+
+    def __getitem__(self, key):
+        # split off the first dimension's key from the rest
+        if isinstance(key, tuple):
+            key, rest = key[0], key[1:]
+        else:
+            rest = ()
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                data = self._range(start, max(start, stop))
+            else:
+                data = self._rows(numpy.arange(start, stop, step))
+        elif isinstance(key, (int, numpy.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("Index %d is out of bounds for PianoRollArray with length %d" % (key, len(self)))
+            data = self._range(key, key + 1)[0]
+        else:
+            data = self._rows(numpy.asarray(key))
+
+        if rest:
+            # the first dimension has been resolved (or dropped for an integer key) already.
+            data = data[(slice(None),) + rest] if data.ndim == self.ndim else data[rest]
+        return data
+
+    def _range(self, start, stop):
+        """
+        Returns the dense rows [start, stop).
+        """
+        first = numpy.searchsorted(self.starts, start - self.max_duration, side='right')
+        last = numpy.searchsorted(self.starts, stop, side='left')
+        ends = self.ends[first:last]
+        playing = ends > start
+        return piano_roll(self.pitches[first:last][playing],
+                          numpy.maximum(self.starts[first:last][playing], start) - start,
+                          numpy.minimum(ends[playing], stop) - start,
+                          stop - start, self.shape[1], self.dtype)
+
+    def _rows(self, rows):
+        """
+        Returns the dense rows for an array of row indices.
+        """
+        rows = numpy.where(rows < 0, rows + len(self), rows)
+        if rows.size > 0 and (rows.min() < 0 or rows.max() >= len(self)):
+            raise IndexError("Index out of bounds for PianoRollArray with length %d" % len(self))
+        # the range of notes that could be playing in each row
+        firsts = numpy.searchsorted(self.starts, rows - self.max_duration, side='right')
+        counts = numpy.searchsorted(self.starts, rows, side='right') - firsts
+        row_idx = numpy.repeat(numpy.arange(rows.shape[0]), counts)
+        note_idx = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts) + \
+            numpy.repeat(firsts, counts)
+        playing = self.ends[note_idx] > rows[row_idx]
+        data = numpy.zeros((rows.shape[0], self.shape[1]), dtype=self.dtype)
+        data[row_idx[playing], self.pitches[note_idx[playing]]] = 1
+        return data
+
+
+def _concatenate_notes(notes, pieces):
+    """
+    Returns the pitches, starts, and ends of the notes of pieces with the pieces one after another, and the total
+    number of timesteps.
+    """
+    lengths = pieces[:, 2]
+    n_notes = pieces[:, 1] - pieces[:, 0]
+    # the timestep each piece starts at in the concatenated piano rolls
+    offsets = numpy.repeat(numpy.cumsum(lengths) - lengths, n_notes)
+    notes = numpy.concatenate([notes[first:last] for first, last in pieces[:, :2]] or
+                              [numpy.zeros((0, 3), dtype='int32')])
+    return notes[:, 0], notes[:, 1] + offsets, notes[:, 2] + offsets, int(lengths.sum())
+
+
+def _read_notes(fname, r, dt):
+    """
+    Parses a midi file into its (n_notes, 3) int32 array of (pitch, start timestep, end timestep) notes
+    inside the pitch range `r`, and its number of timesteps.
+    """
+    pitches, starts, ends, length = note_steps(read_notes(MidiOutStream(), fname), r, dt)
+    return numpy.stack([pitches, starts, ends], axis=1).astype('int32'), length
+
+
+def _save_notes(prefix, notes, pieces):
+    """
+    Saves the notes and pieces to the cache files with the `prefix`. The pieces mark the cache as done,
+    so they are moved into place last.
+    """
+    mkdir_p(os.path.dirname(prefix))
+    atomic_save_npy(prefix + '.notes.npy', notes)
+    atomic_save_npy(prefix + '.pieces.npy', pieces)
+    log.debug("Saved %d notes from %d pieces to %s", notes.shape[0], pieces.shape[0], prefix)
@@ -3,3 +3,7 @@ from __future__ import division, absolute_import, print_function
 from .filestream import *
 from .modifystream import *
 from .batchstream import *
+from .prefetchstream import *
+from .shiftedstream import *
+from .tokenstream import *
+from .augmentstream import *
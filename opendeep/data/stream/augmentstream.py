@@ -0,0 +1,250 @@
+"""
+A wrapper object for randomly augmenting minibatches of images on the host (CPU) before they go to the model.
+"""
+# standard libraries
+import logging
+import collections
+import functools
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+# third party libraries
+import numpy
+from theano import config
+# internal imports
+from opendeep.data.stream.filestream import _use_pool, _init_worker, _call_worker
+
+_log = logging.getLogger(__name__)
+
+
+class AugmentStream(object):
+    """
+    Creates an iterable stream that augments each minibatch of images from the input stream with random crops,
+    horizontal flips, and scale jitter, and subtracts the mean. It is the host-side version of
+    :func:`opendeep.utils.nnet.mirror_images` for when augmenting inside the graph is too costly: every operation
+    is vectorized over the whole uint8 batch (one gather for the crops, flips, and scaling), and batches can be
+    augmented on worker threads or processes while the model works on the previous ones.
+
+    Each batch gets its own random number generator seeded from (`seed`, epoch, batch number), so the augmentation
+    is the same for the same seed no matter how many workers there are. The epoch starts at `epoch` and goes up by
+    one every time the stream is iterated.
+
+    Parameters
+    ----------
+    stream : iterable
+        The input stream of minibatches. Each element is either an image batch or a list of arrays (like the inputs
+        followed by targets) where the image batch is at `index`.
+    crop_shape : tuple(int), optional
+        The (height, width) of the crops. If None, the images keep their size.
+    flip : bool, optional
+        Whether to randomly flip half of the images horizontally.
+    scale_jitter : float, optional
+        If given, each crop window is scaled by a random factor in [1 - `scale_jitter`, 1 + `scale_jitter`]
+        (as far as it fits in the image) and resampled to the `crop_shape` with nearest neighbors.
+    mean : float or array_like, optional
+        The mean to subtract from the images (a scalar, the per-channel means, or a mean image with the output
+        shape).
+    layout : str, optional
+        The axes of the image batches: 'bc01' for (images, channels, height, width) or 'b01c' for
+        (images, height, width, channels).
+    random : bool, optional
+        Whether to augment randomly. If False (like for validation and testing), the images are center cropped
+        without flips or jitter, and only the mean is subtracted.
+    seed : int, optional
+        The seed for the augmentation. Defaults to a random seed from numpy.random.
+    epoch : int, optional
+        The epoch number of the first iteration over the stream.
+    dtype : str, optional
+        The dtype of the augmented images. Defaults to theano.config.floatX.
+    index : int, optional
+        The position of the image batch in each element of the stream (if the elements are lists).
+    threads : int, optional
+        The number of worker threads to augment batches in. numpy releases the GIL for most of the work.
+    processes : int, optional
+        The number of worker processes to augment batches in (instead of threads). If None or 1 (and no
+        `threads`), batches are augmented in the consuming thread.
+    """
+    def __init__(self, stream, crop_shape=None, flip=False, scale_jitter=None, mean=None, layout='bc01',
+                 random=True, seed=None, epoch=0, dtype=None, index=0, threads=None, processes=None):
+        assert layout in ('bc01', 'b01c'), "Layout must be 'bc01' or 'b01c', found %s" % str(layout)
+        assert not (threads and processes), "Use either threads or processes to augment batches, not both."
+        self.stream = stream
+        self.crop_shape = tuple(crop_shape) if crop_shape is not None else None
+        self.flip = flip
+        self.scale_jitter = scale_jitter
+        self.mean = mean
+        self.layout = layout
+        self.random = random
+        self.seed = seed if seed is not None else numpy.random.randint(2 ** 31 - 1)
+        self.epoch = epoch
+        self.dtype = dtype or config.floatX
+        self.index = index
+        self.threads = threads
+        self.processes = processes
+
+    def __iter__(self):
+        epoch = self.epoch
+        self.epoch += 1
+        batches = (((self.seed, epoch, i), batch) for i, batch in enumerate(self.stream))
+        augment = self._augment_fn()
+        if not self.threads and not _use_pool(self.processes):
+            for elem in batches:
+                yield augment(elem)
+            return
+
+        if self.threads:
+            pool, task = ThreadPool(self.threads), augment
+        else:
+            # the augment function is handed to the worker processes when they start (like with parallel_map)
+            pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(augment,))
+            task = _call_worker
+        try:
+            # only read a few batches ahead of the consumer instead of the whole stream
+            pending = collections.deque()
+            for elem in batches:
+                pending.append(pool.apply_async(task, (elem,)))
+                if len(pending) > self.lookahead():
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def lookahead(self):
+        """
+        Returns the number of batches the stream reads from the input stream ahead of the one being consumed
+        (while they are augmented by the workers).
+
+        Returns
+        -------
+        int
+            The number of batches read ahead.
+        """
+        workers = self.threads or (self.processes if _use_pool(self.processes) else 0)
+        return 2 * workers
+
+    def _augment_fn(self):
+        """
+        Helper method to return the function that augments one (seed, batch) element with the stream's options.
+        It only holds the options (not the stream), so it can be pickled for worker processes.
+        """
+        return functools.partial(_augment_batch, index=self.index, random=self.random, crop_shape=self.crop_shape,
+                                 flip=self.flip, scale_jitter=self.scale_jitter, mean=self.mean, layout=self.layout,
+                                 dtype=self.dtype)
+
+    def augment(self, images, rng=numpy.random):
+        """
+        Augments a batch of images (see :func:`augment_images`) with the stream's options.
+
+        Parameters
+        ----------
+        images : array_like
+            The batch of images with the stream's `layout`.
+        rng : numpy.random.RandomState, optional
+            The random number generator to use.
+
+        Returns
+        -------
+        numpy.ndarray
+            The augmented images.
+        """
+        if not self.random:
+            rng = None
+        return augment_images(images, self.crop_shape, self.flip, self.scale_jitter, self.mean, self.layout,
+                              rng, self.dtype)
+
+
+def _augment_batch(elem, index=0, random=True, **options):
+    """
+    Augments the images of a (seed, batch) element from an :class:`AugmentStream` with a random number generator
+    seeded from the seed (or center crops without one if not `random`). The `options` go to :func:`augment_images`.
+    """
+    seed, batch = elem
+    rng = numpy.random.RandomState(list(seed)) if random else None
+    if isinstance(batch, (list, tuple)):
+        batch = list(batch)
+        batch[index] = augment_images(batch[index], rng=rng, **options)
+        return batch
+    return augment_images(batch, rng=rng, **options)
+
+
+def augment_images(images, crop_shape=None, flip=False, scale_jitter=None, mean=None, layout='bc01',
+                   rng=numpy.random, dtype=None):
+    """
+    Randomly crops, flips, and scales each image of a batch, and subtracts the mean. The crops, flips, and scaling
+    are one gather over the whole batch (with nearest neighbor resampling), so the images are only copied once
+    before being cast to `dtype` for the mean subtraction.
+
+    Parameters
+    ----------
+    images : array_like
+        The batch of images (like uint8 pixels) with the `layout`.
+    crop_shape : tuple(int), optional
+        The (height, width) of the crops. If None, the images keep their size.
+    flip : bool, optional
+        Whether to randomly flip half of the images horizontally.
+    scale_jitter : float, optional
+        If given, each crop window is scaled by a random factor in [1 - `scale_jitter`, 1 + `scale_jitter`]
+        (as far as it fits in the image) before being resampled to the `crop_shape`.
+    mean : float or array_like, optional
+        The mean to subtract from the images (a scalar, the per-channel means, or a mean image with the output
+        shape).
+    layout : str, optional
+        The axes of the images: 'bc01' for (images, channels, height, width) or 'b01c' for
+        (images, height, width, channels).
+    rng : numpy.random.RandomState, optional
+        The random number generator to use. If None, the crops are centered without flips or scaling.
+    dtype : str, optional
+        The dtype of the augmented images. Defaults to theano.config.floatX.
+
+    Returns
+    -------
+    numpy.ndarray
+        The augmented images with the `layout`.
+    """
+    images = numpy.asarray(images)
+    dtype = dtype or config.floatX
+    n = images.shape[0]
+    height, width = images.shape[2:4] if layout == 'bc01' else images.shape[1:3]
+    crop_height, crop_width = crop_shape or (height, width)
+    assert crop_height <= height and crop_width <= width, \
+        "Crop shape %s is bigger than the images %s" % (str(crop_shape), str((height, width)))
+
+    # the size of each image's crop window before resampling it to the crop shape
+    scales = numpy.ones((n,))
+    if rng is not None and scale_jitter:
+        scales = rng.uniform(1 - scale_jitter, 1 + scale_jitter, size=n)
+        scales = numpy.minimum(scales, min(height / float(crop_height), width / float(crop_width)))
+    window_heights = numpy.floor(crop_height * scales).astype('int64')
+    window_widths = numpy.floor(crop_width * scales).astype('int64')
+    if rng is not None:
+        tops = (rng.uniform(size=n) * (height - window_heights + 1)).astype('int64')
+        lefts = (rng.uniform(size=n) * (width - window_widths + 1)).astype('int64')
+    else:
+        tops = (height - window_heights) // 2
+        lefts = (width - window_widths) // 2
+
+    # the (images, crop height) rows and (images, crop width) columns to gather from each image
+    steps = numpy.arange(crop_height) / float(crop_height)
+    rows = tops[:, None] + (steps[None, :] * window_heights[:, None]).astype('int64')
+    steps = numpy.arange(crop_width) / float(crop_width)
+    cols = lefts[:, None] + (steps[None, :] * window_widths[:, None]).astype('int64')
+    if rng is not None and flip:
+        flips = rng.uniform(size=n) < 0.5
+        cols[flips] = cols[flips, ::-1]
+
+    batch = numpy.arange(n)[:, None, None]
+    if layout == 'bc01':
+        # the advanced indices are split by the channels slice, so they come first: (images, rows, cols, channels)
+        out = images[batch, :, rows[:, :, None], cols[:, None, :]].transpose(0, 3, 1, 2)
+    else:
+        out = images[batch, rows[:, :, None], cols[:, None, :]]
+    out = out.astype(dtype)
+    if mean is not None:
+        mean = numpy.asarray(mean, dtype=dtype)
+        if mean.ndim == 1 and layout == 'bc01':
+            # per-channel means
+            mean = mean[:, None, None]
+        out -= mean
+    return out
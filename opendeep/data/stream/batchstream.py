@@ -5,8 +5,10 @@ A wrapper object for modifying iterable streams of data into batches/minibatches
 import itertools
 # third party libraries
 import numpy
+from numpy.lib.stride_tricks import as_strided
 # internal imports
 from opendeep.utils.misc import raise_to_list
+from opendeep.utils.batch import BatchBuffers
 
 class BufferStream:
     """
@@ -25,19 +27,146 @@ class BufferStream:
                 buffer = []
                 yield result
 
+class WindowStream(object):
+    """
+    Creates an iterable stream of (possibly overlapping) windows over the elements of the input stream.
+
+    Elements are read in blocks into a contiguous backing numpy array, and each window is a strided view of it -
+    windows (and batches of windows) are never copied. Every block gets a new backing array, so views from earlier
+    blocks stay valid while later ones are created.
+
+    Parameters
+    ----------
+    stream : iterable
+        The input stream of elements (all with the same shape).
+    window_size : int
+        The number of elements in each window.
+    stride : int, optional
+        The number of elements between the starts of consecutive windows. Defaults to `window_size`
+        (non-overlapping windows, like :class:`BufferStream`). A smaller stride makes overlapping windows
+        (like for truncated backpropagation through time), and a larger one skips elements.
+    batch_size : int, optional
+        If given, yield batches of this many windows as single 3D (or 2D for scalar elements) views instead of
+        individual windows. The last batch can be smaller.
+    time_major : bool, optional
+        Whether batches have the shape (window_size, batch, data...) like the recurrent models expect, instead
+        of (batch, window_size, data...). Only used with `batch_size`.
+    block_windows : int, optional
+        The number of windows to read the elements for at a time (rounded up to a multiple of `batch_size`).
+    """
+    def __init__(self, stream, window_size, stride=None, batch_size=None, time_major=False, block_windows=16):
+        assert window_size > 0, "Need a window_size greater than 0, found %d" % window_size
+        self.stream = stream
+        self.window_size = window_size
+        self.stride = stride or window_size
+        assert self.stride > 0, "Need a stride greater than 0, found %d" % self.stride
+        self.batch_size = batch_size
+        self.time_major = time_major
+        if batch_size:
+            block_windows = int(numpy.ceil(block_windows / float(batch_size))) * batch_size
+        self.block_windows = max(1, block_windows)
+
+    def __iter__(self):
+        it = iter(self.stream)
+        # the elements left over from the last block, and the number of elements to skip before the next window
+        tail, skip = [], 0
+        done = False
+        while not done:
+            n_elements = (self.block_windows - 1) * self.stride + self.window_size
+            chunk = list(itertools.islice(it, skip + n_elements - len(tail)))[skip:]
+            done = len(chunk) < n_elements - len(tail)
+            if len(tail) == 0:
+                backing = numpy.asarray(chunk)
+            elif len(chunk) == 0:
+                backing = tail
+            else:
+                backing = numpy.concatenate([tail, numpy.asarray(chunk)])
+            if backing.shape[0] < self.window_size:
+                return
+
+            n_windows = (backing.shape[0] - self.window_size) // self.stride + 1
+            # keep the windows that don't fill a whole batch for the next block (unless this is the last block)
+            if self.batch_size and not done:
+                n_windows -= n_windows % self.batch_size
+            for window in self._windows(backing, n_windows):
+                yield window
+
+            used = n_windows * self.stride
+            tail, skip = backing[used:], max(0, used - backing.shape[0])
+
+    def minibatches(self, batch_size, min_batch_size=1):
+        """
+        Yields the minibatches of `batch_size` windows as strided views (in the layout given by `time_major`),
+        dropping a last batch smaller than `min_batch_size`. :func:`opendeep.utils.batch.minibatch` uses this
+        instead of collecting and copying the windows.
+
+        Parameters
+        ----------
+        batch_size : int
+            The number of windows in each minibatch.
+        min_batch_size : int, optional
+            The minimum number of windows in a minibatch.
+
+        Yields
+        ------
+        numpy array
+            The view of the minibatch of windows.
+        """
+        windows = WindowStream(self.stream, self.window_size, self.stride, batch_size, self.time_major,
+                               self.block_windows)
+        batch_axis = 1 if self.time_major else 0
+        for batch in windows:
+            if batch.shape[batch_axis] >= min_batch_size:
+                yield batch
+
+    def _windows(self, backing, n_windows):
+        """
+        Helper method to yield the windows (or batches of windows) as strided views of the backing array.
+        """
+        row_stride = backing.strides[0]
+        if not self.batch_size:
+            windows = as_strided(backing,
+                                 shape=(n_windows, self.window_size) + backing.shape[1:],
+                                 strides=(self.stride * row_stride,) + backing.strides)
+            for window in windows:
+                yield window
+            return
+
+        for start in range(0, n_windows, self.batch_size):
+            size = min(self.batch_size, n_windows - start)
+            offset = backing[start * self.stride:]
+            if self.time_major:
+                shape = (self.window_size, size) + backing.shape[1:]
+                strides = (row_stride, self.stride * row_stride) + backing.strides[1:]
+            else:
+                shape = (size, self.window_size) + backing.shape[1:]
+                strides = (self.stride * row_stride,) + backing.strides
+            yield as_strided(offset, shape=shape, strides=strides)
+
 class MinibatchStream:
     """
     Creates a list of iterable streams of minibatches from an input list of streams.
+
+    If `buffers` is given, each stream's batches are filled in place in a ring of that many preallocated numpy
+    arrays (see :class:`opendeep.utils.batch.BatchBuffers`) instead of building new arrays every batch. The yielded
+    batches are views of the buffers, so only the last `buffers` - 1 batches stay valid after the next one
+    is yielded.
     """
-    def __init__(self, streams, batch_size, min_batch_size=1):
+    def __init__(self, streams, batch_size, min_batch_size=1, buffers=None):
         self.streams = raise_to_list(streams)
         self.batch_size = batch_size
         self.min_batch_size = min_batch_size
+        self.buffers = buffers
 
     def __iter__(self):
         iters = [iter(stream) for stream in self.streams]
+        if self.buffers:
+            batch_buffers = [BatchBuffers(self.batch_size, self.buffers) for _ in iters]
+            fill = lambda i, it: batch_buffers[i].fill(it)
+        else:
+            fill = lambda i, it: list(itertools.islice(it, self.batch_size))
         while True:
-            chunks = [list(itertools.islice(it, self.batch_size)) for it in iters]
+            chunks = [fill(i, it) for i, it in enumerate(iters)]
             # if there was nothing returned by any slice, return (assures stops at shortest stream)
             if any([len(chunk) == 0 for chunk in chunks]):
                 return
@@ -2,6 +2,9 @@
 A wrapper object for generators of data from files.
 """
 import logging
+import functools
+import itertools
+import multiprocessing
 try:
     from PIL import Image
     has_pil = True
@@ -31,15 +34,44 @@ class FileStream(object):
         The number of tokens to start in the future (from the beginning of the first file). This is used often
         when creating language models and you want the targets stream to start 1 or more tokens in the future
         compared to the inputs stream.
+    processes : int, optional
+        The number of worker processes to spread the files across when reading and preprocessing them. If None or 1,
+        files are processed lazily in the main process. With worker processes, each file is read and preprocessed
+        as a whole by one worker.
+    chunksize : int, optional
+        The number of files to send to a worker process at a time.
+    ordered : bool, optional
+        Whether to yield the files' data in the order the files were found. If False, the data from each file is
+        yielded as soon as a worker finishes it.
     """
-    def __init__(self, path, filter=None, preprocess=None, n_future=None):
+    def __init__(self, path, filter=None, preprocess=None, n_future=None,
+                 processes=None, chunksize=1, ordered=True):
         self.path = path
         self.filter = filter
         self.preprocess = preprocess
         self.n_future = n_future or 0
+        self.processes = processes
+        self.chunksize = chunksize
+        self.ordered = ordered
 
     def __iter__(self):
+        if _use_pool(self.processes):
+            tokens = itertools.chain.from_iterable(
+                parallel_map(functools.partial(_read_file_tokens, preprocess=self.preprocess),
+                             find_files(self.path, self.filter),
+                             self.processes, self.chunksize, self.ordered)
+            )
+        else:
+            tokens = self._iter_tokens()
+
         idx = 0
+        for token in tokens:
+            if idx >= self.n_future:
+                yield token
+            else:
+                idx += 1
+
+    def _iter_tokens(self):
         for fname in find_files(self.path, self.filter):
             try:
                 with open(fname, 'r') as f:
@@ -48,10 +80,7 @@ class FileStream(object):
                             line = self.preprocess(line)
                         line = raise_to_list(line)
                         for token in line:
-                            if idx >= self.n_future:
-                                yield token
-                            else:
-                                idx += 1
+                            yield token
             except Exception as err:
                 _log.exception(err.__str__())
 
@@ -70,18 +99,31 @@ class FilepathStream(object):
     preprocess : function, optional
         A function to apply to the names of files found in the `path`. If a list is returned from
         the preprocess function, each element will be yielded separately during iteration.
+    processes : int, optional
+        The number of worker processes to run the `preprocess` function in. If None or 1, names are processed
+        in the main process.
+    chunksize : int, optional
+        The number of file names to send to a worker process at a time.
+    ordered : bool, optional
+        Whether to yield the results in the order the files were found.
     """
-    def __init__(self, path, filter=None, preprocess=None):
+    def __init__(self, path, filter=None, preprocess=None, processes=None, chunksize=1, ordered=True):
         self.path = path
         self.filter = filter
         self.preprocess = preprocess
+        self.processes = processes
+        self.chunksize = chunksize
+        self.ordered = ordered
 
     def __iter__(self):
-        for fname in find_files(self.path, self.filter):
-            if self.preprocess is not None and callable(self.preprocess):
-                fname = self.preprocess(fname)
-            fnames = raise_to_list(fname)
-            for name in fnames:
+        if self.preprocess is not None and callable(self.preprocess):
+            fnames = parallel_map(self.preprocess, find_files(self.path, self.filter),
+                                  self.processes, self.chunksize, self.ordered)
+        else:
+            fnames = find_files(self.path, self.filter)
+        for fname in fnames:
+            names = raise_to_list(fname)
+            for name in names:
                 yield name
 
 
@@ -99,23 +141,113 @@ class ImageStream(object):
         A function to apply to the image returned from files found in the `path`.
         If a list is returned from
         the preprocess function, each element will be yielded separately during iteration.
+    processes : int, optional
+        The number of worker processes to decode and preprocess the images in. If None or 1, images are decoded
+        in the main process.
+    chunksize : int, optional
+        The number of image files to send to a worker process at a time.
+    ordered : bool, optional
+        Whether to yield the images in the order the files were found.
     """
-    def __init__(self, path, filter=None, preprocess=None):
+    def __init__(self, path, filter=None, preprocess=None, processes=None, chunksize=1, ordered=True):
         if not has_pil:
             raise NotImplementedError("You need the PIL (pillow) Python package to use ImageStream.")
         self.path = path
         self.filter = filter
         self.preprocess = preprocess
+        self.processes = processes
+        self.chunksize = chunksize
+        self.ordered = ordered
 
     def __iter__(self):
-        for fname in find_files(self.path, self.filter):
-            try:
-                with Image.open(fname) as im:
-                    data = numpy.array(im)
-                    if self.preprocess is not None and callable(self.preprocess):
-                        data = self.preprocess(data)
-                    data = raise_to_list(data)
-                    for d in data:
-                        yield d
-            except Exception as err:
-                _log.exception(err.__str__())
+        images = parallel_map(functools.partial(_read_image, preprocess=self.preprocess),
+                              find_files(self.path, self.filter),
+                              self.processes, self.chunksize, self.ordered)
+        for data in images:
+            for d in data:
+                yield d
+
+
+def parallel_map(func, iterable, processes=None, chunksize=1, ordered=True):
+    """
+    Lazily maps a function over an iterable, spreading the work across a pool of worker processes.
+
+    The function is handed to the workers when they start instead of being pickled with every task, so lambdas
+    and closures work on platforms that fork new processes (like Linux). On platforms that spawn new processes,
+    `func` needs to be picklable.
+
+    Parameters
+    ----------
+    func : function
+        The function to apply to each element.
+    iterable : iterable
+        The elements to map over.
+    processes : int, optional
+        The number of worker processes. If None or 1, the map happens lazily in the current process.
+    chunksize : int, optional
+        The number of elements to send to a worker process at a time.
+    ordered : bool, optional
+        Whether to yield the results in the same order as `iterable`. If False, results are yielded as soon
+        as they are done.
+
+    Yields
+    ------
+    object
+        The result of `func` for each element.
+    """
+    if not _use_pool(processes):
+        for elem in iterable:
+            yield func(elem)
+        return
+
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(func,))
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for result in imap(_call_worker, iterable, chunksize):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _use_pool(processes):
+    return processes is not None and processes > 1
+
+# the function each worker process applies - set once when the worker starts
+_worker_func = None
+
+def _init_worker(func):
+    global _worker_func
+    _worker_func = func
+
+def _call_worker(elem):
+    return _worker_func(elem)
+
+def _read_file_tokens(fname, preprocess=None):
+    """
+    Reads a whole text file and returns the list of its (preprocessed) tokens.
+    """
+    tokens = []
+    try:
+        with open(fname, 'r') as f:
+            for line in f:
+                if preprocess is not None and callable(preprocess):
+                    line = preprocess(line)
+                tokens.extend(raise_to_list(line))
+    except Exception as err:
+        _log.exception(err.__str__())
+    return tokens
+
+def _read_image(fname, preprocess=None):
+    """
+    Decodes an image file and returns the list of its (preprocessed) image arrays.
+    """
+    try:
+        with Image.open(fname) as im:
+            data = numpy.array(im)
+            if preprocess is not None and callable(preprocess):
+                data = preprocess(data)
+            return raise_to_list(data)
+    except Exception as err:
+        _log.exception(err.__str__())
+        return []
@@ -0,0 +1,74 @@
+"""
+A wrapper object for prefetching elements of an iterable stream in the background.
+"""
+# standard libraries
+import sys
+import threading
+# third party libraries
+import six
+from six.moves import queue
+
+# markers for what the background worker put on the queue
+_ELEMENT, _DONE, _ERROR = range(3)
+
+
+class PrefetchStream(object):
+    """
+    Creates an iterable stream that keeps up to `buffer_size` elements from the input stream ready in a bounded
+    queue. A background thread iterates over the input stream (doing any file reading, preprocessing,
+    or batching work that the stream performs) while the consumer works on the previous elements.
+
+    Because Python iterators (and generators) can only be advanced by one thread at a time, a single worker thread
+    fills the queue - the input stream is consumed exactly in order. Any exception raised by the input stream is
+    re-raised in the consuming thread.
+
+    Parameters
+    ----------
+    stream : iterable
+        The input stream to prefetch.
+    buffer_size : int, optional
+        The maximum number of elements to keep ready in the queue.
+    """
+    def __init__(self, stream, buffer_size=4):
+        assert buffer_size > 0, "Need a buffer_size greater than 0, found %d" % buffer_size
+        self.stream = stream
+        self.buffer_size = buffer_size
+
+    def __iter__(self):
+        elements = queue.Queue(maxsize=self.buffer_size)
+        stop = threading.Event()
+
+        def put(item):
+            # keep trying to put on the queue until there is room or the consumer has gone away
+            while not stop.is_set():
+                try:
+                    elements.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def worker():
+            try:
+                for elem in self.stream:
+                    if not put((_ELEMENT, elem)):
+                        return
+                put((_DONE, None))
+            except Exception:
+                put((_ERROR, sys.exc_info()))
+
+        thread = threading.Thread(target=worker, name="PrefetchStream")
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                kind, value = elements.get()
+                if kind == _ELEMENT:
+                    yield value
+                elif kind == _DONE:
+                    return
+                else:
+                    six.reraise(*value)
+        finally:
+            # let the worker know to stop if the consumer finishes early (or errors)
+            stop.set()
@@ -0,0 +1,144 @@
+"""
+A wrapper object for aligned (input, target) streams where the targets are the inputs shifted into the future.
+"""
+# standard libraries
+import logging
+import itertools
+from collections import deque
+
+_log = logging.getLogger(__name__)
+
+# which view of the shared pass
+_INPUTS, _TARGETS = range(2)
+
+
+class ShiftedStream(object):
+    """
+    Creates aligned inputs and targets streams from a single stream, where the targets are the inputs starting
+    `n_future` elements in the future (like for language models). Iterating over this stream yields the
+    (input, target) pairs directly.
+
+    The `inputs` and `targets` attributes are separate iterable views that read the input stream only once
+    when they are iterated together (like when zipped into minibatches): both views read from a shared buffer
+    that only holds the elements between the two views' positions. If one view gets more than `max_lag` elements
+    (or `max_bytes` of array elements) ahead of the other (or is iterated on its own), the lagging view is detached
+    from the shared buffer and reads its own pass over the input stream instead - so the buffer never grows
+    unbounded.
+
+    Parameters
+    ----------
+    stream : iterable
+        The input stream to shift. It needs to be iterable more than once (like a :class:`FileStream`).
+    n_future : int, optional
+        The number of elements the targets start in the future compared to the inputs.
+    max_lag : int, optional
+        The maximum number of elements to keep in the shared buffer between the views.
+    max_bytes : int, optional
+        The maximum number of bytes (counting elements with an `nbytes`, like numpy arrays) to keep in the shared
+        buffer between the views. If None, only `max_lag` bounds the buffer.
+    """
+    def __init__(self, stream, n_future=1, max_lag=1 << 16, max_bytes=1 << 28):
+        assert n_future >= 0, "Need a non-negative n_future, found %d" % n_future
+        assert max_lag > n_future, "Need a max_lag (%d) greater than n_future (%d)" % (max_lag, n_future)
+        self.stream = stream
+        self.n_future = n_future
+        self.max_lag = max_lag
+        self.max_bytes = max_bytes
+        self.inputs = _ShiftedView(self, _INPUTS)
+        self.targets = _ShiftedView(self, _TARGETS)
+        # the pass started by one view that the other view hasn't joined yet
+        self._pass = None
+
+    def __iter__(self):
+        for pair in zip(self.inputs, self.targets):
+            yield pair
+
+    def _iter_view(self, view):
+        """
+        Joins the shared pass started by the other view (or starts a new pass) and iterates over it.
+        """
+        shared = self._pass
+        if shared is None or shared.joined[view] or shared.detached[view]:
+            shared = _SharedPass(iter(self.stream), self.n_future, self.max_lag, self.max_bytes)
+            self._pass = shared
+        else:
+            self._pass = None
+        return self._release(shared, shared.iterate(view, self.stream))
+
+    def _release(self, shared, elements):
+        """
+        Yields the elements of a view's pass, and stops referencing the pass when the view finishes it (if the other
+        view never joined, its buffer would otherwise be kept until the next pass).
+        """
+        for elem in elements:
+            yield elem
+        if self._pass is shared:
+            self._pass = None
+
+
+class _ShiftedView(object):
+    """
+    One of the inputs or targets views of a :class:`ShiftedStream`.
+    """
+    def __init__(self, shifted, view):
+        self.shifted = shifted
+        self.view = view
+
+    def __iter__(self):
+        return self.shifted._iter_view(self.view)
+
+
+class _SharedPass(object):
+    """
+    One pass over the input stream shared by the inputs and targets views.
+    """
+    def __init__(self, source, n_future, max_lag, max_bytes=None):
+        self.source = source
+        self.max_lag = max_lag
+        self.max_bytes = max_bytes
+        self.buffer = deque()
+        self.nbytes = 0
+        # the index in the input stream of buffer[0]
+        self.base = 0
+        self.done = False
+        self.positions = [0, n_future]
+        self.joined = [False, False]
+        self.detached = [False, False]
+
+    def iterate(self, view, stream):
+        self.joined[view] = True
+        while not self.detached[view]:
+            # read from the input stream until the buffer reaches this view's position
+            while self.positions[view] - self.base >= len(self.buffer) and not self.done:
+                try:
+                    elem = next(self.source)
+                    self.buffer.append(elem)
+                    self.nbytes += getattr(elem, 'nbytes', 0)
+                except StopIteration:
+                    self.done = True
+                if len(self.buffer) > self.max_lag or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                    # this view is at the front of the buffer, so the other view is the one lagging behind.
+                    _log.debug("Detaching the lagging view of ShiftedStream %d elements (%d bytes) behind.",
+                               len(self.buffer), self.nbytes)
+                    self.detached[1 - view] = True
+                    self._trim(self._min_position())
+            idx = self.positions[view] - self.base
+            if idx >= len(self.buffer):
+                return
+            elem = self.buffer[idx]
+            self.positions[view] += 1
+            self._trim(self._min_position())
+            yield elem
+
+        # this view was detached, so continue with its own pass over the stream
+        for elem in itertools.islice(iter(stream), self.positions[view], None):
+            yield elem
+
+    def _min_position(self):
+        attached = [pos for pos, detached in zip(self.positions, self.detached) if not detached]
+        return min(attached) if attached else self.positions[0]
+
+    def _trim(self, position):
+        while self.buffer and self.base < position:
+            self.nbytes -= getattr(self.buffer.popleft(), 'nbytes', 0)
+            self.base += 1
@@ -0,0 +1,64 @@
+import pickle
+import unittest
+import numpy
+from opendeep.data.stream.augmentstream import AugmentStream, augment_images
+
+
+class TestAugmentstream(unittest.TestCase):
+
+    def setUp(self):
+        # 3 batches of 4 uint8 bc01 images with different pixel values everywhere
+        pixels = numpy.arange(12 * 2 * 6 * 8) % 251
+        self.images = pixels.reshape((12, 2, 6, 8)).astype('uint8')
+        self.batches = [self.images[i:i + 4] for i in range(0, 12, 4)]
+
+    def testCrops(self):
+        crops = augment_images(self.images, crop_shape=(4, 5), flip=True, rng=numpy.random.RandomState(1),
+                               dtype='float32')
+        assert crops.shape == (12, 2, 4, 5) and crops.dtype == numpy.float32
+        # every augmented image is a window of its image, possibly flipped
+        for image, crop in zip(self.images, crops):
+            windows = [image[:, top:top + 4, left:left + 5] for top in range(3) for left in range(4)]
+            windows += [window[:, :, ::-1] for window in windows]
+            assert any(numpy.array_equal(window, crop) for window in windows)
+
+        # without randomness, the center is cropped and the per-channel mean subtracted
+        crops = augment_images(self.images, crop_shape=(4, 6), mean=[1, 2], rng=None)
+        expected = self.images[:, :, 1:5, 1:7] - numpy.asarray([1., 2.])[:, None, None]
+        assert numpy.array_equal(crops, expected)
+
+        # the same for the channels last
+        crops = augment_images(self.images.transpose(0, 2, 3, 1), crop_shape=(4, 6), mean=[1, 2], layout='b01c',
+                               rng=None)
+        assert numpy.array_equal(crops, expected.transpose(0, 2, 3, 1))
+
+        # scale jitter resamples windows of different sizes to the crop shape
+        crops = augment_images(self.images, crop_shape=(3, 4), scale_jitter=0.5, rng=numpy.random.RandomState(2))
+        assert crops.shape == (12, 2, 3, 4)
+
+    def testSeeds(self):
+        labels = numpy.arange(12)
+        stream = [[batch, labels[i:i + 4]] for i, batch in zip(range(0, 12, 4), self.batches)]
+        options = dict(crop_shape=(4, 4), flip=True, scale_jitter=0.2, seed=3)
+        augmented = AugmentStream(stream, **options)
+        first = list(augmented)
+        second = list(augmented)
+        assert len(first) == 3 and all(numpy.array_equal(batch[1], labels[i:i + 4])
+                                       for i, batch in zip(range(0, 12, 4), first))
+        # a new epoch gets new augmentations
+        assert not all(numpy.array_equal(a[0], b[0]) for a, b in zip(first, second))
+        # the augmentations only depend on the seed and epoch, not the workers
+        for workers in [dict(threads=2), dict(processes=2)]:
+            threaded = list(AugmentStream(stream, epoch=1, **dict(options, **workers)))
+            assert all(numpy.array_equal(a[0], b[0]) for a, b in zip(second, threaded)), str(workers)
+
+    def testPicklable(self):
+        # the function handed to worker processes can't hold the stream (like a generator), so it works with spawn
+        augmented = AugmentStream((batch for batch in self.batches), crop_shape=(4, 4), flip=True, seed=3)
+        augment = pickle.loads(pickle.dumps(augmented._augment_fn()))
+        elem = ((3, 0, 0), self.batches[0])
+        assert numpy.array_equal(augment(elem), augmented._augment_fn()(elem))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,13 @@
 import unittest
+import multiprocessing
+import os
 import shutil
+import tempfile
+import numpy
 from opendeep.utils.file_ops import mkdir_p
-from opendeep.data.stream.filestream import FileStream
+from opendeep.data.stream.filestream import FileStream, FilepathStream, ImageStream, has_pil
+if has_pil:
+    from PIL import Image
 
 
 class TestFilestream(unittest.TestCase):
@@ -273,9 +279,78 @@ class TestFilestream(unittest.TestCase):
             check_lines.remove(line)
         assert len(check_lines) == 0, "Didn't catch all lines, still have: %s" % str(check_lines)
 
+    def testProcesses(self):
+        check_lines = list(FileStream(path=self.base, preprocess=lambda s: list(s)))
+        fs = FileStream(path=self.base, preprocess=lambda s: list(s), processes=2)
+        lines = list(fs)
+        assert lines == check_lines, "Expected %s, found %s" % (str(check_lines), str(lines))
+
+        fs = FileStream(path=self.base, preprocess=lambda s: list(s), processes=2, ordered=False)
+        lines = list(fs)
+        assert sorted(lines) == sorted(check_lines), "Expected %s, found %s" % (str(check_lines), str(lines))
+
+    def testFilepathProcesses(self):
+        check_names = list(FilepathStream(path=self.base, preprocess=lambda f: [f, f.upper()]))
+        assert len(check_names) == 18
+        for chunksize in [1, 2]:
+            fs = FilepathStream(path=self.base, preprocess=lambda f: [f, f.upper()], processes=2,
+                                chunksize=chunksize)
+            names = list(fs)
+            assert names == check_names, "Expected %s, found %s" % (str(check_names), str(names))
+
+        fs = FilepathStream(path=self.base, preprocess=lambda f: [f, f.upper()], processes=2, ordered=False)
+        names = list(fs)
+        assert sorted(names) == sorted(check_names), "Expected %s, found %s" % (str(check_names), str(names))
+
+    def testFilepathProcessesStop(self):
+        children = set(multiprocessing.active_children())
+        it = iter(FilepathStream(path=self.base, preprocess=lambda f: f.upper(), processes=2))
+        next(it)
+        assert len(set(multiprocessing.active_children()) - children) == 2
+        # stopping the iteration early shuts down the pool
+        it.close()
+        assert set(multiprocessing.active_children()) == children, \
+            "Worker processes still running: %s" % str(set(multiprocessing.active_children()) - children)
+
     def tearDown(self):
             shutil.rmtree(self.base)
 
 
+@unittest.skipIf(not has_pil, "PIL (pillow) isn't installed")
+class TestImagestream(unittest.TestCase):
+
+    def setUp(self):
+        # solid color images with their index as the red channel
+        self.dir = tempfile.mkdtemp()
+        for i in range(6):
+            Image.new('RGB', (4, 3), color=(i, 0, 255)).save(os.path.join(self.dir, "image_%d.png" % i))
+
+    def testProcesses(self):
+        check_images = list(ImageStream(self.dir, preprocess=lambda im: im[:, :, 0]))
+        assert len(check_images) == 6
+        for chunksize in [1, 4]:
+            images = list(ImageStream(self.dir, preprocess=lambda im: im[:, :, 0], processes=2, chunksize=chunksize))
+            assert len(images) == len(check_images)
+            assert all(numpy.array_equal(image, check) for image, check in zip(images, check_images)), \
+                "Expected %s, found %s" % (str([c[0, 0] for c in check_images]), str([im[0, 0] for im in images]))
+
+        images = list(ImageStream(self.dir, preprocess=lambda im: im[:, :, 0], processes=2, ordered=False))
+        assert sorted(image[0, 0] for image in images) == sorted(check[0, 0] for check in check_images)
+
+    def testProcessesStop(self):
+        children = set(multiprocessing.active_children())
+        it = iter(ImageStream(self.dir, processes=2))
+        image = next(it)
+        assert image.shape == (3, 4, 3)
+        assert len(set(multiprocessing.active_children()) - children) == 2
+        # stopping the iteration early shuts down the pool
+        it.close()
+        assert set(multiprocessing.active_children()) == children, \
+            "Worker processes still running: %s" % str(set(multiprocessing.active_children()) - children)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from opendeep.data.stream.modifystream import ModifyStream
-from opendeep.data.stream.batchstream import BufferStream
+from opendeep.data.stream.batchstream import BufferStream, MinibatchStream, WindowStream
+from opendeep.utils.batch import minibatch, iterable_minibatch
 
 class TestModifystream(unittest.TestCase):
 
@@ -31,6 +32,51 @@ class TestModifystream(unittest.TestCase):
         for idx, elem in enumerate(bs):
             assert elem == answer[idx], "Expected %d, found %s" % (answer[idx], str(elem))
 
+    def testMinibatchBuffers(self):
+        inputs = [[i, i] for i in range(5)]
+        targets = list(range(5))
+        answer = [(x.tolist(), y.tolist()) for x, y in MinibatchStream([inputs, targets], 2)]
+
+        ms = MinibatchStream([inputs, targets], 2, buffers=2)
+        for idx, (x, y) in enumerate(ms):
+            assert (x.tolist(), y.tolist()) == answer[idx], \
+                "Expected %s, found %s" % (str(answer[idx]), str((x.tolist(), y.tolist())))
+        assert idx == 2
+
+    def testWindow(self):
+        testStream = list(range(10))
+        for stride in [None, 1, 3, 5]:
+            for block_windows in [1, 4]:
+                step = stride or 4
+                answer = [testStream[i:i + 4] for i in range(0, 7, step)]
+                ws = WindowStream(testStream, 4, stride, block_windows=block_windows)
+                windows = [window.tolist() for window in ws]
+                assert windows == answer, "Expected %s, found %s" % (str(answer), str(windows))
+
+    def testWindowBatches(self):
+        testStream = [[i, -i] for i in range(10)]
+        answer = [testStream[i:i + 3] for i in range(0, 8, 2)]
+        ws = WindowStream(testStream, 3, 2, batch_size=3, time_major=True)
+        batches = list(ws)
+        assert [batch.shape for batch in batches] == [(3, 3, 2), (3, 1, 2)], \
+            "Expected shapes (3, 3, 2) and (3, 1, 2), found %s" % str([batch.shape for batch in batches])
+        windows = [window.tolist() for batch in batches for window in batch.swapaxes(0, 1)]
+        assert windows == answer, "Expected %s, found %s" % (str(answer), str(windows))
+        # the batches are views without copies
+        assert batches[0].base is not None and not batches[0].flags['OWNDATA']
+
+    def testWindowMinibatches(self):
+        testStream = [[i, -i] for i in range(12)]
+        ws = WindowStream(testStream, 3, 1)
+        answer = [batch.tolist() for batch in iterable_minibatch(WindowStream(testStream, 3, 1), 4)]
+        batches = list(minibatch(ws, 4))
+        assert [batch.tolist() for batch in batches] == answer, \
+            "Expected %s, found %s" % (str(answer), str([batch.tolist() for batch in batches]))
+        # the minibatches are views of the windows' backing arrays instead of copies
+        assert all(not batch.flags['OWNDATA'] for batch in batches)
+        # a last batch smaller than min_batch_size is dropped
+        assert len(list(minibatch(ws, 4, min_batch_size=3))) == len(answer) - 1
+
     def tearDown(self):
         pass
 
@@ -0,0 +1,41 @@
+import unittest
+from opendeep.data.stream.prefetchstream import PrefetchStream
+
+
+class TestPrefetchstream(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = list(range(100))
+
+    def testOrder(self):
+        ps = PrefetchStream(self.stream, buffer_size=4)
+        # iterate twice to make sure the stream can be reused
+        for _ in range(2):
+            elems = [elem for elem in ps]
+            assert elems == self.stream, "Expected %s, found %s" % (str(self.stream), str(elems))
+
+    def testEarlyStop(self):
+        ps = PrefetchStream(self.stream, buffer_size=2)
+        for idx, elem in enumerate(ps):
+            assert elem == idx, "Expected %d, found %s" % (idx, str(elem))
+            if idx == 10:
+                break
+
+    def testError(self):
+        def bad_stream():
+            yield 1
+            raise ValueError("bad element")
+
+        ps = PrefetchStream(bad_stream(), buffer_size=2)
+        try:
+            _ = [elem for elem in ps]
+            raise AssertionError("PrefetchStream didn't raise the error from the input stream.")
+        except ValueError:
+            pass
+
+    def tearDown(self):
+        del self.stream
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from opendeep.data.stream.shiftedstream import ShiftedStream
+from opendeep.utils.batch import minibatch
+from opendeep.utils.misc import min_normalized_izip
+
+
+class CountingStream(object):
+    """
+    A stream that keeps track of how many passes were made over it.
+    """
+    def __init__(self, n):
+        self.n = n
+        self.passes = 0
+
+    def __iter__(self):
+        self.passes += 1
+        return iter(range(self.n))
+
+
+class TestShiftedstream(unittest.TestCase):
+
+    def testPairs(self):
+        for n_future in [0, 1, 3]:
+            ss = ShiftedStream(list(range(20)), n_future=n_future)
+            pairs = list(ss)
+            expected = [(i, i + n_future) for i in range(20 - n_future)]
+            assert pairs == expected, "Expected %s, found %s" % (str(expected), str(pairs))
+
+    def testSinglePass(self):
+        stream = CountingStream(50)
+        ss = ShiftedStream(stream, n_future=2, max_lag=8)
+        for epoch in range(3):
+            batches = list(min_normalized_izip(minibatch(ss.inputs, 4), minibatch(ss.targets, 4)))
+            assert len(batches) == 12, "Expected 12 batches, found %d" % len(batches)
+            for inputs, targets in batches:
+                assert (targets == inputs + 2).all(), "Expected %s, found %s" % (str(inputs + 2), str(targets))
+            assert stream.passes == epoch + 1, "Expected %d passes, found %d" % (epoch + 1, stream.passes)
+
+    def testSeparateViews(self):
+        stream = CountingStream(50)
+        ss = ShiftedStream(stream, n_future=1, max_lag=8)
+        inputs, targets = list(ss.inputs), list(ss.targets)
+        assert inputs == list(range(50)), "Expected %s, found %s" % (str(list(range(50))), str(inputs))
+        assert targets == list(range(1, 50)), "Expected %s, found %s" % (str(list(range(1, 50))), str(targets))
+
+    def testMaxBytes(self):
+        stream = SizedStream(50, nbytes=8)
+        ss = ShiftedStream(stream, n_future=1, max_bytes=64)
+        inputs, targets = [elem.value for elem in ss.inputs], [elem.value for elem in ss.targets]
+        assert inputs == list(range(50)), "Expected %s, found %s" % (str(list(range(50))), str(inputs))
+        assert targets == list(range(1, 50)), "Expected %s, found %s" % (str(list(range(1, 50))), str(targets))
+        # the inputs view went past the byte limit on its own, so the targets made their own pass
+        assert stream.passes == 2, "Expected 2 passes, found %d" % stream.passes
+
+    def testReleasePass(self):
+        ss = ShiftedStream(list(range(20)), n_future=1, max_lag=100)
+        inputs = list(ss.inputs)
+        assert inputs == list(range(20))
+        assert ss._pass is None, "The finished pass is still referenced."
+
+
+class SizedElement(object):
+    def __init__(self, value, nbytes):
+        self.value = value
+        self.nbytes = nbytes
+
+
+class SizedStream(CountingStream):
+    """
+    A counting stream of elements with a size in bytes.
+    """
+    def __init__(self, n, nbytes):
+        super(SizedStream, self).__init__(n)
+        self.nbytes = nbytes
+
+    def __iter__(self):
+        return (SizedElement(i, self.nbytes) for i in super(SizedStream, self).__iter__())
+
+
+if __name__ == '__main__':
+    unittest.main()
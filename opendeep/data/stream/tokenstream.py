@@ -0,0 +1,152 @@
+"""
+A wrapper object for streams of vocabulary ids from text files, with an optional on-disk cache of the ids.
+"""
+# standard libraries
+import logging
+import os
+import functools
+# third party libraries
+import numpy
+# internal imports
+from opendeep.data.stream.filestream import FileStream, parallel_map
+from opendeep.utils.file_ops import find_files, mkdir_p, atomic_file, atomic_save_npy
+
+_log = logging.getLogger(__name__)
+
+# number of ids to read from the cached file at a time.
+_READ_IDS = 1 << 16
+
+
+class TokenIdStream(object):
+    """
+    Creates an iterable stream of int32 vocabulary ids for the tokens in text-based files.
+
+    With a `cache_file`, the first full pass over the stream also writes the ids (as raw int32) to
+    ``cache_file + '.ids'`` along with the offsets of each file's ids to ``cache_file + '.offsets.npy'``.
+    Every pass after that (including from other streams or runs using the same `cache_file`) memory-maps the ids
+    file and never reads, preprocesses, or looks up the tokens again. The offsets file is written last, so a pass
+    that stopped early never leaves a partial cache behind.
+
+    Parameters
+    ----------
+    path : str or iterable(str)
+        The filesystem path to stream, or an iterable of filenames.
+    filter : str or compiled regex, optional
+        The regex filter to apply to the `path` when finding files.
+    preprocess : function, optional
+        A function to apply to each line returned from files found in the `path` to create its tokens
+        (see :class:`FileStream`).
+    vocab : dict
+        The dictionary mapping token: integer id.
+    unk_token : str, optional
+        The token to use for tokens that aren't in the `vocab`.
+    n_future : int, optional
+        The number of ids to start in the future (from the beginning of the first file).
+    cache_file : str, optional
+        The path prefix to save the cached ids and offsets to. If None, the ids are not cached.
+    processes : int, optional
+        The number of worker processes to tokenize the files in (see :func:`parallel_map`).
+    chunksize : int, optional
+        The number of files to send to a worker process at a time.
+    """
+    def __init__(self, path, filter=None, preprocess=None, vocab=None, unk_token="<UNK>", n_future=None,
+                 cache_file=None, processes=None, chunksize=1):
+        assert vocab is not None, "Need a vocab dictionary to create token ids!"
+        self.path = path
+        self.filter = filter
+        self.preprocess = preprocess
+        self.vocab = vocab
+        self.unk_token = unk_token
+        self.n_future = n_future or 0
+        self.cache_file = cache_file
+        self.processes = processes
+        self.chunksize = chunksize
+
+    def is_cached(self):
+        """
+        Returns
+        -------
+        bool
+            Whether the ids have been written to the `cache_file`.
+        """
+        return self.cache_file is not None and os.path.isfile(self.cache_file + '.offsets.npy')
+
+    def get_ids(self):
+        """
+        Returns the cached ids of all the files as a read-only memory-mapped array (or None if they aren't
+        cached yet).
+
+        Returns
+        -------
+        numpy.memmap or numpy.ndarray
+            The 1D int32 array of ids.
+        """
+        if not self.is_cached():
+            return None
+        offsets = self.get_offsets()
+        if offsets[-1] == 0:
+            # can't memory-map an empty file
+            return numpy.zeros((0,), dtype='int32')
+        return numpy.memmap(self.cache_file + '.ids', dtype='int32', mode='r', shape=(int(offsets[-1]),))
+
+    def get_offsets(self):
+        """
+        Returns the offsets of each file's ids in the cached ids (or None if they aren't cached yet). The ids of
+        file i are ids[offsets[i]:offsets[i+1]].
+
+        Returns
+        -------
+        numpy.ndarray
+            The 1D int64 array of offsets, with length n_files + 1.
+        """
+        if not self.is_cached():
+            return None
+        return numpy.load(self.cache_file + '.offsets.npy')
+
+    def __iter__(self):
+        if self.is_cached():
+            ids = self.get_ids()
+            for start in range(self.n_future, ids.shape[0], _READ_IDS):
+                for token_id in ids[start:start + _READ_IDS]:
+                    yield token_id
+        else:
+            idx = 0
+            for file_ids in self._write_ids():
+                for token_id in file_ids[max(0, self.n_future - idx):]:
+                    yield token_id
+                idx += file_ids.shape[0]
+
+    def _write_ids(self):
+        """
+        Creates the ids for each file (in parallel if there are worker processes), yielding them while writing them
+        to the cache.
+        """
+        encode_file = functools.partial(_encode_file, preprocess=self.preprocess,
+                                        vocab=self.vocab, unk_token=self.unk_token)
+        files_ids = parallel_map(encode_file, find_files(self.path, self.filter), self.processes, self.chunksize)
+        if self.cache_file is None:
+            for file_ids in files_ids:
+                yield file_ids
+            return
+
+        cache_dir = os.path.dirname(os.path.realpath(self.cache_file))
+        mkdir_p(cache_dir)
+        # atomic_file writes to unique temporary names, so streams sharing the cache_file can be iterated together
+        offsets = [0]
+        with atomic_file(self.cache_file + '.ids') as ids_tmp:
+            with open(ids_tmp, 'wb') as f:
+                for file_ids in files_ids:
+                    f.write(file_ids.tobytes())
+                    offsets.append(offsets[-1] + file_ids.shape[0])
+                    yield file_ids
+        # the offsets mark the cache as done, so move them into place after the ids
+        atomic_save_npy(self.cache_file + '.offsets.npy', numpy.asarray(offsets, dtype='int64'))
+        _log.debug("Saved %d token ids from %d files to %s", offsets[-1], len(offsets) - 1, self.cache_file)
+
+def _encode_file(fname, preprocess=None, vocab=None, unk_token=None):
+    """
+    Returns the int32 array of vocab ids for the tokens in a single file.
+    """
+    unk = vocab.get(unk_token)
+    return numpy.fromiter((vocab.get(token, unk) for token in FileStream([fname], preprocess=preprocess)),
+                          dtype='int32')
@@ -2,6 +2,8 @@
 from __future__ import print_function
 import unittest
 import os
+import shutil
+import tempfile
 try:
     from itertools import izip as zip
 except ImportError: # will be 3.x series
@@ -61,6 +63,95 @@ class TestCharsDataset(unittest.TestCase):
 
             del dataset
 
+    def testIndexOutput(self):
+        one_hot = TextDataset(path=self.shakespeare, level="char", target_n_future=1)
+        index = TextDataset(path=self.shakespeare, level="char", target_n_future=1, output='index')
+        for i, (oh_char, char, label) in enumerate(zip(one_hot.train_inputs, index.train_inputs, index.train_targets)):
+            if i >= self.n_chars - 1:
+                break
+            assert char.dtype == np.int32, "Expected int32 ids, found %s" % str(char.dtype)
+            assert char == np.argmax(oh_char), "Expected id %d at index %d, found %d" % (np.argmax(oh_char), i, char)
+            assert index.vocab_inverse[int(char)] == self.first_n_chars[i]
+            assert index.label_vocab_inverse[int(label)] == self.first_n_chars[i+1]
+        del one_hot, index
+
+        dataset = TextDataset(path=self.shakespeare, level="char", sequence_length=5, output='index')
+        char_seq = next(iter(dataset.train_inputs))
+        assert char_seq.shape == (5,) and char_seq.dtype == np.int32, \
+            "Expected an int32 id sequence with shape (5,), found %s %s" % (str(char_seq.shape), str(char_seq.dtype))
+        chars = [dataset.vocab_inverse[int(char)] for char in char_seq]
+        assert chars == self.first_n_chars[:5], "Expected %s, found %s" % (str(self.first_n_chars[:5]), str(chars))
+
+        dataset = TextDataset(path=self.shakespeare, level="char", sequence_length=5, sequence_stride=2,
+                              output='index')
+        for i, char_seq in enumerate(dataset.train_inputs):
+            if i >= 4:
+                break
+            chars = [dataset.vocab_inverse[int(char)] for char in char_seq]
+            expected = self.first_n_chars[i*2:i*2 + 5]
+            assert chars == expected, "Expected %s, found %s" % (str(expected), str(chars))
+
+    def testVocab(self):
+        with open(self.shakespeare, 'r') as f:
+            counts = {}
+            order = []
+            for char in f.read():
+                if char not in counts:
+                    order.append(char)
+                counts[char] = counts.get(char, 0) + 1
+        dataset = TextDataset(path=self.shakespeare, level="char")
+        assert len(dataset.vocab) == len(counts) + 1, \
+            "Expected %d tokens, found %d" % (len(counts) + 1, len(dataset.vocab))
+        # without pruning, tokens are numbered in the order they first appear
+        found = [dataset.vocab_inverse[i] for i in range(1, len(dataset.vocab))]
+        assert found == order, "Expected the vocab order %s, found %s" % (str(order), str(found))
+
+        # when pruning, the most frequent tokens come first
+        pruned = TextDataset(path=self.shakespeare, level="char", min_count=3, max_size=10)
+        assert len(pruned.vocab) == 10, "Expected 10 tokens, found %d" % len(pruned.vocab)
+        assert pruned.vocab_inverse[1] == max(counts, key=lambda c: (counts[c], -ord(c)))
+        pruned_counts = [counts[pruned.vocab_inverse[i]] for i in range(1, len(pruned.vocab))]
+        assert min(pruned_counts) >= 3 and pruned_counts == sorted(pruned_counts, reverse=True)
+
+        parallel = TextDataset(path=self.shakespeare, level="char", processes=2)
+        assert parallel.vocab == dataset.vocab
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cached = TextDataset(path=self.shakespeare, level="char", min_count=3, cache_dir=cache_dir)
+            assert len(os.listdir(cache_dir)) == 1, "Expected the vocab to be saved, found %s" % os.listdir(cache_dir)
+            loaded = TextDataset(path=self.shakespeare, level="char", min_count=3, cache_dir=cache_dir)
+            assert len(os.listdir(cache_dir)) == 1 and loaded.vocab == cached.vocab
+            # different vocab options get their own file
+            TextDataset(path=self.shakespeare, level="word", cache_dir=cache_dir)
+            assert len(os.listdir(cache_dir)) == 2, "Expected a new vocab file, found %s" % os.listdir(cache_dir)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def testCacheTokens(self):
+        expected = TextDataset(path=self.shakespeare, level="word", target_n_future=1, output='index')
+        expected = (list(expected.train_inputs), list(expected.train_targets))
+        cache_dir = tempfile.mkdtemp()
+        try:
+            for _ in range(2):
+                dataset = TextDataset(path=self.shakespeare, level="word", target_n_future=1, output='index',
+                                      cache_dir=cache_dir, cache_tokens=True)
+                for _ in range(2):
+                    found = (list(dataset.train_inputs), list(dataset.train_targets))
+                    assert found == expected, "Expected %s, found %s" % (str(expected), str(found))
+                id_stream = dataset.train_inputs.shifted.stream
+                assert id_stream.is_cached()
+                ids = id_stream.get_ids()
+                assert isinstance(ids, np.memmap) and ids.tolist() == expected[0]
+            # the cached ids and offsets, along with the vocab file
+            assert len(os.listdir(cache_dir)) == 3, "Expected 3 cache files, found %s" % os.listdir(cache_dir)
+
+            one_hot = TextDataset(path=self.shakespeare, level="word", cache_dir=cache_dir, cache_tokens=True)
+            for i, word in enumerate(one_hot.train_inputs):
+                assert np.argmax(word) == expected[0][i]
+        finally:
+            shutil.rmtree(cache_dir)
+
     def testLevels(self):
         # char
         dataset = TextDataset(path=self.shakespeare,
@@ -0,0 +1,69 @@
+# standard libraries
+import unittest
+import os
+import shutil
+import tempfile
+# third party
+import numpy
+# internal references
+from opendeep.data.dataset_image import ImageDataset, has_pil
+if has_pil:
+    from PIL import Image
+
+
+@unittest.skipIf(not has_pil, "PIL (pillow) isn't installed")
+class TestImageDataset(unittest.TestCase):
+
+    def setUp(self):
+        # solid color images of different sizes, with the label as the red channel
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "images")
+        self.cache_dir = os.path.join(self.dir, "cache")
+        os.mkdir(self.path)
+        for i, size in enumerate([(8, 6), (5, 5), (3, 9), (12, 4)]):
+            subset = 'test' if i == 3 else 'train'
+            Image.new('RGB', size, color=(i, 10 * i, 255)).save(os.path.join(self.path, "%s_%d.png" % (subset, i)))
+        # a file that can't be decoded
+        with open(os.path.join(self.path, "train_bad.png"), 'wb') as f:
+            f.write(b'not an image')
+
+    def _dataset(self, **kwargs):
+        return ImageDataset(self.path, train_filter='.*train.*', test_filter='.*test.*',
+                            image_shape=(4, 4), labels=lambda f: int(f[-5]) if f[-5].isdigit() else -1,
+                            cache_dir=self.cache_dir, **kwargs)
+
+    def testCache(self):
+        dataset = self._dataset()
+        assert dataset.train_inputs.shape == (3, 3, 4, 4) and dataset.train_inputs.dtype == numpy.uint8
+        assert dataset.test_inputs.shape == (1, 3, 4, 4)
+        assert dataset.valid_inputs is None
+        # the bad file was left out of the index
+        assert sorted(os.path.basename(f) for f in dataset.train_index['file']) == ['train_0.png', 'train_1.png',
+                                                                                    'train_2.png']
+        assert sorted(dataset.train_targets) == [0, 1, 2]
+        for images, labels in [(dataset.train_inputs, dataset.train_targets),
+                               (dataset.test_inputs, dataset.test_targets)]:
+            assert numpy.array_equal(images[:, 0], numpy.ones_like(images[:, 0]) * labels[:, None, None])
+            assert numpy.array_equal(images[:, 1], numpy.ones_like(images[:, 1]) * 10 * labels[:, None, None])
+            assert numpy.all(numpy.asarray(images[:, 2]) == 255)
+
+        # the second load reads the cache instead of decoding the files again
+        cached = sorted(os.listdir(self.cache_dir))
+        mtimes = [os.stat(os.path.join(self.cache_dir, f)).st_mtime for f in cached]
+        dataset = self._dataset()
+        assert isinstance(dataset.train_inputs, numpy.memmap)
+        assert sorted(os.listdir(self.cache_dir)) == cached
+        assert [os.stat(os.path.join(self.cache_dir, f)).st_mtime for f in cached] == mtimes
+        assert sorted(dataset.train_targets) == [0, 1, 2]
+
+        # other options are a new cache
+        dataset = self._dataset(mode='L', layout='b01c', crop=False)
+        assert dataset.train_inputs.shape == (3, 4, 4, 1)
+        assert len(os.listdir(self.cache_dir)) == 2 * len(cached)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# standard libraries
+import unittest
+import os
+import shutil
+import tempfile
+# third party
+import numpy
+# internal references
+from opendeep.data.dataset_hdf5 import HDF5Dataset, HAS_H5PY
+from opendeep.utils.batch import minibatch
+if HAS_H5PY:
+    import h5py
+
+
+@unittest.skipIf(not HAS_H5PY, "h5py isn't installed")
+class TestHDF5Dataset(unittest.TestCase):
+
+    def setUp(self):
+        # create the hdf5 file for the dataset
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "data.h5")
+        self.inputs = numpy.arange(50, dtype='float32').reshape((25, 2))
+        self.targets = numpy.arange(25, dtype='int64')
+        with h5py.File(self.path, 'w') as f:
+            f.create_dataset("train/inputs", data=self.inputs, chunks=(4, 2), compression="gzip")
+            f.create_dataset("train/targets", data=self.targets, chunks=(4,))
+            f.create_dataset("test/inputs", data=self.inputs[:5])
+        self.dataset = HDF5Dataset(self.path, cache_chunks=2)
+
+    def testSubsets(self):
+        assert self.dataset.train_inputs.chunk_rows == 4
+        assert self.dataset.valid_inputs is None and self.dataset.valid_targets is None
+        assert self.dataset.test_targets is None
+        assert numpy.array_equal(self.dataset.test_inputs[:], self.inputs[:5])
+
+    def testSlicing(self):
+        inputs = self.dataset.train_inputs
+        assert numpy.array_equal(inputs[3:17], self.inputs[3:17])
+        assert numpy.array_equal(inputs[-1], self.inputs[-1])
+        assert numpy.array_equal(inputs[[20, 1, 5]], self.inputs[[20, 1, 5]])
+        assert numpy.array_equal(inputs[2:11, 1], self.inputs[2:11, 1])
+        assert len(inputs._cache) <= 2
+
+    def testMinibatch(self):
+        batches = list(minibatch(self.dataset.train_targets, batch_size=8))
+        assert len(batches) == 4
+        assert numpy.array_equal(numpy.concatenate(batches), self.targets)
+
+    def tearDown(self):
+        self.dataset.close()
+        del self.dataset
+        shutil.rmtree(self.dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,13 @@
 # standard libraries
 import unittest
+import os
+import shutil
+import tempfile
 # third party
 import numpy
 # internal references
-from opendeep.data.dataset_memory import NumpyDataset
+from opendeep.data.dataset_memory import NumpyDataset, MemmapDataset
+from opendeep.utils.batch import numpy_minibatch
 
 class TestMemoryDataset(unittest.TestCase):
 
@@ -28,5 +32,39 @@ class TestMemoryDataset(unittest.TestCase):
         del self.dataset, self.train, self.valid, self.test
 
 
+class TestMemmapDataset(unittest.TestCase):
+
+    def setUp(self):
+        # create the files for the dataset
+        self.dir = tempfile.mkdtemp()
+        self.inputs = numpy.arange(20, dtype='float32').reshape((10, 2))
+        self.targets = numpy.arange(10, dtype='int64')
+        self.inputs_path = os.path.join(self.dir, "inputs.npy")
+        numpy.save(self.inputs_path, self.inputs)
+        self.targets_path = os.path.join(self.dir, "targets.raw")
+        self.targets.tofile(self.targets_path)
+        self.dataset = MemmapDataset(train_inputs=self.inputs_path,
+                                     train_targets={'filename': self.targets_path, 'dtype': 'int64', 'shape': (10,)},
+                                     train_split=.6, valid_split=.2)
+
+    def testSplits(self):
+        assert isinstance(self.dataset.train_inputs, numpy.memmap)
+        assert numpy.array_equal(self.dataset.train_inputs, self.inputs[:6])
+        assert numpy.array_equal(self.dataset.train_targets, self.targets[:6])
+        assert numpy.array_equal(self.dataset.valid_inputs, self.inputs[6:8])
+        assert numpy.array_equal(self.dataset.valid_targets, self.targets[6:8])
+        assert numpy.array_equal(self.dataset.test_inputs, self.inputs[8:])
+        assert numpy.array_equal(self.dataset.test_targets, self.targets[8:])
+
+    def testMinibatch(self):
+        batches = list(numpy_minibatch(self.dataset.train_inputs, batch_size=4))
+        assert len(batches) == 2
+        assert numpy.array_equal(numpy.concatenate(batches), self.inputs[:6])
+
+    def tearDown(self):
+        del self.dataset
+        shutil.rmtree(self.dir)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import numpy
+from opendeep.data.standard_datasets.midi.midi_dataset import piano_rolls, PianoRollArray
+from opendeep.utils.batch import minibatch, shuffle_indices
+
+
+class TestMidiDataset(unittest.TestCase):
+
+    def testPianoRolls(self):
+        # (pitch, start, end) notes of two pieces - with overlapping notes on the same pitch
+        notes = numpy.asarray([[0, 0, 2], [3, 1, 4], [0, 1, 3],
+                               [2, 0, 1], [2, 2, 3]], dtype='int32')
+        pieces = numpy.asarray([[0, 3, 5], [3, 5, 3]], dtype='int64')
+        expected = numpy.zeros((8, 4), dtype='float32')
+        expected[0:3, 0] = 1
+        expected[1:4, 3] = 1
+        expected[5 + 0:5 + 1, 2] = 1
+        expected[5 + 2:5 + 3, 2] = 1
+        rolls = piano_rolls(notes, pieces, n_pitches=4, dtype='float32')
+        assert rolls.dtype == numpy.float32
+        assert numpy.array_equal(rolls, expected), "Expected\n%s\nfound\n%s" % (str(expected), str(rolls))
+
+        # just the second piece
+        rolls = piano_rolls(notes, pieces[1:], n_pitches=4, dtype='float32')
+        assert numpy.array_equal(rolls, expected[5:]), "Expected\n%s\nfound\n%s" % (str(expected[5:]), str(rolls))
+
+    def testPianoRollArray(self):
+        rng = numpy.random.RandomState(1)
+        starts = rng.randint(0, 50, size=40)
+        ends = numpy.minimum(starts + rng.randint(1, 10, size=40), 50)
+        pitches = rng.randint(0, 8, size=40)
+        dense = piano_rolls(numpy.stack([pitches, starts, ends], axis=1), numpy.asarray([[0, 40, 50]]), 8)
+        rolls = PianoRollArray(pitches, starts, ends, length=50, n_pitches=8)
+        assert rolls.shape == dense.shape and rolls.dtype == dense.dtype
+        assert numpy.array_equal(numpy.asarray(rolls), dense)
+        for key in [slice(3, 17), slice(45, 60), slice(None, None, 3), slice(-5, None), 7, -1,
+                    numpy.asarray([4, 0, 49, 4]), (slice(10, 20), slice(2, 5))]:
+            assert numpy.array_equal(rolls[key], dense[key]), "Rows differ for key %s" % str(key)
+        # shuffled minibatches are only made dense a batch at a time
+        indices = shuffle_indices(50)
+        for x, y in zip(minibatch(rolls, 16, indices=indices), minibatch(dense, 16, indices=indices)):
+            assert numpy.array_equal(x, y)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,11 +3,19 @@ Generic structure for a dataset reading from a file or directory.
 """
 # standard libraries
 import logging
+import os
 import time
+import types
 import warnings
-import itertools
+import functools
+from collections import Counter, OrderedDict
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 # third party
 import numpy
+from six import string_types
 try:
     import nltk
     NLTK_AVAILABLE = True
@@ -15,13 +23,19 @@ except ImportError:
     NLTK_AVAILABLE = False
 # internal imports
 from opendeep.data.dataset_file import FileDataset
-from opendeep.data.stream.filestream import FileStream
+from opendeep.data.stream.filestream import FileStream, parallel_map
 from opendeep.data.stream.modifystream import ModifyStream
-from opendeep.data.stream.batchstream import BufferStream
+from opendeep.data.stream.batchstream import WindowStream
+from opendeep.data.stream.shiftedstream import ShiftedStream
+from opendeep.data.stream.tokenstream import TokenIdStream
+from opendeep.utils.file_ops import find_files, mkdir_p, file_cache_key, atomic_file
 from opendeep.utils.misc import numpy_one_hot, make_time_units_string, compose
 
 log = logging.getLogger(__name__)
 
+# changes whenever the way vocabs are compiled changes, so older cached vocabs aren't loaded
+_VOCAB_VERSION = 2
+
 class TextDataset(FileDataset):
     """
     This gives a file-based dataset for working with text (either characters or words).
@@ -30,10 +44,11 @@ class TextDataset(FileDataset):
     def __init__(self, path, source=None, train_filter=None, valid_filter=None, test_filter=None,
                  inputs_preprocess=None, targets_preprocess=None,
                  vocab=None, label_vocab=None, unk_token="<UNK>", level="char", target_n_future=None,
-                 sequence_length=False):
+                 sequence_length=False, sequence_stride=None, processes=None, output='one_hot',
+                 min_count=1, max_size=None, cache_dir=None, cache_tokens=False):
         """
-        Initialize a text-based dataset. It will output one-hot vector encodings for the appropriate level (word,
-        char, line).
+        Initialize a text-based dataset. It will output one-hot vector encodings (or integer ids) for the
+        appropriate level (word, char, line).
 
         Parameters
         ----------
@@ -74,10 +89,40 @@ class TextDataset(FileDataset):
             For creating language models that predict tokens in the future, this determines the skip size (number of
             steps in the future) that the language model will try to predict as its target. Most language models will
             have target_n_future=1. If `target_n_future` is not None, the targets will be created from the inputs
-            (but still apply targets_preprocess instead of inputs_preprocess if it is different).
+            (ignoring targets_preprocess) - each file is read and tokenized once for both the inputs and targets
+            (see :class:`opendeep.data.stream.ShiftedStream`).
         sequence_length : int, optional
             The maximum length of subsequences to iterate over this dataset. If this is None or False, the data
             will just be supplied as a stream of one-hot vectors rather than broken into 2-D one-hot vector sequences.
+        sequence_stride : int, optional
+            The number of tokens between the starts of consecutive subsequences. Defaults to `sequence_length`
+            (non-overlapping subsequences) - a smaller stride creates overlapping subsequences, like for truncated
+            backpropagation through time. Subsequences (and minibatches of them) are views of a shared buffer rather
+            than copies (see :class:`opendeep.data.stream.WindowStream`).
+        processes : int, optional
+            The number of worker processes to use when reading and tokenizing the files (see
+            :class:`opendeep.data.stream.FileStream`). If None, files are processed in the main process.
+        output : str, optional
+            Either ``one_hot`` or ``index``, saying how to represent tokens.
+            For ``one_hot``, each token is a float vector the size of the vocabulary.
+            For ``index``, each token is its int32 id in the vocabulary (and sequences are int32 id vectors). This
+            avoids building a dense vector per token for large vocabularies - the models' first layers
+            (like :class:`opendeep.models.Dense` or :class:`opendeep.models.RNN`) created with ``index_input=True``
+            treat the ids as one-hot indices and look up the rows of their weight matrix instead of multiplying by it.
+        min_count : int, optional
+            The minimum number of times a token has to appear in the train and valid inputs to be put in the
+            vocab (rarer tokens become the `unk_token`). Only used when creating the vocab.
+        max_size : int, optional
+            The maximum size of the vocab (including the `unk_token`), keeping the most frequent tokens. Only used
+            when creating the vocab.
+        cache_dir : str, optional
+            A directory to save created vocab dictionaries to. The saved vocab is keyed by the path, filters,
+            preprocessing and tokenizing functions, the files' sizes and modification times, and the vocab options
+            - so later datasets over the same corpus load it instead of making a pass over the data.
+        cache_tokens : bool, optional
+            Whether to also save the tokenized vocab ids of each subset to the `cache_dir` during the first pass over
+            it (see :class:`opendeep.data.stream.TokenIdStream`). Later epochs and datasets over the same
+            corpus and vocab memory-map the saved ids instead of reading, preprocessing, and tokenizing the text.
         """
         # Figure out if we want characters, words, or lines processed, and create the processing function
         # to compose on top of the preprocessing function arguments.
@@ -99,58 +144,55 @@ class TextDataset(FileDataset):
         if sequence_length:
             assert sequence_length > 1, "Need to have a sequence_length greater than 1, found %d" % sequence_length
         self.sequence_len = sequence_length
+        self.sequence_stride = sequence_stride
+
+        output = output.lower()
+        assert output in ('one_hot', 'index'), "Output needs to be either 'one_hot' or 'index', found %s" % output
+        self.output = output
+
+        assert not cache_tokens or cache_dir is not None, "Need a cache_dir to cache the tokens in!"
+        self.cache_tokens = cache_tokens
 
         # modify our file stream's processors to work with the appropriate level!
-        # if target_n_future is not none, we are assuming that this is a language model and that we
-        # should tokenize the target
-        if target_n_future is not None:
-            targets_preprocess = compose(tokenize, inputs_preprocess)
         inputs_preprocess = compose(tokenize, inputs_preprocess)
+        # if target_n_future is not none, we are assuming that this is a language model - the targets are made
+        # from the tokenized inputs in the same pass (below), so there are no separate targets streams to create.
+        if target_n_future is not None:
+            targets_preprocess = None
 
         # call super to create the data streams
         super(TextDataset, self).__init__(path=path, source=source,
                                           train_filter=train_filter, valid_filter=valid_filter, test_filter=test_filter,
-                                          inputs_preprocess=inputs_preprocess, targets_preprocess=targets_preprocess)
+                                          inputs_preprocess=inputs_preprocess, targets_preprocess=targets_preprocess,
+                                          processes=processes)
         # after this call, train_inputs, train_targets, etc. are all lists or None.
 
-        # determine if this is a language model, and adjust the stream accordingly to use the inputs as the targets
-        if target_n_future is not None:
-            self.train_targets = FileStream(path, train_filter, targets_preprocess, target_n_future)
-            if valid_filter is not None:
-                self.valid_targets = FileStream(path, valid_filter, targets_preprocess, target_n_future)
-            if test_filter is not None:
-                self.test_targets = FileStream(path, test_filter, targets_preprocess, target_n_future)
-
         # Create our vocab dictionary if it doesn't exist!
         self.unk_token = unk_token
-        vocab_inputs = [self.train_inputs] + (self.valid_inputs or [])
-        self.vocab = vocab or self.compile_vocab(itertools.chain(*vocab_inputs))
-        vocab_len = len(self.vocab)
+        self.cache_dir = cache_dir
+        vocab_inputs = [stream for stream in (self.train_inputs, self.valid_inputs) if stream is not None]
+        self.vocab = vocab or self._get_vocab(vocab_inputs, 'vocab', level, min_count, max_size)
         self.vocab_inverse = {v: k for k, v in self.vocab.items()}
 
-        # Now modify our various inputs streams with one-hot versions using the vocab dictionary.
+        # Now modify our various inputs streams with one-hot (or id) versions using the vocab dictionary.
         # (making sure they remain as lists to satisfy the superclass condition)
-        rep = lambda token: self.vocab.get(token, self.vocab.get(self.unk_token))
-        one_hot = lambda token: numpy_one_hot([rep(token)], n_classes=vocab_len)[0]
-        self.train_inputs = ModifyStream(self.train_inputs, one_hot)
-        if self.sequence_len:
-            self.train_inputs = self._subsequence(self.train_inputs)
-        if self.valid_inputs is not None:
-            self.valid_inputs = ModifyStream(self.valid_inputs, one_hot)
-            if self.sequence_len:
-                self.valid_inputs = self._subsequence(self.valid_inputs)
-        if self.test_inputs is not None:
-            self.test_inputs = ModifyStream(self.test_inputs, one_hot)
-            if self.sequence_len:
-                self.valid_inputs = self._subsequence(self.valid_inputs)
+        # If this is a language model, each inputs stream is read and encoded once and split into the aligned
+        # inputs and targets (the inputs starting target_n_future tokens in the future).
+        if target_n_future is not None:
+            self.train_inputs, self.train_targets = self._shift_stream(self.train_inputs, level, target_n_future)
+            self.valid_inputs, self.valid_targets = self._shift_stream(self.valid_inputs, level, target_n_future)
+            self.test_inputs, self.test_targets = self._shift_stream(self.test_inputs, level, target_n_future)
+        else:
+            self.train_inputs = self._encode_stream(self.train_inputs, self.vocab, level)
+            self.valid_inputs = self._encode_stream(self.valid_inputs, self.vocab, level)
+            self.test_inputs = self._encode_stream(self.test_inputs, self.vocab, level)
 
         # Now deal with possible output streams (either tokenizing it using the supplied label dictionary,
         # creating the label dictionary, or using the vocab dictionary if it is a language model
         # (target_n_future is not none)
         if self.train_targets is not None and target_n_future is None:
-            vocab_inputs = [self.train_targets] + (self.valid_targets or [])
-            self.label_vocab = label_vocab or \
-                               self.compile_vocab(itertools.chain(*vocab_inputs))
+            vocab_inputs = [stream for stream in (self.train_targets, self.valid_targets) if stream is not None]
+            self.label_vocab = label_vocab or self._get_vocab(vocab_inputs, 'label_vocab', level)
             self.label_vocab_inverse = {v: k for k, v in self.label_vocab.items()}
         # if this is a language model, label vocab is same as input vocab
         elif target_n_future is not None:
@@ -160,53 +202,202 @@ class TextDataset(FileDataset):
             self.label_vocab = None
             self.label_vocab_inverse = None
 
-        # now modify the output streams with the one-hot representation using the vocab (making sure they remain
-        # as lists to satisfy the superclass condition)
-        if self.label_vocab is not None:
-            label_vocab_len = len(self.label_vocab)
-            label_rep = lambda token: self.label_vocab.get(token, self.label_vocab.get(self.unk_token))
-            label_one_hot = lambda token: numpy_one_hot([label_rep(token)], n_classes=label_vocab_len)[0]
-            if self.train_targets is not None:
-                self.train_targets = ModifyStream(self.train_targets, label_one_hot)
-                if self.sequence_len:
-                    self.train_targets = self._subsequence(self.train_targets)
-            if self.valid_targets is not None:
-                self.valid_targets = ModifyStream(self.valid_targets, label_one_hot)
-                if self.sequence_len:
-                    self.valid_targets = self._subsequence(self.valid_targets)
-            if self.test_targets is not None:
-                self.test_targets = ModifyStream(self.test_targets, label_one_hot)
-                if self.sequence_len:
-                    self.test_targets = self._subsequence(self.test_targets)
+        # now modify the output streams with the one-hot (or id) representation using the vocab (making sure they
+        # remain as lists to satisfy the superclass condition)
+        if self.label_vocab is not None and target_n_future is None:
+            self.train_targets = self._encode_stream(self.train_targets, self.label_vocab, level)
+            self.valid_targets = self._encode_stream(self.valid_targets, self.label_vocab, level)
+            self.test_targets = self._encode_stream(self.test_targets, self.label_vocab, level)
+
+    def _shift_stream(self, stream, level, n_future):
+        """
+        Helper method to encode a language model's stream of tokens once and return the (inputs, targets) views
+        of it, with the targets starting `n_future` tokens in the future.
+        """
+        if stream is None:
+            return None, None
+        shifted = ShiftedStream(self._encode_stream(stream, self.vocab, level, subsequence=False), n_future)
+        inputs, targets = shifted.inputs, shifted.targets
+        if self.sequence_len:
+            inputs, targets = self._subsequence(inputs), self._subsequence(targets)
+        return inputs, targets
+
+    def _encode_stream(self, stream, vocab, level, subsequence=True):
+        """
+        Helper method to turn a stream of tokens into a stream of one-hot vectors or int32 ids (and subsequences
+        of them if `subsequence`) with the vocab - through a cached :class:`TokenIdStream` if `cache_tokens`.
+        """
+        if stream is None:
+            return None
+        if self.cache_tokens and isinstance(stream, FileStream):
+            key = _cache_key([stream],
+                             'ids', level, self.unk_token, repr(sorted(vocab.items())))
+            stream = TokenIdStream(stream.path, stream.filter, stream.preprocess, vocab, self.unk_token,
+                                   stream.n_future, os.path.join(self.cache_dir, "ids_%s" % key),
+                                   self.processes, stream.chunksize)
+            rep = None
+        else:
+            rep = lambda token: vocab.get(token, vocab.get(self.unk_token))
+        if rep is not None or self.output != 'index':
+            stream = ModifyStream(stream, self._encoder(rep, len(vocab)))
+        if subsequence and self.sequence_len:
+            stream = self._subsequence(stream)
+        return stream
+
+    def _encoder(self, rep, vocab_len):
+        """
+        Helper method to return the function turning a token into its one-hot vector or int32 id (or turning an id
+        into its one-hot vector if `rep` is None).
+        """
+        if rep is None:
+            rep = int
+        if self.output == 'index':
+            return lambda token: numpy.int32(rep(token))
+        return lambda token: numpy_one_hot([rep(token)], n_classes=vocab_len)[0]
 
     def _subsequence(self, stream):
-        numpy_concat = lambda l: numpy.vstack(l)
-        return ModifyStream(
-            BufferStream(stream, self.sequence_len),
-            numpy_concat
-        )
+        return WindowStream(stream, self.sequence_len, self.sequence_stride)
+
+    def _get_vocab(self, streams, name, level, min_count=1, max_size=None):
+        """
+        Helper method to load the vocab from the `cache_dir` (if it was already created for these streams), or
+        otherwise count the tokens in the streams, compile the vocab, and save it to the `cache_dir`.
+        """
+        cache_file = None
+        if self.cache_dir is not None:
+            key = _cache_key(streams, name, level, self.unk_token, min_count, max_size, _VOCAB_VERSION)
+            if key is not None:
+                cache_file = os.path.join(self.cache_dir, "%s_%s.pkl" % (name, key))
+        if cache_file is not None and os.path.isfile(cache_file):
+            t = time.time()
+            with open(cache_file, 'rb') as f:
+                vocab = pickle.load(f)
+            log.debug("Loaded %s from %s in %s." % (name, cache_file, make_time_units_string(time.time() - t)))
+            return vocab
+
+        vocab = self.compile_vocab(self.count_tokens(streams), min_count, max_size)
 
-    def compile_vocab(self, iters):
+        if cache_file is not None:
+            mkdir_p(self.cache_dir)
+            # write to a temporary file first so other processes never load a partial vocab
+            with atomic_file(cache_file) as tmp_file:
+                with open(tmp_file, 'wb') as f:
+                    pickle.dump(vocab, f, protocol=pickle.HIGHEST_PROTOCOL)
+            log.debug("Saved %s to %s" % (name, cache_file))
+        return vocab
+
+    def count_tokens(self, streams):
+        """
+        Counts how many times each token appears in the streams. Each file of a :class:`FileStream` is read and
+        tokenized by its own task, spread across the dataset's worker `processes`.
+
+        Parameters
+        ----------
+        streams : list
+            The streams of tokens to count.
+
+        Returns
+        -------
+        Counter
+            The count for each token.
+        """
+        log.debug("Counting tokens...")
+        t = time.time()
+        counts = _OrderedCounter()
+        for stream in streams:
+            if isinstance(stream, FileStream) and not stream.n_future:
+                count_file = functools.partial(_count_file_tokens, preprocess=stream.preprocess)
+                # merge the file counts in order so the tokens stay in the order they first appear
+                for file_counts in parallel_map(count_file, find_files(stream.path, stream.filter),
+                                                self.processes, stream.chunksize):
+                    counts.update(file_counts)
+            else:
+                counts.update(stream)
+        log.debug("Counting tokens took %s." % make_time_units_string(time.time() - t))
+        return counts
+
+    def compile_vocab(self, iters, min_count=1, max_size=None):
         """
         Creates a dictionary mapping tokens (words or characters) to integers given the level and preprocessing.
+        Tokens are numbered in the order they first appear, after the `unk_token` (which is always 0). When the
+        vocab is pruned with `min_count` or `max_size`, they are numbered from most to least frequent instead.
 
         Parameters
         ----------
-        iters : iterable
-            The iterable to go through when creating the vocaublary dictionary.
+        iters : iterable or Counter
+            The iterable to go through when creating the vocaublary dictionary, or the already counted
+            tokens (see :meth:`count_tokens`).
+        min_count : int, optional
+            The minimum number of times a token has to appear to be put in the vocab.
+        max_size : int, optional
+            The maximum size of the vocab (including the `unk_token`), keeping the most frequent tokens.
 
         Returns
         -------
         vocab
             The dictionary mapping token: integer for all tokens in the `iters` iterable.
         """
+        assert max_size is None or max_size > 0, "Need a max_size greater than 0, found %d" % max_size
         log.debug("Creating vocabulary...")
         t = time.time()
+        counts = iters if isinstance(iters, Counter) else _OrderedCounter(iters)
+        tokens = [token for token, count in counts.items() if count >= min_count and token != self.unk_token]
+        if min_count > 1 or max_size is not None:
+            tokens.sort(key=lambda token: (-counts[token], token))
+        if max_size is not None:
+            tokens = tokens[:max_size - 1]
         vocab = {self.unk_token: 0}
-        i = 1
-        for token in iters:
-            if token not in vocab:
-                vocab[token] = i
-                i += 1
-        log.debug("Vocab took %s to create." % make_time_units_string(time.time() - t))
+        for i, token in enumerate(tokens):
+            vocab[token] = i + 1
+        log.debug("Vocab took %s to create, keeping %d of %d tokens." %
+                  (make_time_units_string(time.time() - t), len(tokens), len(counts)))
         return vocab
+
+
+class _OrderedCounter(Counter, OrderedDict):
+    """
+    A Counter that keeps the tokens in the order they were first counted.
+    """
+    def __reduce__(self):
+        return self.__class__, (OrderedDict(self),)
+
+def _count_file_tokens(fname, preprocess=None):
+    """
+    Counts the tokens in a single file.
+    """
+    return _OrderedCounter(FileStream([fname], preprocess=preprocess))
+
+def _cache_key(streams, *args):
+    """
+    Creates a hash key for the streams of files and vocab options, or None if the streams aren't FileStreams.
+    """
+    fnames, stream_keys = [], []
+    for stream in streams:
+        if not isinstance(stream, FileStream):
+            return None
+        stream_filter = getattr(stream.filter, 'pattern', stream.filter)
+        stream_keys.append((stream.path, stream_filter, stream.n_future, _function_key(stream.preprocess)))
+        fnames.extend(find_files(stream.path, stream.filter))
+    return file_cache_key(fnames, args, stream_keys)
+
+def _function_key(func):
+    """
+    Creates a representation of a function from its code (and the functions it closes over, like with
+    :func:`compose`) that stays the same between runs.
+    """
+    if isinstance(func, (list, tuple)):
+        return tuple(_function_key(f) for f in func)
+    if isinstance(func, functools.partial):
+        return (_function_key(func.func), _function_key(func.args), repr(sorted(func.keywords.items())))
+    code = getattr(func, '__code__', None)
+    if code is None:
+        if func is None or isinstance(func, (string_types, int, float, bool)):
+            return repr(func)
+        # builtins and other callables don't have code to look at, so use their names
+        return "%s.%s" % (getattr(func, '__module__', None), getattr(func, '__name__', type(func).__name__))
+    closure = tuple(_function_key(cell.cell_contents) for cell in (func.__closure__ or ()))
+    return (func.__module__, func.__name__, _code_key(code), closure)
+
+def _code_key(code):
+    consts = tuple(_code_key(c) if isinstance(c, types.CodeType) else repr(c) for c in code.co_consts)
+    return (code.co_code, consts, code.co_names)
@@ -15,9 +15,10 @@ from theano.compat.python2x import OrderedDict  # use this compatibility Ordered
 import opendeep.models
 from opendeep.utils.decorators import init_optimizer
 from opendeep.utils import file_ops
-from opendeep.utils.constructors import function
+from opendeep.utils.constructors import function, compact_inputs
 from opendeep.utils.misc import (make_time_units_string, raise_to_list, add_kwargs_to_dict)
 from opendeep.utils.file_ops import mkdir_p
+from opendeep.utils.checkpoint import atomic_write
 
 try:
     import cPickle as pickle
@@ -75,6 +76,12 @@ class Model(object):
         visualizations, etc.).
     f_run : function, or attribute doesn't exist if not compiled.
         Theano function for running the model's computation on an input. This gets set during compile_run_fn().
+    input_storage : tuple or None, or attribute doesn't exist if not set.
+        The (dtype, scale, offset) compact storage of the inputs to `run()`. This gets set during
+        set_input_storage().
+    f_run_compact : function, or attribute doesn't exist if not compiled.
+        Theano function for running the model's computation on inputs in the compact `input_storage` dtype. This
+        gets set during compile_compact_run_fn().
     switches_on : bool or None
         If all the switches from `self.get_switches()` have been turned off (False) or on (True). It will be
         None if we don't know the state of the switches.
@@ -294,6 +301,83 @@ class Model(object):
 
         return self.f_run
 
+    def compile_compact_run_fn(self):
+        """
+        This is a helper function to compile the f_run_compact function, which computes the model's outputs given
+        inputs in the compact storage dtype set with `set_input_storage()` and decodes them in the graph.
+
+        Returns
+        -------
+        Theano function
+            The compiled theano function for running the model on compact inputs.
+
+        Raises
+        ------
+        AssertionError
+            If no input storage was set.
+        """
+        storage = getattr(self, 'input_storage', None)
+        assert storage is not None, "Need to set_input_storage() before compiling the compact run function."
+        if not getattr(self, 'f_run_compact', None):
+            log.debug("Compiling f_run_compact...")
+            t = time.time()
+            inputs, givens = compact_inputs(raise_to_list(self.get_inputs()), *storage)
+            self.f_run_compact = function(inputs  = inputs,
+                                          outputs = self.get_outputs(),
+                                          updates = self.get_updates(),
+                                          givens  = givens,
+                                          name    = 'f_run_compact')
+            log.debug("Compilation done. Took %s", make_time_units_string(time.time() - t))
+        else:
+            log.debug('f_run_compact already exists!')
+
+        return self.f_run_compact
+
+    def set_input_storage(self, dtype, scale=None, offset=None):
+        """
+        Sets the compact storage dtype (and affine scale and offset) of the inputs, so `run()` can also take inputs
+        in that dtype and cast and scale them inside the graph (see
+        :func:`opendeep.utils.constructors.compact_inputs`). Inputs in the model's own dtypes still go through
+        the regular f_run function. The :class:`opendeep.optimization.Optimizer` sets this from the dataset's
+        inputs storage when training. This removes any compiled f_run_compact function so it is compiled again
+        with the new storage.
+
+        Parameters
+        ----------
+        dtype : str or list(str) or None
+            The storage dtype of the inputs, or a list with one for each input. None removes the input storage.
+        scale : float or list(float), optional
+            The factor to multiply the cast inputs by.
+        offset : float or list(float), optional
+            The amount to add to the scaled inputs.
+        """
+        storage = None
+        if dtype is not None:
+            storage = (dtype, scale, offset)
+        if storage != getattr(self, 'input_storage', None):
+            self.input_storage = storage
+            self.f_run_compact = None
+
+    def _is_compact_input(self, input):
+        """
+        Helper method to return whether the list of inputs to `run()` are in the compact storage dtypes from
+        `set_input_storage()` (instead of the model's own input dtypes).
+        """
+        storage = getattr(self, 'input_storage', None)
+        if storage is None:
+            return False
+        dtype = storage[0]
+        dtypes = dtype if isinstance(dtype, (list, tuple)) else [dtype] * len(input)
+        compact = False
+        for value, dtype, variable in zip(input, dtypes, raise_to_list(self.get_inputs())):
+            value_dtype = getattr(value, 'dtype', None)
+            if dtype is None or value_dtype is None or dtype == variable.dtype:
+                continue
+            if value_dtype != dtype:
+                return False
+            compact = True
+        return compact
+
     def run(self, input):
         """
         This method will return the model's output (run through the function), given an input. In the case that
@@ -319,14 +403,16 @@ class Model(object):
             old_switch_vals = [switch.get_value() for switch in raise_to_list(self.get_switches())]
             self.turn_off_switches()
 
-        # check if the run function is already compiled, otherwise compile it!
-        if not getattr(self, 'f_run', None):
-            self.compile_run_fn()
-
         # because we use the splat to account for multiple inputs to the function, make sure input is a list.
         input = raise_to_list(input)
+        # check if the run function is already compiled, otherwise compile it!
+        # inputs in the compact storage dtype go through the function that decodes them in the graph.
+        if self._is_compact_input(input):
+            f_run = getattr(self, 'f_run_compact', None) or self.compile_compact_run_fn()
+        else:
+            f_run = getattr(self, 'f_run', None) or self.compile_run_fn()
         # return the results of the run function!
-        output = self.f_run(*input)
+        output = f_run(*input)
 
         # reset any switches to how they were!
         if len(old_switch_vals) > 0:
@@ -623,9 +709,10 @@ class Model(object):
 
         return success
 
-    def save_params(self, param_file, use_hdf5=False):
+    def save_params(self, param_file, use_hdf5=False, writer=None, cost=None):
         """
-        This saves the model's parameters (HDF5 file or pickles them) to the `param_file`.
+        This saves the model's parameters (HDF5 file or pickles them) to the `param_file`. The file is written to
+        a temporary file first and renamed, so an interrupted save never leaves a corrupt `param_file`.
 
         Parameters
         ----------
@@ -634,11 +721,16 @@ class Model(object):
         use_hdf5 : bool
             Whether to use an HDF5 file for the saved parameters (if h5py is installed).
             Otherwise, it will use pickle.
+        writer : CheckpointWriter, optional
+            The :class:`opendeep.utils.checkpoint.CheckpointWriter` to write the file with (like in the
+            background, with a retention policy). The parameter values are copied before this method returns.
+        cost : float, optional
+            The cost of the parameters, for the `writer` to keep the best checkpoint.
 
         Returns
         -------
         bool
-            Whether or not successfully saved the file.
+            Whether or not successfully saved the file (or queued it with a background `writer`).
         """
         # make sure outdir was not set to false (no saving or outputs)
         if getattr(self, 'outdir', None):
@@ -653,48 +745,27 @@ class Model(object):
                 # force extension to be .hdf5
                 if ftype != file_ops.HDF5:
                     param_file = ''.join([param_file, '.hdf5'])
-
-                log.debug('Saving %s parameters to %s',
-                          self._classname, str(param_file))
-
-                # try to dump the param values
-                f = h5py.File(param_file, 'w')
-                try:
-                    if hdf5_param_key not in f:
-                        param_group = f.create_group(hdf5_param_key)
-                    else:
-                        param_group = f[hdf5_param_key]
-                    for name, param in params_dict.items():
-                        if name in param_group:
-                            dset = param_group[name]
-                            dset[...] = param
-                        else:
-                            dset = param_group.create_dataset(name, data=param)
-                    f.flush()
-                except Exception as e:
-                    log.exception("Some issue saving model %s parameters to %s! Exception: %s",
-                                  self._classname, str(param_file), str(e))
-                    return False
-                finally:
-                    f.close()
+                write_fn = lambda path: _write_hdf5_params(params_dict, path)
             else:
                 # force extension to be .pkl if it isn't a pickle file
                 if ftype != file_ops.PKL:
                     param_file = ''.join([param_file, '.pkl'])
+                write_fn = lambda path: _write_pickle_params(params_dict, path)
 
-                log.debug('Saving %s parameters to %s',
-                          self._classname, str(param_file))
-
-                # try to dump the param values
-                with open(param_file, 'wb') as f:
-                    try:
-                        pickle.dump(params_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
-                    except Exception as e:
-                        log.exception("Some issue saving model %s parameters to %s! Exception: %s",
-                                      self._classname, str(param_file), str(e))
-                        return False
-                    finally:
-                        f.close()
+            log.debug('Saving %s parameters to %s',
+                      self._classname, str(param_file))
+
+            if writer is not None:
+                # the writer logs any failure and re-raises it from its wait()
+                return writer.write(param_file, write_fn, cost=cost)
+
+            # try to dump the param values
+            try:
+                atomic_write(param_file, write_fn)
+            except Exception as e:
+                log.exception("Some issue saving model %s parameters to %s! Exception: %s",
+                              self._classname, str(param_file), str(e))
+                return False
             # all done
             return True
         else:
@@ -946,3 +1017,24 @@ class Model(object):
             model.load_params(param_file=param_file)
 
         return model
+
+
+def _write_pickle_params(params_dict, param_file):
+    """
+    Helper method to pickle the dictionary of parameter values to the file.
+    """
+    with open(param_file, 'wb') as f:
+        pickle.dump(params_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def _write_hdf5_params(params_dict, param_file):
+    """
+    Helper method to write the dictionary of parameter values to the params group of a new HDF5 file.
+    """
+    f = h5py.File(param_file, 'w')
+    try:
+        param_group = f.create_group(hdf5_param_key)
+        for name, param in params_dict.items():
+            param_group.create_dataset(name, data=param)
+        f.flush()
+    finally:
+        f.close()
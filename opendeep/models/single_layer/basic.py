@@ -5,12 +5,13 @@ This module provides the most basic neural net layers. This goes from an input t
 import logging
 # third party libraries
 from theano.compat.python2x import OrderedDict
-from theano.tensor import (dot, argmax, neq, mean)
+from theano.tensor import (argmax, neq, mean)
 import theano.sandbox.rng_mrg as RNG_MRG
 # internal references
 from opendeep.models.model import Model
 from opendeep.utils.activation import get_activation_function
 from opendeep.utils.decorators import inherit_docs
+from opendeep.utils.nnet import (is_index_input, input_dot)
 from opendeep.utils.weights import (get_weights, get_bias)
 
 log = logging.getLogger(__name__)
@@ -27,6 +28,7 @@ class Dense(Model):
                  weights_init='uniform', weights_mean=0, weights_std=5e-3, weights_interval='glorot',
                  bias_init=0.0,
                  mrg=RNG_MRG.MRG_RandomStreams(1),
+                 index_input=False,
                  **kwargs):
         """
         Initialize a basic layer.
@@ -41,6 +43,7 @@ class Dense(Model):
             dimension, or None if the shape isn't known. For example, if you have a matrix with unknown batch size
             but fixed feature size of 784, `shape` would be: (None, 784). The full form of `inputs` would be:
             [((None, 784), <TensorType(float32, matrix)>)].
+            With `index_input`, the `shape` describes the one-hot input, i.e. (None, vocab_size) for a vector of ids.
         outputs : int
             The dimensionality of the output for this model.
         params : Dict(string_name: theano SharedVariable), optional
@@ -67,6 +70,8 @@ class Dense(Model):
         mrg : random
             A random number generator that is used when adding noise.
             I recommend using Theano's sandbox.rng_mrg.MRG_RandomStreams.
+        index_input : bool, optional
+            Whether the integer input holds one-hot indices to look up (see :func:`opendeep.utils.nnet.input_dot`).
         """
         # init Model to combine the defaults and config dictionaries with the initial parameters.
         initial_parameters = locals().copy()
@@ -83,8 +88,13 @@ class Dense(Model):
                                       "to the Dense model!" % len(self.inputs))
         # self.inputs is a list of all the input expressions (we enforce only 1, so self.inputs[0] is the input)
         input_shape, self.input = self.inputs[0]
+        # integer index inputs stand for one-hot vectors, so they are missing the last (vocab size) dimension.
+        if index_input:
+            assert is_index_input(self.input), \
+                "index_input needs an integer input, found dtype %s" % str(self.input.dtype)
+        ndim = self.input.ndim + int(index_input)
         if isinstance(input_shape, int):
-            self.input_size = ((None, ) * (self.input.ndim-1)) + (input_shape, )
+            self.input_size = ((None, ) * (ndim-1)) + (input_shape, )
         else:
             self.input_size = input_shape
         assert self.input_size is not None, "Need to specify the shape for the last dimension of the input!"
@@ -127,7 +137,8 @@ class Dense(Model):
         # Here is the meat of the computation transforming input -> output
         # It simply involves a matrix multiplication of inputs*weights, adding the bias vector, and then passing
         # the result through our activation function (normally something nonlinear such as: max(0, output))
-        self.output = activation_func(dot(self.input, W) + b)
+        # (for integer index inputs, this looks up the rows of W instead of multiplying by one-hot vectors)
+        self.output = activation_func(input_dot(self.input, W, index_input) + b)
 
         log.debug("Initialized a basic fully-connected layer with shape %s and activation: %s",
                   str((self.input_size[-1], self.output_size[-1])), str(activation))
@@ -163,6 +174,7 @@ class Softmax(Dense):
                  bias_init=0.0,
                  out_as_probs=True,
                  mrg=RNG_MRG.MRG_RandomStreams(1),
+                 index_input=False,
                  **kwargs):
         """
         Initialize a Softmax layer.
@@ -177,6 +189,7 @@ class Softmax(Dense):
             dimension, or None if the shape isn't known. For example, if you have a matrix with unknown batch size
             but fixed feature size of 784, `shape` would be: (None, 784). The full form of `inputs` would be:
             [((None, 784), <TensorType(float32, matrix)>)].
+            With `index_input`, the `shape` describes the one-hot input, i.e. (None, vocab_size) for a vector of ids.
         outputs : int
             The dimensionality of the output for this model.
         params : Dict(string_name: theano SharedVariable), optional
@@ -204,6 +217,8 @@ class Softmax(Dense):
         mrg : random
             A random number generator that is used when adding noise.
             I recommend using Theano's sandbox.rng_mrg.MRG_RandomStreams.
+        index_input : bool, optional
+            Whether the integer input holds one-hot indices to look up (see :func:`opendeep.utils.nnet.input_dot`).
         """
         # init the fully connected generic layer with a softmax activation function
         super(Softmax, self).__init__(inputs=inputs,
@@ -218,6 +233,7 @@ class Softmax(Dense):
                                       bias_init=bias_init,
                                       out_as_probs=out_as_probs,
                                       mrg=mrg,
+                                      index_input=index_input,
                                       **kwargs)
         if self.inputs is None:
             return
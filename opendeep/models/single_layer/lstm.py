@@ -13,6 +13,7 @@ from opendeep.models.model import Model
 from opendeep.models.utils import Flatten
 from opendeep.utils.activation import get_activation_function
 from opendeep.utils.decorators import inherit_docs
+from opendeep.utils.nnet import (is_index_input, input_dot, mask_step)
 from opendeep.utils.weights import (get_weights, get_bias)
 
 log = logging.getLogger(__name__)
@@ -35,7 +36,7 @@ class LSTM(Model):
                  r_weights_init='identity', r_weights_interval='glorot', r_weights_mean=0, r_weights_std=5e-3,
                  r_bias_init=0.0,
                  direction='forward',
-                 clip_recurrent_grads=False):
+                 clip_recurrent_grads=False, mask=None, index_input=False):
         """
         Initialize an LSTM.
 
@@ -50,6 +51,8 @@ class LSTM(Model):
             dimension, or None if the shape isn't known. For example, if you have a matrix with unknown batch size
             but fixed feature size of 784, `shape` would be: (None, 784). The full form of `inputs` would be:
             [((None, 784), <TensorType(float32, matrix)>)].
+            With `index_input`, the `shape` of (timesteps, batch) ids describes the one-hot input, i.e.
+            (None, None, vocab_size).
         hiddens : int or Tuple of (shape, `Theano.TensorType`)
             Int for the number of hidden units to use, or a tuple of shape, expression to route the starting
             hidden values from elsewhere.
@@ -102,6 +105,13 @@ class LSTM(Model):
             connecting previous hidden states to the current hidden state, and not the weights from current
             input to hiddens). If it is a float, the gradients for the weights will be hard clipped to the range
             `+-clip_recurrent_grads`.
+        mask : `Theano.TensorType` or tuple(shape, `Theano.TensorType`), optional
+            A (timesteps, batch) mask with 1 for the steps of each sequence and 0 for padding, for batches of
+            variable-length sequences padded to the same length (see :func:`opendeep.utils.batch.bucket_minibatch`).
+            Padded steps keep the previous hidden state (so they don't get any gradient) and output zeros.
+            The mask becomes the last of the model's inputs.
+        index_input : bool, optional
+            Whether the integer input holds one-hot indices to look up (see :func:`opendeep.utils.nnet.input_dot`).
         """
         initial_parameters = locals().copy()
         initial_parameters.pop('self')
@@ -129,25 +139,49 @@ class LSTM(Model):
                                       "to the model!" % len(self.inputs))
         # self.inputs is a list of all the input expressions (we enforce only 1, so self.inputs[0] is the input)
         input_shape, self.input = self.inputs[0]
+        # integer index inputs stand for one-hot vectors, so they are missing the last (vocab size) dimension.
+        if index_input:
+            assert is_index_input(self.input), \
+                "index_input needs an integer input, found dtype %s" % str(self.input.dtype)
+        self.index_input = index_input
+        ndim = self.input.ndim + int(index_input)
         if isinstance(input_shape, int):
-            self.input_size = ((None,) * (self.input.ndim - 1)) + (input_shape,)
+            self.input_size = ((None,) * (ndim - 1)) + (input_shape,)
         else:
             self.input_size = input_shape
         assert self.input_size is not None, "Need to specify the shape for at least the last dimension of the input!"
         # input is 3D tensor of (timesteps, batch_size, data_dim)
         # if input is 2D tensor, assume it is of the form (timesteps, data_dim) i.e. batch_size is 1. Convert to 3D.
         # if input is > 3D tensor, assume it is of form (timesteps, batch_size, data...) and flatten to 3D.
-        if self.input.ndim == 1:
+        # (integer index inputs are of the form (timesteps, batch_size) or (timesteps) without the data dimension)
+        if ndim == 1:
             self.input = unbroadcast(self.input.dimshuffle(0, 'x', 'x'), [1, 2])
 
-        elif self.input.ndim == 2:
-            self.input = unbroadcast(self.input.dimshuffle(0, 'x', 1), 1)
+        elif ndim == 2:
+            if index_input:
+                self.input = unbroadcast(self.input.dimshuffle(0, 'x'), 1)
+            else:
+                self.input = unbroadcast(self.input.dimshuffle(0, 'x', 1), 1)
 
-        elif self.input.ndim > 3:
+        elif ndim > 3:
+            if index_input:
+                raise NotImplementedError("Expected integer index inputs of the form (timesteps, batch_size), "
+                                          "found %d dimensions." % self.input.ndim)
             flat_in = Flatten((self.input_size, self.input), ndim=3)
             self.input = flat_in.get_outputs()
             self.input_size = flat_in.output_size
 
+        ########
+        # mask #
+        ########
+        # the mask is a (timesteps, batch_size) tensor of 1s for the steps of each sequence and 0s for the padding.
+        if isinstance(mask, tuple):
+            _, mask = mask
+        self.mask = mask
+        step_mask = None
+        if mask is not None:
+            step_mask = unbroadcast(mask.dimshuffle(0, 'x'), 1) if mask.ndim == 1 else mask
+
         ###########
         # hiddens #
         ###########
@@ -270,23 +304,29 @@ class LSTM(Model):
 
         # make h_init the right sized tensor
         if h_init is None:
-            h_init = zeros_like(dot(self.input[0], W_c))
+            h_init = zeros_like(input_dot(self.input[0], W_c, self.index_input))
 
-        c_init = zeros_like(dot(self.input[0], W_c))
+        c_init = zeros_like(input_dot(self.input[0], W_c, self.index_input))
 
         ###############
         # computation #
         ###############
         # move some computation outside of scan to speed it up!
-        x_c = dot(self.input, W_c) + b_c
-        x_i = dot(self.input, W_i) + b_i
-        x_f = dot(self.input, W_f) + b_f
-        x_o = dot(self.input, W_o) + b_o
+        x_c = input_dot(self.input, W_c, self.index_input) + b_c
+        x_i = input_dot(self.input, W_i, self.index_input) + b_i
+        x_f = input_dot(self.input, W_f, self.index_input) + b_f
+        x_o = input_dot(self.input, W_o, self.index_input) + b_o
 
         # now do the recurrent stuff
+        if step_mask is None:
+            step, sequences = self.recurrent_step, [x_c, x_i, x_f, x_o]
+        else:
+            step = lambda x_c_t, x_i_t, x_f_t, x_o_t, mask_t, h_tm1, c_tm1, U_c, U_i, U_f, U_o: \
+                self.recurrent_step(x_c_t, x_i_t, x_f_t, x_o_t, h_tm1, c_tm1, U_c, U_i, U_f, U_o, mask_t)
+            sequences = [x_c, x_i, x_f, x_o, step_mask]
         (self.hiddens, _), self.updates = scan(
-            fn=self.recurrent_step,
-            sequences=[x_c, x_i, x_f, x_o],
+            fn=step,
+            sequences=sequences,
             outputs_info=[h_init, c_init],
             non_sequences=[U_c, U_i, U_f, U_o],
             go_backwards=backward,
@@ -297,8 +337,8 @@ class LSTM(Model):
         # if bidirectional, do the same in reverse!
         if bidirectional:
             (hiddens_b, _), updates_b = scan(
-                fn=self.recurrent_step,
-                sequences=[x_c, x_i, x_f, x_o],
+                fn=step,
+                sequences=sequences,
                 outputs_info=[h_init, c_init],
                 non_sequences=[U_c_b, U_i_b, U_f_b, U_o_b],
                 go_backwards=not backward,
@@ -311,11 +351,16 @@ class LSTM(Model):
             self.updates.update(updates_b)
             self.hiddens += hiddens_b
 
+        # padded steps output zeros
+        if step_mask is not None:
+            self.hiddens = self.hiddens * step_mask.dimshuffle(0, 1, 'x')
+
         log.info("Initialized an LSTM!")
 
-    def recurrent_step(self, x_c_t, x_i_t, x_f_t, x_o_t, h_tm1, c_tm1, U_c, U_i, U_f, U_o):
+    def recurrent_step(self, x_c_t, x_i_t, x_f_t, x_o_t, h_tm1, c_tm1, U_c, U_i, U_f, U_o, mask_t=None):
         """
-        Performs one computation step over time.
+        Performs one computation step over time (keeping the previous hiddens and memory for padded steps
+        if `mask_t` is given).
         """
         # new memory content c_tilde
         c_tilde = self.hidden_activation_func(
@@ -337,6 +382,10 @@ class LSTM(Model):
         )
         # new hiddens
         h_t = o_t*self.hidden_activation_func(c_t)
+        # padded steps keep the previous hiddens and memory content
+        if mask_t is not None:
+            h_t = mask_step(mask_t, h_t, h_tm1)
+            c_t = mask_step(mask_t, c_t, c_tm1)
         # return the hiddens and memory content
         return h_t, c_t
 
@@ -344,6 +393,8 @@ class LSTM(Model):
     # Model functions #
     ###################
     def get_inputs(self):
+        if self.mask is not None:
+            return [self.input, self.mask]
         return [self.input]
 
     def get_outputs(self):
@@ -14,6 +14,7 @@ from opendeep.models.model import Model
 from opendeep.models.utils import Flatten
 from opendeep.utils.activation import get_activation_function
 from opendeep.utils.decorators import inherit_docs
+from opendeep.utils.nnet import (is_index_input, input_dot, mask_step)
 from opendeep.utils.weights import (get_weights, get_bias)
 
 log = logging.getLogger(__name__)
@@ -49,7 +50,7 @@ class RNN(Model):
                  r_weights_init='identity', r_weights_interval='glorot', r_weights_mean=0, r_weights_std=5e-3,
                  r_bias_init=0.0,
                  direction='forward',
-                 clip_recurrent_grads=False):
+                 clip_recurrent_grads=False, mask=None, index_input=False):
         """
         Initialize a simple recurrent network layer.
 
@@ -64,6 +65,8 @@ class RNN(Model):
             dimension, or None if the shape isn't known. For example, if you have a matrix with unknown batch size
             but fixed feature size of 784, `shape` would be: (None, 784). The full form of `inputs` would be:
             [((None, 784), <TensorType(float32, matrix)>)].
+            With `index_input`, the `shape` of (timesteps, batch) ids describes the one-hot input, i.e.
+            (None, None, vocab_size).
         hiddens : int or Tuple of (shape, `Theano.TensorType`)
             Int for the number of hidden units to use, or a tuple of shape, expression to route the starting
             hidden values from elsewhere.
@@ -110,6 +113,13 @@ class RNN(Model):
             connecting previous hidden states to the current hidden state, and not the weights from current
             input to hiddens). If it is a float, the gradients for the weights will be hard clipped to the range
             `+-clip_recurrent_grads`.
+        mask : `Theano.TensorType` or tuple(shape, `Theano.TensorType`), optional
+            A (timesteps, batch) mask with 1 for the steps of each sequence and 0 for padding, for batches of
+            variable-length sequences padded to the same length (see :func:`opendeep.utils.batch.bucket_minibatch`).
+            Padded steps keep the previous hidden state (so they don't get any gradient) and output zeros.
+            The mask becomes the last of the model's inputs.
+        index_input : bool, optional
+            Whether the integer input holds one-hot indices to look up (see :func:`opendeep.utils.nnet.input_dot`).
 
         Raises
         ------
@@ -141,25 +151,49 @@ class RNN(Model):
                                       "to the model!" % len(self.inputs))
         # self.inputs is a list of all the input expressions (we enforce only 1, so self.inputs[0] is the input)
         input_shape, self.input = self.inputs[0]
+        # integer index inputs stand for one-hot vectors, so they are missing the last (vocab size) dimension.
+        if index_input:
+            assert is_index_input(self.input), \
+                "index_input needs an integer input, found dtype %s" % str(self.input.dtype)
+        self.index_input = index_input
+        ndim = self.input.ndim + int(index_input)
         if isinstance(input_shape, int):
-            self.input_size = ((None,) * (self.input.ndim - 1)) + (input_shape,)
+            self.input_size = ((None,) * (ndim - 1)) + (input_shape,)
         else:
             self.input_size = input_shape
         assert self.input_size is not None, "Need to specify the shape for at least the last dimension of the input!"
         # input is 3D tensor of (timesteps, batch_size, data_dim)
         # if input is 2D tensor, assume it is of the form (timesteps, data_dim) i.e. batch_size is 1. Convert to 3D.
         # if input is > 3D tensor, assume it is of form (timesteps, batch_size, data...) and flatten to 3D.
-        if self.input.ndim == 1:
+        # (integer index inputs are of the form (timesteps, batch_size) or (timesteps) without the data dimension)
+        if ndim == 1:
             self.input = unbroadcast(self.input.dimshuffle(0, 'x', 'x'), [1, 2])
 
-        elif self.input.ndim == 2:
-            self.input = unbroadcast(self.input.dimshuffle(0, 'x', 1), 1)
+        elif ndim == 2:
+            if index_input:
+                self.input = unbroadcast(self.input.dimshuffle(0, 'x'), 1)
+            else:
+                self.input = unbroadcast(self.input.dimshuffle(0, 'x', 1), 1)
 
-        elif self.input.ndim > 3:
+        elif ndim > 3:
+            if index_input:
+                raise NotImplementedError("Expected integer index inputs of the form (timesteps, batch_size), "
+                                          "found %d dimensions." % self.input.ndim)
             flat_in = Flatten((self.input_size, self.input), ndim=3)
             self.input = flat_in.get_outputs()
             self.input_size = flat_in.output_size
 
+        ########
+        # mask #
+        ########
+        # the mask is a (timesteps, batch_size) tensor of 1s for the steps of each sequence and 0s for the padding.
+        if isinstance(mask, tuple):
+            _, mask = mask
+        self.mask = mask
+        step_mask = None
+        if mask is not None:
+            step_mask = unbroadcast(mask.dimshuffle(0, 'x'), 1) if mask.ndim == 1 else mask
+
         ###########
         # hiddens #
         ###########
@@ -247,15 +281,20 @@ class RNN(Model):
 
         # make h_init the right sized tensor
         if h_init is None:
-            h_init = zeros_like(dot(self.input[0], W))
+            h_init = zeros_like(input_dot(self.input[0], W, self.index_input))
 
         ###############
         # computation #
         ###############
         # now do the recurrent stuff
+        if step_mask is None:
+            step, sequences = self.recurrent_step, [self.input]
+        else:
+            step = lambda x_t, mask_t, h_tm1, W, U, b: self.recurrent_step(x_t, h_tm1, W, U, b, mask_t)
+            sequences = [self.input, step_mask]
         self.hiddens, self.updates = scan(
-            fn=self.recurrent_step,
-            sequences=[self.input],
+            fn=step,
+            sequences=sequences,
             outputs_info=[h_init],
             non_sequences=[W, U, b],
             go_backwards=backward,
@@ -266,8 +305,8 @@ class RNN(Model):
         # if bidirectional, do the same in reverse!
         if bidirectional:
             hiddens_b, updates_b = scan(
-                fn=self.recurrent_step,
-                sequences=[self.input],
+                fn=step,
+                sequences=sequences,
                 outputs_info=[h_init],
                 non_sequences=[W, U_b, b],
                 go_backwards=not backward,
@@ -280,9 +319,13 @@ class RNN(Model):
             self.updates.update(updates_b)
             self.hiddens += hiddens_b
 
+        # padded steps output zeros
+        if step_mask is not None:
+            self.hiddens = self.hiddens * step_mask.dimshuffle(0, 1, 'x')
+
         log.info("Initialized an RNN!")
 
-    def recurrent_step(self, x_t, h_tm1, W, U, b):
+    def recurrent_step(self, x_t, h_tm1, W, U, b, mask_t=None):
         """
         Performs one computation step over time.
 
@@ -298,6 +341,8 @@ class RNN(Model):
             The hidden-to-hidden timestep weights matrix to use (differs when bidirectional).
         b : shared variable
             The hidden bias to use.
+        mask_t : tensor, optional
+            The (batch_size,) mask for the current timestep - padded steps keep the previous hidden values.
 
         Returns
         -------
@@ -305,14 +350,18 @@ class RNN(Model):
             h_t the current timestep (t) hidden values.
         """
         h_t = self.hidden_activation_func(
-            dot(x_t, W) + dot(h_tm1, U) + b
+            input_dot(x_t, W, self.index_input) + dot(h_tm1, U) + b
         )
+        if mask_t is not None:
+            h_t = mask_step(mask_t, h_t, h_tm1)
         return h_t
 
     ###################
     # Model functions #
     ###################
     def get_inputs(self):
+        if self.mask is not None:
+            return [self.input, self.mask]
         return [self.input]
 
     def get_outputs(self):
@@ -1,5 +1,6 @@
 from __future__ import division, absolute_import, print_function
 
 from .monitor import Monitor, MonitorsChannel
+from .accumulator import MonitorAccumulator
 from .out_service import *
-from .plot import *
\ No newline at end of file
+from .plot import *
@@ -0,0 +1,140 @@
+"""
+This module provides a way to accumulate monitor values over minibatches on the device.
+
+Instead of returning every monitor value from the compiled functions (a device-to-host copy for each call), the
+sums of the values and the number of minibatches are kept in shared variables that the functions update. They only
+need to be read (and reset) once per epoch, or whenever the values should be logged.
+
+The sums are kept in float64 and the count in int64 (even when floatX is float32), since a float32 sum over many
+minibatches loses the precision of each new value and a float32 count stops increasing at 2**24.
+"""
+# standard libraries
+import logging
+# third party
+import numpy
+import theano.tensor as T
+from theano.compat.python2x import OrderedDict
+# internal
+from opendeep.utils.constructors import sharedX
+
+log = logging.getLogger(__name__)
+
+
+class MonitorAccumulator(object):
+    """
+    Keeps running sums of scalar monitor values in shared variables, along with the number of values summed, so
+    their means can be read back after many calls of a compiled function.
+
+    Monitors that aren't scalars can't be summed into a fixed-shape shared variable, so they are left as outputs
+    of the function to collect on the host.
+
+    Attributes
+    ----------
+    names : list(str)
+        The names of all the monitors, in the order of the expressions given to `accumulate()`.
+    output_names : list(str)
+        The names of the monitors that are still outputs of the function (not accumulated), in order.
+    sums : OrderedDict
+        The name: float64 shared variable for the running sum of each accumulated monitor.
+    count : SharedVariable
+        The int64 number of values summed since the last `read()`.
+    totals : OrderedDict
+        The name: host sum of each accumulated monitor over every `read()` since the last `reset()`.
+    total_count : int
+        The number of values summed over every `read()` since the last `reset()`.
+    """
+    def __init__(self, names):
+        """
+        Parameters
+        ----------
+        names : list(str)
+            The names of the monitors to accumulate.
+        """
+        self.names = list(names)
+        self.output_names = list(names)
+        self.sums = OrderedDict()
+        self.count = sharedX(0, name="monitor_count", dtype='int64')
+        self.totals = OrderedDict()
+        self.total_count = 0
+
+    def accumulate(self, outputs, stacked=False):
+        """
+        Creates the updates that add the scalar `outputs` to their running sums, and returns the outputs that are
+        left for the function to return.
+
+        Parameters
+        ----------
+        outputs : list(theano expression)
+            The monitor expressions, one for each name.
+        stacked : bool, optional
+            Whether the outputs have the values of several steps stacked along their first dimension
+            (like from a `theano.scan`), to sum and count each step.
+
+        Returns
+        -------
+        tuple(list(theano expression), OrderedDict)
+            The outputs that aren't accumulated, and the updates for the running sums and count.
+        """
+        assert len(outputs) == len(self.names), \
+            "Need an output for each of the %d monitors, found %d" % (len(self.names), len(outputs))
+        updates = OrderedDict()
+        remaining = []
+        self.output_names = []
+        for name, output in zip(self.names, outputs):
+            output = T.as_tensor_variable(output)
+            if output.ndim - int(stacked) != 0:
+                remaining.append(output)
+                self.output_names.append(name)
+                continue
+            if name not in self.sums:
+                self.sums[name] = sharedX(0., name="%s_sum" % name, dtype='float64')
+            output = T.cast(output, 'float64')
+            total = output.sum() if stacked else output
+            updates[self.sums[name]] = self.sums[name] + total
+        if outputs:
+            steps = T.cast(T.as_tensor_variable(outputs[0]).shape[0], 'int64') if stacked else 1
+            updates[self.count] = self.count + steps
+        return remaining, updates
+
+    def read(self):
+        """
+        Copies the running sums and count to the host totals and resets them to zero.
+
+        Returns
+        -------
+        OrderedDict
+            The name: mean value of each accumulated monitor since the last `read()` (NaN if nothing was summed).
+        """
+        count = int(self.count.get_value())
+        self.count.set_value(numpy.asarray(0, dtype='int64'))
+        self.total_count += count
+        means = OrderedDict()
+        for name, shared in self.sums.items():
+            total = float(shared.get_value())
+            shared.set_value(numpy.asarray(0., dtype='float64'))
+            self.totals[name] = self.totals.get(name, 0.) + total
+            means[name] = total / count if count else numpy.nan
+        return means
+
+    def means(self):
+        """
+        Returns the name: mean value of each accumulated monitor over every `read()` since the last `reset()`
+        (NaN if nothing was summed).
+
+        Returns
+        -------
+        OrderedDict
+            The mean values.
+        """
+        return OrderedDict(
+            [(name, total / self.total_count if self.total_count else numpy.nan)
+             for name, total in self.totals.items()]
+        )
+
+    def reset(self):
+        """
+        Resets the running sums, count, and host totals to zero.
+        """
+        self.read()
+        self.totals = OrderedDict()
+        self.total_count = 0
@@ -0,0 +1,74 @@
+import unittest
+import numpy
+import theano
+import theano.tensor as T
+from opendeep.monitor.accumulator import MonitorAccumulator
+
+
+class TestAccumulator(unittest.TestCase):
+    def setUp(self):
+        self.x = T.vector('x')
+        self.batches = [numpy.asarray(batch, dtype=theano.config.floatX) for batch in
+                        [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10, 11, 12]]]
+
+    def testAccumulate(self):
+        accumulator = MonitorAccumulator(['mean', 'max', 'doubled'])
+        remaining, updates = accumulator.accumulate([self.x.mean(), self.x.max(), self.x * 2])
+        # the vector monitor can't be summed, so it stays an output of the function
+        assert accumulator.output_names == ['doubled']
+        assert list(accumulator.sums.keys()) == ['mean', 'max']
+        assert accumulator.count.dtype == 'int64'
+        assert all(shared.dtype == 'float64' for shared in accumulator.sums.values())
+        f = theano.function([self.x], remaining, updates=updates)
+
+        for batch in self.batches[:2]:
+            doubled, = f(batch)
+            assert numpy.allclose(doubled, batch * 2)
+        means = accumulator.read()
+        assert list(means.keys()) == ['mean', 'max']
+        assert numpy.allclose(list(means.values()), [3.5, 4.5]), "Found means %s" % str(means)
+        # reading resets the running sums
+        assert accumulator.count.get_value() == 0 and accumulator.sums['mean'].get_value() == 0
+
+        for batch in self.batches[2:]:
+            f(batch)
+        means = accumulator.read()
+        assert numpy.allclose(list(means.values()), [9.5, 10.5]), "Found means %s" % str(means)
+        # the means over every read since the last reset
+        means = accumulator.means()
+        assert numpy.allclose(list(means.values()), [6.5, 7.5]), "Found means %s" % str(means)
+        assert accumulator.total_count == 4
+
+        accumulator.reset()
+        assert accumulator.total_count == 0 and len(accumulator.means()) == 0
+        assert all(numpy.isnan(value) for value in accumulator.read().values())
+
+    def testStacked(self):
+        # the values of several steps stacked along the first dimension, like from a scan
+        x = T.matrix('x')
+        accumulator = MonitorAccumulator(['mean', 'rows'])
+        remaining, updates = accumulator.accumulate([x.mean(axis=1), x], stacked=True)
+        assert accumulator.output_names == ['rows']
+        f = theano.function([x], remaining, updates=updates)
+        rows, = f(numpy.stack(self.batches[:3]))
+        assert rows.shape == (3, 3)
+        f(numpy.stack(self.batches[3:]))
+        assert accumulator.count.get_value() == 4
+        means = accumulator.read()
+        assert numpy.allclose(means['mean'], 6.5), "Found means %s" % str(means)
+
+    def testPrecision(self):
+        # a float32 running sum would lose the small values added to a large total
+        accumulator = MonitorAccumulator(['value'])
+        _, updates = accumulator.accumulate([self.x.sum()])
+        f = theano.function([self.x], [], updates=updates)
+        f(numpy.asarray([2 ** 24], dtype=theano.config.floatX))
+        for _ in range(10):
+            f(numpy.asarray([1], dtype=theano.config.floatX))
+        means = accumulator.read()
+        assert numpy.allclose(means['value'], (2 ** 24 + 10) / 11., rtol=0, atol=1e-6), \
+            "Found means %s" % str(means)
+
+
+if __name__ == '__main__':
+    unittest.main()
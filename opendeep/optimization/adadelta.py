@@ -29,7 +29,8 @@ class AdaDelta(Optimizer):
                  save_freq=None, stop_threshold=None, stop_patience=None,
                  learning_rate=1e-6, lr_decay=None, lr_decay_factor=None,
                  decay=0.95,
-                 grad_clip=None, hard_clip=False):
+                 grad_clip=None, hard_clip=False,
+                 **kwargs):
         """
         Initialize AdaDelta.
 
@@ -72,6 +73,8 @@ class AdaDelta(Optimizer):
         # need to call the SGD constructor after parameters are extracted because the constructor calls get_updates()!
         initial_parameters = locals().copy()
         initial_parameters.pop('self')
+        # pass any extra Optimizer keyword arguments along to the superclass
+        initial_parameters.update(initial_parameters.pop('kwargs'))
         super(AdaDelta, self).__init__(**initial_parameters)
 
         assert decay >= 0., "AdaDelta Decay needs to be >=0."
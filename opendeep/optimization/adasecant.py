@@ -52,7 +52,8 @@ class AdaSecant(Optimizer):
                  learning_rate=1e-6, lr_decay=None, lr_decay_factor=None,
                  decay=0.95, gamma_clip=1.8, damping=1e-7, grad_clip=None, hard_clip=False, start_var_reduction=0,
                  delta_clip=None, use_adagrad=False, skip_nan_inf=False,
-                 upper_bound_tau=1e8, lower_bound_tau=1.5, use_corrected_grad=True):
+                 upper_bound_tau=1e8, lower_bound_tau=1.5, use_corrected_grad=True,
+                 **kwargs):
         """
         Initialize AdaSecant.
 
@@ -109,6 +110,8 @@ class AdaSecant(Optimizer):
         # get everything together with the Optimizer class
         initial_parameters = locals().copy()
         initial_parameters.pop('self')
+        # pass any extra Optimizer keyword arguments along to the superclass
+        initial_parameters.update(initial_parameters.pop('kwargs'))
         super(AdaSecant, self).__init__(**initial_parameters)
 
         assert decay >= 0., "Decay needs to be >=0."
@@ -33,6 +33,19 @@ class BinaryCrossentropy(Loss):
         """
         super(BinaryCrossentropy, self).__init__(inputs=inputs, targets=targets)
 
+    def get_step_losses(self):
+        """
+        The mean binary cross-entropy over the last dimension of each step.
+
+        Returns
+        -------
+        theano expression
+            The step losses.
+        """
+        input = self.inputs[0]
+        target = self.targets[0]
+        return mean(nnet.binary_crossentropy(input, target), axis=-1)
+
     def get_loss(self):
         """
         The mean of the binary cross-entropy tensor, where binary cross-entropy is applied element-wise:
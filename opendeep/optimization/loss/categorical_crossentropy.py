@@ -37,6 +37,27 @@ class CategoricalCrossentropy(Loss):
         """
         super(CategoricalCrossentropy, self).__init__(inputs=inputs, targets=targets)
 
+    def get_step_losses(self):
+        """
+        The categorical cross-entropy of each step. Inputs with more than 2 dimensions (like time-major
+        (timesteps, batch, classes) outputs) are flattened to rows of distributions and the losses are reshaped back.
+
+        Returns
+        -------
+        theano expression
+            The step losses.
+        """
+        input = self.inputs[0]
+        target = self.targets[0]
+        if input.ndim == 2:
+            return nnet.categorical_crossentropy(input, target)
+        flat_input = input.reshape((-1, input.shape[-1]))
+        if target.ndim == input.ndim:
+            flat_target = target.reshape((-1, target.shape[-1]))
+        else:
+            flat_target = target.flatten()
+        return nnet.categorical_crossentropy(flat_input, flat_target).reshape(input.shape[:-1], ndim=input.ndim - 1)
+
     def get_loss(self):
         """
         The mean of the categorical cross-entropy tensor.
@@ -3,6 +3,9 @@ This module defines expressions for finding the loss or cost function for models
 """
 # standard libraries
 import logging
+# third party libraries
+import theano
+from theano.tensor import maximum, switch, shape_padright
 # internal references
 from opendeep.utils.misc import (raise_to_list, base_variables)
 
@@ -77,6 +80,52 @@ class Loss(object):
         else:
             raise NotImplementedError("Loss function not defined for %s" % self._classname)
 
+    def get_step_losses(self):
+        """
+        Returns the expression for the loss of each example (or of each timestep of each sequence, for time-major
+        outputs) - the loss with the data (last) dimension reduced, before it is averaged over the examples. The
+        mean of the step losses is the same as `get_loss()`.
+
+        Returns
+        -------
+        theano expression
+            The step losses, with the shape of the inputs without their last dimension.
+
+        Raises
+        ------
+        NotImplementedError
+            If the step losses aren't defined for this loss.
+        """
+        raise NotImplementedError("Step losses not defined for %s" % self._classname)
+
+    def get_masked_loss(self, mask):
+        """
+        Returns the expression for the loss averaged over only the steps where the mask is 1, like the
+        (timesteps, batch) mask for padded sequences from :func:`opendeep.utils.batch.bucket_minibatch`. The padded
+        steps don't add to the loss or its gradients, even if their loss is inf or NaN (like the log of a
+        saturated output) - they are switched out instead of multiplied by zero, and no gradient flows back
+        through the padded steps of the inputs.
+
+        Parameters
+        ----------
+        mask : theano symbolic variable
+            The mask with the same shape as the step losses (see `get_step_losses()`).
+
+        Returns
+        -------
+        theano expression
+            The masked loss function.
+        """
+        # multiplying the gradient of a non-finite padded step by zero would still give NaN, so the padded steps of
+        # the inputs only pass on zero gradients
+        replace = {}
+        for input in self.inputs:
+            if getattr(input, 'ndim', 0) >= mask.ndim:
+                input_mask = shape_padright(mask, input.ndim - mask.ndim)
+                replace[input] = switch(input_mask, input, theano.gradient.zero_grad(input))
+        step_losses = theano.clone(self.get_step_losses(), replace=replace)
+        return switch(mask, step_losses, 0).sum() / maximum(mask.sum(), 1)
+
     def get_targets(self):
         """
         Returns the target(s) Theano symbolic variables used to compute the loss. These will be fed
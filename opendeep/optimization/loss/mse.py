@@ -31,6 +31,21 @@ class MSE(Loss):
         """
         super(MSE, self).__init__(inputs=inputs, targets=targets, mean_over_second=mean_over_second)
 
+    def get_step_losses(self):
+        """
+        The squared error of each step, averaged or summed (depending on mean_over_second) over the last dimension.
+
+        Returns
+        -------
+        theano expression
+            The step losses.
+        """
+        target = self.targets[0]
+        input = self.inputs[0]
+        if self.args.get('mean_over_second'):
+            return mean(sqr(target - input), axis=-1)
+        return sqr(target - input).sum(axis=-1)
+
     def get_loss(self):
         """
         Returns
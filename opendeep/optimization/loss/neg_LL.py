@@ -37,6 +37,28 @@ class Neg_LL(Loss):
         """
         super(Neg_LL, self).__init__(inputs=inputs, targets=targets, one_hot=one_hot)
 
+    def get_step_losses(self):
+        """
+        The negative log-likelihood of each step (averaged over the last dimension for one-hot targets, like
+        `get_loss()`). Int targets can have any number of leading dimensions, like the (timesteps, batch) labels
+        for the time-major outputs of recurrent layers.
+
+        Returns
+        -------
+        theano expression
+            The step losses.
+        """
+        p_y_given_x = self.inputs[0]
+        y = self.targets[0]
+        if self.args.get('one_hot'):
+            return -mean(Tlog(p_y_given_x) * y, axis=-1)
+        assert y.ndim == p_y_given_x.ndim - 1, "Need to have int targets with one less dimension than the model " \
+                                               "output, found %d and %d" % (y.ndim, p_y_given_x.ndim)
+        # flatten the leading (like time and batch) axes to index the log-likelihood of each label
+        flat_y = y.flatten()
+        flat_p = p_y_given_x.reshape((flat_y.shape[0], p_y_given_x.shape[-1]), ndim=2)
+        return -Tlog(flat_p)[arange(flat_y.shape[0]), flat_y].reshape(y.shape, ndim=y.ndim)
+
     def get_loss(self):
         """
         Returns
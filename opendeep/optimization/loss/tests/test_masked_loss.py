@@ -0,0 +1,90 @@
+from __future__ import division
+import unittest
+import numpy
+import theano
+import theano.tensor as T
+from opendeep.optimization.loss import BinaryCrossentropy, CategoricalCrossentropy, MSE, Neg_LL
+
+
+class TestMaskedLoss(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(1)
+        self.x = T.tensor3('x')
+        self.mask = T.matrix('mask')
+        self.W = theano.shared(rng.uniform(-1, 1, (3, 4)).astype(theano.config.floatX), name='W')
+        self.b = theano.shared(numpy.zeros((4,), dtype=theano.config.floatX), name='b')
+        # a softmax output layer applied to each step of time-major (timesteps, batch, data) inputs
+        flat = T.nnet.softmax(T.dot(self.x, self.W).reshape((-1, 4)) + self.b)
+        self.output = flat.reshape((self.x.shape[0], self.x.shape[1], 4), ndim=3)
+
+        # two sequences of length 5 and 3, padded to 5 steps
+        self.lengths = [5, 3]
+        self.inputs = rng.uniform(-1, 1, (5, 2, 3)).astype(theano.config.floatX)
+        self.targets = numpy.eye(4, dtype=theano.config.floatX)[rng.randint(0, 4, (5, 2))]
+        self.masks = numpy.zeros((5, 2), dtype=theano.config.floatX)
+        for j, length in enumerate(self.lengths):
+            self.masks[:length, j] = 1
+
+    def testPaddingIgnored(self):
+        losses = [CategoricalCrossentropy(self.output, T.tensor3('y')),
+                  BinaryCrossentropy(self.output, T.tensor3('y')),
+                  MSE(self.output, T.tensor3('y')),
+                  Neg_LL(self.output, T.tensor3('y'))]
+        for loss in losses:
+            y = loss.get_targets()[0]
+            cost = loss.get_masked_loss(self.mask)
+            f = theano.function([self.x, y, self.mask], [cost] + T.grad(cost, [self.W, self.b]),
+                                allow_input_downcast=True)
+            outs = f(self.inputs, self.targets, self.masks)
+
+            # changing the padding shouldn't change the cost or the gradients
+            inputs, targets = self.inputs.copy(), self.targets.copy()
+            inputs[3:, 1] = 100.
+            targets[3:, 1] = 0.
+            padded_outs = f(inputs, targets, self.masks)
+            for out, padded_out in zip(outs, padded_outs):
+                assert numpy.allclose(out, padded_out), \
+                    "%s: padding changed %s to %s" % (loss._classname, str(out), str(padded_out))
+
+            # the cost is the mean over the real steps of the unpadded sequences
+            costs = []
+            for j, length in enumerate(self.lengths):
+                ones = numpy.ones((length, 1), dtype=theano.config.floatX)
+                costs.append(f(self.inputs[:length, j:j+1], self.targets[:length, j:j+1], ones)[0] * length)
+            expected = sum(costs) / sum(self.lengths)
+            assert numpy.allclose(outs[0], expected), \
+                "%s: expected cost %s, found %s" % (loss._classname, str(expected), str(outs[0]))
+
+    def testNonFinitePadding(self):
+        labels = numpy.argmax(self.targets, axis=-1)
+        losses = [(CategoricalCrossentropy(self.output, T.tensor3('y')), self.targets),
+                  (Neg_LL(self.output, T.tensor3('y')), self.targets),
+                  (Neg_LL(self.output, T.lmatrix('y'), one_hot=False), labels)]
+        for loss, targets in losses:
+            y = loss.get_targets()[0]
+            cost = loss.get_masked_loss(self.mask)
+            f = theano.function([self.x, y, self.mask], [cost] + T.grad(cost, [self.W, self.b]),
+                                allow_input_downcast=True)
+            outs = f(self.inputs, targets, self.masks)
+            # saturate the softmax of the padded steps so their outputs underflow to 0 and their losses are inf/NaN
+            inputs = self.inputs.copy()
+            inputs[3:, 1] = 1e5
+            padded_outs = f(inputs, targets, self.masks)
+            for out, padded_out in zip(outs, padded_outs):
+                assert numpy.all(numpy.isfinite(padded_out)) and numpy.allclose(out, padded_out), \
+                    "%s: non-finite padding changed %s to %s" % (loss._classname, str(out), str(padded_out))
+
+    def testTimeMajorLabels(self):
+        # int labels for the (timesteps, batch, classes) outputs of a recurrent layer
+        labels = numpy.argmax(self.targets, axis=-1)
+        loss = Neg_LL(self.output, T.lmatrix('y'), one_hot=False)
+        f = theano.function([self.x, loss.get_targets()[0]], loss.get_step_losses(), allow_input_downcast=True)
+        steps = f(self.inputs, labels)
+        assert steps.shape == (5, 2), "Found step losses shape %s" % str(steps.shape)
+        # the same as the log-likelihood of each step's label
+        probs = theano.function([self.x], self.output, allow_input_downcast=True)(self.inputs)
+        expected = -numpy.log(probs[numpy.arange(5)[:, None], numpy.arange(2)[None, :], labels])
+        assert numpy.allclose(steps, expected), "Expected step losses %s, found %s" % (str(expected), str(steps))
+
+if __name__ == '__main__':
+    unittest.main()
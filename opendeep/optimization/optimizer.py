@@ -22,22 +22,30 @@ TRAIN_COST_KEY : str
 """
 # standard libraries
 import logging
+import sys
+import threading
 import time
 # third party
 import numpy
+import theano
 import theano.tensor as T
 from theano.compat.python2x import OrderedDict
+import six
 from six import iteritems
 # internal references
-from opendeep.utils.constructors import sharedX, function, grad
+from opendeep.utils.constructors import sharedX, device_shared, function, grad, compact_inputs
 from opendeep.data.dataset import Dataset
+from opendeep.data.stream.prefetchstream import PrefetchStream
+from opendeep.data.stream.augmentstream import AugmentStream
 from opendeep.models.model import Model
 from opendeep.optimization.loss import Loss
 from opendeep.monitor.monitor import collapse_channels
+from opendeep.monitor.accumulator import MonitorAccumulator
 from opendeep.utils.decay import get_decay_function
+from opendeep.utils.checkpoint import CheckpointWriter
 from opendeep.utils.misc import (raise_to_list, make_time_units_string,
                                  add_kwargs_to_dict, trunc)
-from opendeep.utils.batch import minibatch
+from opendeep.utils.batch import minibatch, bucket_minibatch, stack_minibatches, shuffle_indices, is_array_like
 from opendeep.utils.misc import min_normalized_izip, base_variables
 
 log = logging.getLogger(__name__)
@@ -56,6 +64,11 @@ class Optimizer(object):
                  save_freq=10, stop_threshold=None, stop_patience=50,
                  learning_rate=1e-3, lr_decay=None, lr_decay_factor=None,
                  grad_clip=None, hard_clip=False,
+                 shared_data=False, prefetch=None, shuffle=False, shuffle_block=None, batch_buffers=None,
+                 bucket_width=None, augment=None, steps_per_call=1,
+                 accumulate_monitors=False, monitor_freq=None,
+                 valid_freq=1, test_freq=1, eval_unit='epochs', async_eval=False, early_stop_monitor=None,
+                 device_best_params=False, async_checkpoints=False, keep_checkpoints=None, keep_best_checkpoint=False,
                  **kwargs):
         """
         Initialize the Optimizer.
@@ -92,6 +105,87 @@ class Optimizer(object):
             Whether to clip gradients. This will clip the norm of the gradients either with a hard cutoff or rescaling.
         hard_clip : bool
             Whether to use a hard cutoff or rescaling for clipping gradients.
+        shared_data : bool, optional
+            Whether to place the dataset into Theano shared variables once before training (on the device if using
+            a GPU) and compile the training and monitor functions to take only a minibatch index, slicing the data
+            through `givens`. This removes the per-batch host-to-device copy. Only subsets made of in-memory numpy
+            arrays can be shared - other subsets (including numpy.memmap) fall back to streaming minibatches.
+        prefetch : int, optional
+            The number of minibatches to keep ready in a background thread while the compiled functions run
+            (see :class:`opendeep.data.stream.PrefetchStream`). This overlaps the dataset streaming work (file reading,
+            tokenizing, batching) with computation. If None or 0, minibatches are created in the training thread.
+        shuffle : bool, optional
+            Whether to draw a fresh permutation of the training examples each epoch and gather the minibatches with
+            it (keeping inputs and targets aligned) instead of walking the data in the same order every epoch. The
+            data isn't copied, but shuffling is only possible for numpy arrays or array-like training data.
+        shuffle_block : int, optional
+            If given with `shuffle`, keep the examples in contiguous blocks of this size and only shuffle the order
+            of the blocks. This keeps disk reads sequential for memory-mapped or HDF5 data.
+        batch_buffers : int, optional
+            The number of preallocated buffers to reuse when batching data from streams (that aren't numpy arrays),
+            instead of allocating new arrays every batch (see :func:`opendeep.utils.batch.iterable_minibatch`).
+            When used with `prefetch`, at least `prefetch` + 3 buffers are used so queued batches aren't overwritten.
+        bucket_width : int, optional
+            If given, the dataset's examples are variable-length sequences (with time as the first dimension, like
+            from :func:`opendeep.utils.batch.sequence_array`) that are batched with others of similar length
+            (see :func:`opendeep.utils.batch.bucket_minibatch`), with this range of lengths per bucket. Minibatches
+            are padded and time-major (timesteps, batch, data...), and the (timesteps, batch) mask for the padding
+            is passed as the model's last input (like the `mask` of :class:`opendeep.models.RNN`). The loss only
+            averages the unpadded steps (see :meth:`opendeep.optimization.loss.Loss.get_masked_loss`). The data
+            can't be used with `shared_data`.
+        augment : dict, optional
+            If given, the keyword arguments for an :class:`opendeep.data.stream.AugmentStream` that augments the
+            image minibatches of the first input (like uint8 images from :class:`opendeep.data.ImageDataset`) on
+            the host - random crops, flips, and scale jitter for training, and center crops for validation and
+            testing, with the mean subtracted from both. Each epoch is seeded from the augmentation `seed` and the
+            epoch number. The data can't be used with `shared_data`.
+        steps_per_call : int, optional
+            The number of minibatch updates to apply in each call of the compiled training function. With more than
+            1, f_learn takes a stacked block of this many minibatches (or the block index with `shared_data`) and
+            applies the updates one minibatch after another inside a `theano.scan`, returning the costs and
+            monitors of every step. This saves the per-call overhead for models with cheap steps.
+        accumulate_monitors : bool, optional
+            Whether to sum the training cost and the scalar monitors in shared variables updated by the compiled
+            functions (see :class:`opendeep.monitor.MonitorAccumulator`), instead of returning their values to the
+            host after every minibatch. The sums are only read at the end of each epoch (or every `monitor_freq`
+            calls), which removes a device-to-host copy from every training step.
+        monitor_freq : int, optional
+            With `accumulate_monitors`, the number of f_learn calls between logging the mean training monitors
+            of the calls since the last log. If None, they are only logged at the end of the epoch.
+        valid_freq : int, optional
+            How often (in `eval_unit`) to compute the validation monitors. If None or 0, they are never computed.
+        test_freq : int, optional
+            How often (in `eval_unit`) to compute the testing monitors. If None or 0, they are never computed.
+        eval_unit : str, optional
+            The unit of `valid_freq` and `test_freq` - 'epochs', or 'batches' for the number of f_learn calls
+            (blocks of minibatches with `steps_per_call`) counted across epochs.
+        async_eval : bool, optional
+            Whether to compute the validation and testing monitors in a background thread while training continues.
+            The monitor functions are compiled to use shadow copies of the parameters (with the switches off),
+            which are updated from the parameters by a compiled copy function when an evaluation starts. An
+            evaluation that would start while the previous one is still running is skipped, and the results are
+            logged (and sent to the outservices and plot) in the training thread once they are done.
+            The most recent completed evaluation of each subset (synchronous or not) is kept in `last_evaluation`.
+        early_stop_monitor : str, optional
+            The monitor to use for early stopping (and for choosing the best parameters) instead of the total
+            training cost, as 'valid:<name>' or 'test:<name>' for the monitor `name` of that subset. Each completed
+            evaluation of the subset is compared to the best value so far, so the `stop_patience` counts
+            evaluations instead of epochs. With `async_eval`, the best parameters are the evaluated snapshot.
+        device_best_params : bool, optional
+            Whether to keep the best parameters (restored at the end of training) in preallocated shadow shared
+            variables, copied by a compiled function whenever the cost improves, instead of copying every
+            parameter to the host. This keeps the copies on the device, at the cost of doubling the memory for the
+            parameters there - if the shadows can't be allocated, the best parameters are copied to the host
+            instead. Use `get_best_param_values()` to get them on the host.
+        async_checkpoints : bool, optional
+            Whether to write the parameter checkpoints (every `save_freq` epochs and at the end of training) in a
+            background thread while training continues (see :class:`opendeep.utils.checkpoint.CheckpointWriter`).
+            The parameter values are still copied to the host before training continues.
+        keep_checkpoints : int, optional
+            If given, only the last `keep_checkpoints` checkpoints written during training are kept.
+        keep_best_checkpoint : bool, optional
+            With `keep_checkpoints`, whether to also keep the checkpoint written with the lowest early stopping cost
+            (the total training cost, or the `early_stop_monitor`).
         """
         log.info("Initializing optimizer %s", str(self.__class__.__name__))
 
@@ -141,6 +235,17 @@ class Optimizer(object):
 
         model_inputs = raise_to_list(model.get_inputs())
         n_model_inputs = len(model_inputs)
+        # when bucketing sequences, only the steps in the mask (the model's last input) count in the loss.
+        if bucket_width:
+            if isinstance(loss, Loss):
+                try:
+                    self.loss_expression = loss.get_masked_loss(model_inputs[-1])
+                except NotImplementedError:
+                    log.warning("%s can't be masked, so the padded steps of the bucketed sequences count in the "
+                                "loss.", loss._classname)
+            else:
+                log.warning("The loss isn't a Loss object, so the padded steps of the bucketed sequences count in "
+                            "the loss.")
 
         model_targets = self.loss_targets or []
         for input in model_inputs:
@@ -149,6 +254,9 @@ class Optimizer(object):
 
         n_model_targets = len(model_targets)
         self.unsupervised = (n_model_targets is 0)
+        # when bucketing sequences, the model's last input is the mask created with the minibatches.
+        if bucket_width:
+            n_model_inputs -= 1
         # make sure the number of inputs/targets matches up with the dataset properties
         # train
         assert n_model_inputs == len(raise_to_list(dataset.train_inputs)), \
@@ -204,6 +312,32 @@ class Optimizer(object):
         self.early_stop_length = stop_patience
         self.grad_clip = grad_clip
         self.hard_clip = hard_clip
+        self.shared_data = shared_data
+        self.prefetch = prefetch
+        self.shuffle = shuffle
+        self.shuffle_block = shuffle_block
+        self.batch_buffers = batch_buffers
+        self.bucket_width = bucket_width
+        self.augment = augment
+        self.steps_per_call = max(steps_per_call or 1, 1)
+        self.accumulate_monitors = accumulate_monitors
+        self.monitor_freq = monitor_freq
+        assert eval_unit in ('epochs', 'batches'), "eval_unit has to be 'epochs' or 'batches', found %s" % \
+                                                   str(eval_unit)
+        self.valid_freq = valid_freq
+        self.test_freq = test_freq
+        self.eval_unit = eval_unit
+        self.async_eval = async_eval
+        self.early_stop_monitor = None
+        if early_stop_monitor is not None:
+            subset, _, name = early_stop_monitor.partition(':')
+            assert subset in ('valid', 'test') and name, \
+                "early_stop_monitor has to be 'valid:<name>' or 'test:<name>', found %s" % str(early_stop_monitor)
+            self.early_stop_monitor = (subset, name)
+        self.device_best_params = device_best_params
+        self.async_checkpoints = async_checkpoints
+        self.keep_checkpoints = keep_checkpoints
+        self.keep_best_checkpoint = keep_best_checkpoint
 
     def get_updates(self, gradients):
         """
@@ -283,6 +417,9 @@ class Optimizer(object):
 
         log.info("%s params: %s", self.model._classname, str(list(self.params.keys())))
 
+        # the shadows to keep the best parameters in, and the compiled functions to copy them back and forth
+        self._compile_best_params(params)
+
         ############
         # monitors #
         ############
@@ -308,48 +445,131 @@ class Optimizer(object):
             self.train_monitors_outservice_dict = OrderedDict([(name, out) for name, _, out in train_collapsed])
             self.valid_monitors_outservice_dict = OrderedDict([(name, out) for name, _, out in valid_collapsed])
             self.test_monitors_outservice_dict  = OrderedDict([(name, out) for name, _, out in test_collapsed])
+        # sum the monitors on the device instead of returning them from every call if we are accumulating
+        self.monitor_accumulators = {}
+        if self.accumulate_monitors:
+            self.monitor_accumulators = {
+                "train": MonitorAccumulator([TRAIN_COST_KEY] + list(self.train_monitors_dict.keys())),
+                "valid": MonitorAccumulator(self.valid_monitors_dict.keys()),
+                "test": MonitorAccumulator(self.test_monitors_dict.keys())
+            }
 
         #######################################
         # compile train and monitor functions #
         #######################################
         function_input = raise_to_list(self.model.get_inputs())
+        # take the inputs in the dataset's compact storage dtype and decode them in the graph
+        self.storage_givens = None
+        input_storage = self._get_input_storage(len(function_input))
+        # always set (or clear) the model's input storage so a storage from an earlier dataset doesn't stick around
+        self.model.set_input_storage(*(input_storage or (None,)))
+        if input_storage is not None:
+            function_input, self.storage_givens = compact_inputs(function_input, *input_storage)
+            log.info("Passing the inputs to %s in their storage dtype %s", self.model._classname,
+                     str(input_storage[0]))
         if self.loss_targets is not None:
             function_input += self.loss_targets
+        # put the dataset subsets into shared variables if we are using them for minibatches
+        self.shared_subsets = {}
+        if self.shared_data and not self.bucket_width and not self.augment:
+            self.shared_subsets = {
+                "train": self._get_shared_subset("train", self.dataset.train_inputs, self.dataset.train_targets),
+                "valid": self._get_shared_subset("valid", self.dataset.valid_inputs, self.dataset.valid_targets),
+                "test": self._get_shared_subset("test", self.dataset.test_inputs, self.dataset.test_targets)
+            }
+        # the shuffled example order to slice shared training data with
+        self.shuffle_index = None
+        if self.shuffle:
+            if self.shared_subsets.get("train") is not None:
+                self.shuffle_index = theano.shared(numpy.arange(self.shared_subsets["train"][1], dtype='int64'),
+                                                   name="shuffle_index")
+            elif not all(is_array_like(d) for d in
+                         self._subset_data(self.dataset.train_inputs, self.dataset.train_targets)):
+                log.warning("The train subset isn't made of numpy arrays (or array-like objects), so it can't be "
+                            "shuffled. Iterating it in order instead.")
+                self.shuffle = False
         # Compile the training function!
         log.info('Compiling f_learn function for model %s...', self.model._classname)
         t = time.time()
 
-        f_learn = function(inputs=function_input,
-                           updates=updates,
-                           outputs=[self.loss_expression] + list(self.train_monitors_dict.values()),
-                           name='f_learn')
+        if self.steps_per_call > 1:
+            f_learn = self._compile_multistep_function("train",
+                                                       inputs=function_input,
+                                                       updates=updates,
+                                                       outputs=[self.loss_expression] +
+                                                               list(self.train_monitors_dict.values()),
+                                                       name='f_learn',
+                                                       accumulator=self.monitor_accumulators.get("train"))
+        else:
+            f_learn = self._compile_subset_function("train",
+                                                    inputs=function_input,
+                                                    updates=updates,
+                                                    outputs=[self.loss_expression] +
+                                                            list(self.train_monitors_dict.values()),
+                                                    name='f_learn',
+                                                    accumulator=self.monitor_accumulators.get("train"))
 
         log.info('f_learn compilation took %s', make_time_units_string(time.time() - t))
 
         # figure out if we want valid and test (monitors)
-        self.valid_flag = (self.dataset.valid_inputs is not None) and (len(self.valid_monitors_dict) > 0)
-        self.test_flag = (self.dataset.test_inputs is not None) and (len(self.test_monitors_dict) > 0)
+        self.valid_flag = (self.dataset.valid_inputs is not None) and (len(self.valid_monitors_dict) > 0) and \
+            bool(self.valid_freq)
+        self.test_flag = (self.dataset.test_inputs is not None) and (len(self.test_monitors_dict) > 0) and \
+            bool(self.test_freq)
         # Now compile the monitor functions!
         log.debug("Compiling monitor functions...")
         monitor_t = time.time()
+        # asynchronous evaluation computes the monitors from a snapshot of the parameters (with the switches off),
+        # and without the model's updates, so the training thread can keep changing them.
+        monitor_updates = self.model.get_updates()
+        snapshot_replace = None
+        self.snapshot_shadows = None
+        self.snapshot_function = None
+        if self.async_eval and (self.valid_flag or self.test_flag):
+            self.snapshot_shadows, snapshot_replace, self.snapshot_function = self._compile_snapshot(params)
+            monitor_updates = None
+            # the evaluated snapshot is the one to keep when early stopping on its monitors
+            if self.best_shadows is not None and self.early_stop_monitor is not None:
+                self.save_snapshot_best_function = function(
+                    inputs=[],
+                    updates=[(self.best_shadows[param], shadow) for param, shadow in self.snapshot_shadows.items()],
+                    name='save_snapshot_best_function'
+                )
+        if self.early_stop_monitor is not None:
+            subset, name = self.early_stop_monitor
+            assert name in getattr(self, "%s_monitors_dict" % subset), \
+                "Couldn't find the early_stop_monitor %s in the %s monitors." % (name, subset)
+            if not getattr(self, "%s_flag" % subset):
+                log.warning("The %s monitors aren't computed, so early stopping on %s will never happen.",
+                            subset, name)
         # valid monitors
         if self.valid_flag:
-            self.valid_monitor_function = function(
+            valid_outputs = list(self.valid_monitors_dict.values())
+            if snapshot_replace is not None:
+                valid_outputs = theano.clone(valid_outputs, replace=snapshot_replace)
+            self.valid_monitor_function = self._compile_subset_function(
+                "valid",
                 inputs=function_input,
-                updates=self.model.get_updates(),
-                outputs=list(self.valid_monitors_dict.values()),
-                name='valid_monitor_function'
+                updates=monitor_updates,
+                outputs=valid_outputs,
+                name='valid_monitor_function',
+                accumulator=self.monitor_accumulators.get("valid")
             )
         else:
             self.valid_monitor_function = None
 
         # test monitors
         if self.test_flag:
-            self.test_monitor_function = function(
+            test_outputs = list(self.test_monitors_dict.values())
+            if snapshot_replace is not None:
+                test_outputs = theano.clone(test_outputs, replace=snapshot_replace)
+            self.test_monitor_function = self._compile_subset_function(
+                "test",
                 inputs=function_input,
-                updates=self.model.get_updates(),
-                outputs=list(self.test_monitors_dict.values()),
-                name='test_monitor_function'
+                updates=monitor_updates,
+                outputs=test_outputs,
+                name='test_monitor_function',
+                accumulator=self.monitor_accumulators.get("test")
             )
         else:
             self.test_monitor_function = None
@@ -372,6 +592,14 @@ class Optimizer(object):
         self.best_cost = numpy.inf
         self.best_params = None
         self.patience = 0
+        self.batch_counter = 0
+        self.eval_thread = None
+        self.eval_results = None
+        self.last_evaluation = {}
+        self.stop_cost = None
+        self.checkpoint_writer = CheckpointWriter(background=self.async_checkpoints,
+                                                  keep_last=self.keep_checkpoints,
+                                                  keep_best=self.keep_best_checkpoint)
 
         t = time.time()
 
@@ -382,12 +610,18 @@ class Optimizer(object):
                 log.info("STOPPING EARLY FROM KEYBOARDINTERRUPT")
                 self.STOP = True
 
+        # report the evaluation still running in the background
+        self._collect_evaluation(plot, wait=True)
+
         # save params
-        if self.best_params is not None:
-            log.debug("Restoring best model parameters...")
-            self.model.set_param_values(self.best_params, borrow=False)
+        self._restore_best_params()
         log.debug("Saving model parameters...")
-        self.model.save_params('trained_epoch_' + str(self.epoch_counter))
+        self.model.save_params('trained_epoch_' + str(self.epoch_counter), writer=self.checkpoint_writer)
+        # wait for the checkpoints still being written - a failed checkpoint doesn't fail the training run
+        try:
+            self.checkpoint_writer.wait()
+        except Exception as e:
+            log.error("Some checkpoints could not be written during training: %s", str(e))
 
         log.info("------------TRAIN TIME TOOK %s---------", make_time_units_string(time.time() - t))
 
@@ -406,31 +640,40 @@ class Optimizer(object):
         #########
         # train #
         #########
-        train_costs = []
-        train_monitors = {key: [] for key in self.train_monitors_dict.keys()}
-        train_data = [
-            minibatch(input_data, self.batch_size, self.min_batch_size)
-            for input_data in raise_to_list(self.dataset.train_inputs)
-            ]
-        if self.dataset.train_targets is not None and not self.unsupervised:
-            train_data += [
-                minibatch(target, self.batch_size, self.min_batch_size)
-                for target in raise_to_list(self.dataset.train_targets)
-                ]
-
-        for batch in min_normalized_izip(*train_data):
+        accumulator = self.monitor_accumulators.get("train")
+        if accumulator is not None:
+            accumulator.reset()
+            output_names = accumulator.output_names
+        else:
+            output_names = [TRAIN_COST_KEY] + list(self.train_monitors_dict.keys())
+        train_values = OrderedDict([(name, []) for name in output_names])
+        train_batches = self._iter_batches("train", self.dataset.train_inputs, self.dataset.train_targets,
+                                           indices=self._get_shuffle_indices(), steps=self.steps_per_call)
+
+        for n_calls, batch in enumerate(train_batches, 1):
+            self.batch_counter += 1
             _outs = raise_to_list(f_learn(*batch))
-            train_costs.append(_outs[0])
-            # handle any user defined monitors (if different from the train cost)
-            if len(train_monitors) > 0:
-                current_monitors = zip(self.train_monitors_dict.keys(), _outs[1:])
-                for name, val in current_monitors:
-                    val = numpy.asarray(val)
-                    train_monitors[name].append(val)
+            # handle the outputs (the train cost and any user defined monitors) that weren't accumulated
+            for name, val in zip(output_names, _outs):
+                val = numpy.asarray(val)
+                # the multi-step function returns the outputs of every step stacked along the first dimension
+                if self.steps_per_call > 1:
+                    train_values[name].extend(val)
+                else:
+                    train_values[name].append(val)
+            if accumulator is not None and self.monitor_freq and n_calls % self.monitor_freq == 0:
+                log.info('Train monitors (%d calls): %s', n_calls, str(accumulator.read()))
+            if self.eval_unit == 'batches':
+                self._evaluate(self.batch_counter, plot)
 
         # get the mean values for the batches
-        mean_train = numpy.mean(train_costs, 0)
-        current_mean_monitors = {key: numpy.mean(vals, 0) for key, vals in train_monitors.items()}
+        current_mean_monitors = self._get_mean_values("train", train_values)
+        mean_train = current_mean_monitors.pop(TRAIN_COST_KEY)
+        # the total train cost for early stopping
+        if accumulator is not None and TRAIN_COST_KEY in accumulator.totals:
+            train_cost = accumulator.totals[TRAIN_COST_KEY]
+        else:
+            train_cost = numpy.sum(train_values[TRAIN_COST_KEY])
         # log the mean values!
         log.info('Train cost: %s', trunc(mean_train))
         if len(current_mean_monitors) > 0:
@@ -447,33 +690,21 @@ class Optimizer(object):
         if self.model.switches_on:
             self.model.turn_off_switches()
 
-        #########
-        # valid #
-        #########
-        self._compute_over_subset("valid", self.dataset.valid_inputs, self.dataset.valid_targets,
-                                  self.valid_monitors_dict, self.valid_monitor_function,
-                                  self.valid_monitors_outservice_dict, plot)
-
-        ########
-        # test #
-        ########
-        self._compute_over_subset("test", self.dataset.test_inputs, self.dataset.test_targets,
-                                  self.test_monitors_dict, self.test_monitor_function,
-                                  self.test_monitors_outservice_dict, plot)
+        ##################
+        # valid and test #
+        ##################
+        if self.eval_unit == 'epochs':
+            self._evaluate(self.epoch_counter, plot)
+        # report any finished background evaluation
+        self._collect_evaluation(plot)
 
         ###########
         # cleanup #
         ###########
-        # check for early stopping on train costs
-        cost = numpy.sum(train_costs)
-        # if the cost improved, reset the patience and record the best cost.
-        if cost < self.best_cost * self.early_stop_threshold:
-            self.patience = 0
-            self.best_cost = cost
-            # save the parameters that made it the best
-            self.best_params = self.model.get_param_values(borrow=False)
-        elif not numpy.isnan(cost):
-            self.patience += 1
+        # check for early stopping on train costs (the evaluations update it for an early_stop_monitor)
+        if self.early_stop_monitor is None:
+            self._update_best(train_cost)
+        cost = self.stop_cost
 
         # check for stopping either from n_epochs or from threshold/patience
         stop = False
@@ -494,7 +725,8 @@ class Optimizer(object):
 
         if (self.epoch_counter % self.save_frequency) == 0:
             #save params
-            self.model.save_params('trained_epoch_' + str(self.epoch_counter))
+            self.model.save_params('trained_epoch_' + str(self.epoch_counter), writer=self.checkpoint_writer,
+                                   cost=cost)
 
         # ANNEAL!
         if not stop:
@@ -505,35 +737,485 @@ class Optimizer(object):
         # return whether or not to stop this epoch
         return stop
 
+    def _update_best(self, cost, from_snapshot=False):
+        """
+        Helper method to check the early stopping cost - if it improved, reset the patience and save the parameters
+        (or the evaluated snapshot of them) as the best, otherwise add to the patience.
+        """
+        self.stop_cost = cost
+        if cost < self.best_cost * self.early_stop_threshold:
+            self.patience = 0
+            self.best_cost = cost
+            # save the parameters that made it the best
+            if self.best_shadows is not None:
+                if from_snapshot:
+                    self.save_snapshot_best_function()
+                else:
+                    self.save_best_function()
+                self.best_params = self.best_shadows
+            elif from_snapshot:
+                self.best_params = {name: self.snapshot_shadows[param].get_value(borrow=False)
+                                    for name, param in self.model.get_params().items()
+                                    if param in self.snapshot_shadows}
+            else:
+                self.best_params = self.model.get_param_values(borrow=False)
+        elif not numpy.isnan(cost):
+            self.patience += 1
+
+    def _record_evaluation(self, subset, means, epoch, from_snapshot=False):
+        """
+        Helper method to keep a completed evaluation of the subset in `last_evaluation`, and to check it for early
+        stopping if it has the early_stop_monitor.
+        """
+        self.last_evaluation[subset] = (epoch, means)
+        if self.early_stop_monitor is not None and self.early_stop_monitor[0] == subset:
+            self._update_best(float(means[self.early_stop_monitor[1]]), from_snapshot)
+
+    def _evaluate(self, count, plot=None):
+        """
+        Helper method to compute the valid and test monitors whose frequency divides the `count` of epochs or
+        batches - in the background if evaluating asynchronously.
+        """
+        subsets = [subset for subset, freq, flag in [("valid", self.valid_freq, self.valid_flag),
+                                                     ("test", self.test_freq, self.test_flag)]
+                   if flag and count % freq == 0]
+        if len(subsets) == 0:
+            return
+        if self.async_eval:
+            self._start_evaluation(subsets, plot)
+            return
+        # the switches are off for evaluation - turn them back on if evaluating in the middle of an epoch
+        switches_on = self.model.switches_on
+        if switches_on:
+            self.model.turn_off_switches()
+        for subset in subsets:
+            self._compute_over_subset(subset, *self._get_subset_monitors(subset), plot=plot)
+        if switches_on:
+            self.model.turn_on_switches()
+
+    def _start_evaluation(self, subsets, plot=None):
+        """
+        Helper method to snapshot the parameters and compute the monitors for the subsets in a background thread.
+        """
+        self._collect_evaluation(plot)
+        if self.eval_thread is not None:
+            log.info("Skipping the %s evaluation - the previous evaluation is still running.", ", ".join(subsets))
+            return
+        self.snapshot_function()
+        epoch = self.epoch_counter
+
+        def worker():
+            try:
+                results = [(subset, self._compute_subset_means(subset, *self._get_subset_monitors(subset)[:4]))
+                           for subset in subsets]
+                self.eval_results = (epoch, results, None)
+            except Exception:
+                self.eval_results = (epoch, None, sys.exc_info())
+
+        self.eval_thread = threading.Thread(target=worker, name="AsyncEvaluation")
+        self.eval_thread.daemon = True
+        self.eval_thread.start()
+
+    def _collect_evaluation(self, plot=None, wait=False):
+        """
+        Helper method to report the results of the background evaluation if it has finished (or after waiting
+        for it). Any exception raised by the evaluation is re-raised here.
+        """
+        if getattr(self, 'eval_thread', None) is None:
+            return
+        if wait:
+            self.eval_thread.join()
+        if self.eval_thread.is_alive():
+            return
+        self.eval_thread = None
+        epoch, results, error = self.eval_results
+        self.eval_results = None
+        if error is not None:
+            six.reraise(*error)
+        for subset, means in results:
+            if means is not None:
+                self._record_evaluation(subset, means, epoch, from_snapshot=True)
+                self._report_monitors(subset, means, self._get_subset_monitors(subset)[4], plot, epoch)
+
+    def _get_subset_monitors(self, subset):
+        """
+        Helper method to return the (inputs, targets, monitors_dict, monitor_function, monitors_outservice_dict)
+        for the valid or test subset.
+        """
+        if subset == "valid":
+            return (self.dataset.valid_inputs, self.dataset.valid_targets, self.valid_monitors_dict,
+                    self.valid_monitor_function, self.valid_monitors_outservice_dict)
+        return (self.dataset.test_inputs, self.dataset.test_targets, self.test_monitors_dict,
+                self.test_monitor_function, self.test_monitors_outservice_dict)
+
+    def _compile_snapshot(self, params):
+        """
+        Helper method to create the shadow copies of the parameters for asynchronous evaluation. Returns the
+        OrderedDict of parameter: shadow, the replacements for the monitor expressions (the shadows for the
+        parameters and zeros for the switches), and the compiled function that copies the parameters into the
+        shadows.
+        """
+        shadows = self._make_shadows(params, "snapshot")
+        replace = OrderedDict(shadows)
+        for switch in raise_to_list(self.model.get_switches()) or []:
+            replace[switch] = T.zeros_like(switch)
+        snapshot_function = function(inputs=[], updates=[(shadow, param) for param, shadow in shadows.items()],
+                                     name='snapshot_function')
+        return shadows, replace, snapshot_function
+
+    def _compile_best_params(self, params):
+        """
+        Helper method to create the device-side shadows for the best parameters (if `device_best_params`), and the
+        compiled functions that save the parameters to them and restore the parameters from them. If the shadows
+        can't be allocated (like when the device is out of memory), the best parameters are kept on the host.
+        """
+        self.best_shadows = None
+        if not self.device_best_params:
+            return
+        try:
+            best_shadows = self._make_shadows(params, "best")
+        except (MemoryError, RuntimeError) as e:
+            log.warning("Couldn't allocate the device copies of the best parameters, keeping them on the host "
+                        "instead: %s", str(e))
+            return
+        self.save_best_function = function(
+            inputs=[], updates=[(shadow, param) for param, shadow in best_shadows.items()],
+            name='save_best_function'
+        )
+        self.restore_best_function = function(
+            inputs=[], updates=[(param, shadow) for param, shadow in best_shadows.items()],
+            name='restore_best_function'
+        )
+        self.best_shadows = best_shadows
+
+    def _restore_best_params(self):
+        """
+        Helper method to set the model's parameters back to the best ones saved during training (if any).
+        """
+        if self.best_params is None:
+            return
+        log.debug("Restoring best model parameters...")
+        if self.best_shadows is not None:
+            self.restore_best_function()
+        else:
+            self.model.set_param_values(self.best_params, borrow=False)
+
+    def _make_shadows(self, variables, suffix):
+        """
+        Helper method to create a preallocated shadow shared variable (with the same value, type, and device) for
+        each of the shared variables, so values can be copied between them by compiled updates instead of through
+        the host. Returns the OrderedDict of variable: shadow.
+        """
+        return OrderedDict(
+            [(variable, theano.shared(variable.get_value(borrow=True), name="%s_%s" % (variable.name, suffix),
+                                      broadcastable=variable.broadcastable))
+             for variable in variables]
+        )
+
+    def get_best_param_values(self):
+        """
+        Returns the values of the model parameters that had the best cost during training so far.
+
+        Returns
+        -------
+        dict(str: array_like) or None
+            Dict of {string_name: numpy arrays} of the best values for the model parameters
+            (see :meth:`opendeep.models.Model.get_param_values`), or None if there are no best parameters yet.
+        """
+        if getattr(self, 'best_params', None) is None:
+            return None
+        if self.best_shadows is None:
+            return self.best_params
+        values = {}
+        for name, param in self.model.get_params().items():
+            if param in self.best_shadows:
+                values[name] = self.best_shadows[param].get_value(borrow=False)
+        return values
+
     def _compute_over_subset(self, subset, inputs, targets,
                              monitors_dict, monitor_function, monitors_outservice_dict,
                              plot):
+        current_mean_monitors = self._compute_subset_means(subset, inputs, targets, monitors_dict, monitor_function)
+        if current_mean_monitors is not None:
+            self._record_evaluation(subset, current_mean_monitors, self.epoch_counter)
+            self._report_monitors(subset, current_mean_monitors, monitors_outservice_dict, plot, self.epoch_counter)
+
+    def _compute_subset_means(self, subset, inputs, targets, monitors_dict, monitor_function):
+        """
+        Helper method to run the monitor function over the minibatches of the subset and return the name: mean
+        value of each monitor (or None if there is nothing to compute).
+        """
         inputs = raise_to_list(inputs)
         targets = raise_to_list(targets)
         if inputs is not None and len(monitors_dict) > 0:
-            monitors = {key: [] for key in monitors_dict.keys()}
-            data = [minibatch(input, self.batch_size, self.min_batch_size) for input in inputs]
-            if targets is not None and not self.unsupervised:
-                data += [minibatch(target, self.batch_size, self.min_batch_size) for target in targets]
+            accumulator = self.monitor_accumulators.get(subset)
+            if accumulator is not None:
+                accumulator.reset()
+                output_names = accumulator.output_names
+            else:
+                output_names = list(monitors_dict.keys())
+            monitors = OrderedDict([(name, []) for name in output_names])
 
-            for batch in min_normalized_izip(*data):
+            for batch in self._iter_batches(subset, inputs, targets):
                 _outs = raise_to_list(monitor_function(*batch))
-                current_monitors = zip(monitors_dict.keys(), _outs)
+                current_monitors = zip(output_names, _outs)
                 for name, val in current_monitors:
                     val = numpy.asarray(val)
                     monitors[name].append(val)
 
             # get the mean values for the batches
-            current_mean_monitors = {key: numpy.mean(vals, 0) for key, vals in monitors.items()}
-            # log the mean values!
-            log.info('%s monitors: %s', subset, str(current_mean_monitors))
-            # send the values to their outservices
-            for name, service in monitors_outservice_dict.items():
-                if name in current_mean_monitors and service:
-                    service.write(current_mean_monitors[name], subset)
-            # if there is a plot, also send them over!
-            if plot:
-                plot.update_plots(epoch=self.epoch_counter, monitors=current_mean_monitors)
+            return self._get_mean_values(subset, monitors)
+        return None
+
+    def _report_monitors(self, subset, current_mean_monitors, monitors_outservice_dict, plot, epoch):
+        """
+        Helper method to log the mean monitor values for the subset and send them to their outservices and plot.
+        """
+        # log the mean values!
+        log.info('%s monitors: %s', subset, str(current_mean_monitors))
+        # send the values to their outservices
+        for name, service in monitors_outservice_dict.items():
+            if name in current_mean_monitors and service:
+                service.write(current_mean_monitors[name], subset)
+        # if there is a plot, also send them over!
+        if plot:
+            plot.update_plots(epoch=epoch, monitors=current_mean_monitors)
+
+    def _get_mean_values(self, subset, values):
+        """
+        Helper method to return the name: mean value over the minibatches of each monitor for the subset - from
+        the lists of values collected on the host, and from the subset's accumulator (if accumulating).
+        """
+        means = {name: numpy.mean(vals, 0) for name, vals in values.items()}
+        accumulator = self.monitor_accumulators.get(subset)
+        if accumulator is not None:
+            accumulator.read()
+            means.update(accumulator.means())
+        return means
+
+    def _get_shared_subset(self, subset, inputs, targets):
+        """
+        Helper method to put the inputs and targets for a dataset subset into shared variables. Returns a tuple
+        of (list of shared variables, number of examples), or None if the subset can't be shared.
+        """
+        if inputs is None:
+            return None
+        data = self._subset_data(inputs, targets)
+        if not all(isinstance(d, numpy.ndarray) and not isinstance(d, numpy.memmap) for d in data):
+            log.warning("The %s subset isn't made of in-memory numpy arrays, so it can't be used with shared_data. "
+                        "Streaming minibatches for it instead.", subset)
+            return None
+
+        log.debug("Putting the %s subset into shared variables...", subset)
+        shared = []
+        for i, d in enumerate(data):
+            # floats are stored as floatX (so they can live on the GPU), everything else keeps its dtype.
+            dtype = theano.config.floatX if numpy.issubdtype(d.dtype, numpy.floating) else None
+            shared.append(device_shared(d, name="%s_data_%d" % (subset, i), borrow=True, dtype=dtype))
+        n_examples = min([d.shape[0] for d in data])
+        return shared, n_examples
+
+    def _compile_subset_function(self, subset, inputs, outputs, updates, name, accumulator=None):
+        """
+        Helper method to compile a function over minibatches of the given subset. If the subset was put into shared
+        variables, the function only takes the minibatch index and slices the data through `givens`. If an
+        accumulator is given, the outputs it can sum are accumulated by the function instead of returned.
+        """
+        if accumulator is not None:
+            outputs, accumulate_updates = accumulator.accumulate(raise_to_list(outputs))
+            updates = OrderedDict(updates or {})
+            updates.update(accumulate_updates)
+
+        if self.shared_subsets.get(subset) is None:
+            return function(inputs=inputs, updates=updates, outputs=outputs, givens=self.storage_givens, name=name)
+
+        index = T.lscalar('batch_index')
+        givens = self._shared_givens(subset, inputs, index)
+        return function(inputs=[index], updates=updates, outputs=outputs, givens=givens, name=name)
+
+    def _compile_multistep_function(self, subset, inputs, outputs, updates, name, accumulator=None):
+        """
+        Helper method to compile a function that applies `steps_per_call` minibatch updates one after another in
+        a `theano.scan`, returning the outputs of every step stacked along the first dimension. The function takes
+        a stacked block of minibatches (see :func:`opendeep.utils.batch.stack_minibatches`), or the index of the
+        block if the subset was put into shared variables. If an accumulator is given, the outputs it can sum are
+        accumulated over the steps instead of returned.
+        """
+        outputs = raise_to_list(outputs)
+        updates = OrderedDict(updates or {})
+        shared_subset = self.shared_subsets.get(subset)
+        if shared_subset is None:
+            function_inputs = [T.TensorType(variable.dtype, (False,) + variable.broadcastable)(
+                name="%s_steps" % (variable.name or 'input')) for variable in inputs]
+            sequences = function_inputs
+        else:
+            block = T.lscalar('block_index')
+            function_inputs = [block]
+            first = block * self.steps_per_call
+            sequences = [T.arange(first, T.minimum(first + self.steps_per_call,
+                                                   self._n_shared_batches(shared_subset[1])))]
+
+        def step(*step_inputs):
+            if shared_subset is None:
+                _check_input_count(subset, inputs, step_inputs)
+                replace = self._decode_givens(inputs, OrderedDict(zip(inputs, step_inputs)))
+            else:
+                replace = self._shared_givens(subset, inputs, step_inputs[0])
+            # one clone so the outputs and updates share the same graph for the step
+            step_graph = theano.clone(outputs + list(updates.values()), replace=replace)
+            step_updates = OrderedDict(zip(updates.keys(), step_graph[len(outputs):]))
+            return step_graph[:len(outputs)], step_updates
+
+        step_outputs, step_updates = theano.scan(step, sequences=sequences, name="%s_steps" % name)
+        step_outputs = raise_to_list(step_outputs)
+        if accumulator is not None:
+            step_outputs, accumulate_updates = accumulator.accumulate(step_outputs, stacked=True)
+            step_updates.update(accumulate_updates)
+        return function(inputs=function_inputs, outputs=step_outputs, updates=step_updates, name=name)
+
+    def _shared_givens(self, subset, inputs, index):
+        """
+        Helper method to return the givens that slice the minibatch at `index` out of the shared variables of the
+        subset for each of the function `inputs`.
+        """
+        shared, n_examples = self.shared_subsets[subset]
+        _check_input_count(subset, inputs, shared)
+        start = index * self.batch_size
+        end = T.minimum(start + self.batch_size, n_examples)
+        if subset == "train" and self.shuffle_index is not None:
+            batch_slice = self.shuffle_index[start:end]
+        else:
+            batch_slice = slice(start, end)
+        givens = OrderedDict(
+            [(variable, T.cast(data[batch_slice], variable.dtype)) for variable, data in zip(inputs, shared)]
+        )
+        return self._decode_givens(inputs, givens)
+
+    def _decode_givens(self, inputs, givens):
+        """
+        Helper method to turn givens for the function `inputs` into givens for the model's inputs - if the inputs
+        are in a compact storage dtype, the data given for them is decoded in place of the model's inputs.
+        """
+        if not self.storage_givens:
+            return givens
+        model_inputs = raise_to_list(self.model.get_inputs())
+        compact = [variable for variable in inputs[:len(model_inputs)] if variable not in model_inputs]
+        return OrderedDict(
+            [(variable, theano.clone(decoded, replace=givens))
+             for variable, decoded in self.storage_givens.items()] +
+            [(variable, data) for variable, data in givens.items() if variable not in compact]
+        )
+
+    def _n_shared_batches(self, n_examples):
+        """
+        Helper method to return the number of minibatches (at least `min_batch_size` large) in a shared subset.
+        """
+        n_batches = int(numpy.ceil(n_examples / float(self.batch_size)))
+        if n_batches > 0 and n_examples - (n_batches - 1) * self.batch_size < self.min_batch_size:
+            n_batches -= 1
+        return n_batches
+
+    def _iter_batches(self, subset, inputs, targets, indices=None, steps=1):
+        """
+        Helper method that yields the argument lists to pass to the compiled function for each minibatch of the
+        given subset - either the minibatch index (if the subset is shared) or the minibatch arrays themselves
+        (gathered in the order of `indices` if given). With more than 1 `steps`, the minibatches are grouped into
+        blocks for a multi-step function - the block index, or the stacked minibatches.
+        """
+        shared_subset = self.shared_subsets.get(subset)
+        if shared_subset is not None:
+            n_batches = self._n_shared_batches(shared_subset[1])
+            for index in range(int(numpy.ceil(n_batches / float(steps)))):
+                yield [index]
+        else:
+            augment = None
+            if self.augment:
+                augment = dict(self.augment, random=(subset == "train"), epoch=self.epoch_counter, index=0)
+            if self.bucket_width:
+                batches = self._iter_bucket_batches(inputs, targets, indices)
+            else:
+                buffers = self.batch_buffers
+                if buffers and self.prefetch:
+                    # the queue, the batch being consumed, and the batch waiting to be queued all need their own
+                    # buffer
+                    buffers = max(buffers, self.prefetch + 3)
+                if buffers and augment:
+                    # the batches read ahead by the augmentation workers also need their own buffers
+                    buffers = max(buffers, 3) + AugmentStream(None, **augment).lookahead()
+                elif buffers and steps > 1:
+                    # a block (and the batch after it) is held before the minibatches are stacked
+                    buffers = max(buffers, steps + 1)
+                data = [minibatch(d, self.batch_size, self.min_batch_size, indices, buffers)
+                        for d in self._subset_data(inputs, targets)]
+                batches = min_normalized_izip(*data)
+            if augment:
+                batches = AugmentStream(batches, **augment)
+            if steps > 1:
+                batches = stack_minibatches(batches, steps)
+            if self.prefetch:
+                batches = PrefetchStream(batches, self.prefetch)
+            for batch in batches:
+                yield batch
+
+    def _iter_bucket_batches(self, inputs, targets, indices=None):
+        """
+        Helper method that yields the padded, length-bucketed minibatches of sequences for a subset as the list of
+        inputs, followed by the mask and then the targets.
+        """
+        def gather(d):
+            for i in indices:
+                yield d[i]
+
+        data = self._subset_data(inputs, targets)
+        if indices is not None:
+            data = [gather(d) for d in data]
+        n_inputs = len(raise_to_list(inputs))
+        for batch, mask in bucket_minibatch(data, self.batch_size, self.min_batch_size, self.bucket_width):
+            yield batch[:n_inputs] + [mask] + batch[n_inputs:]
+
+    def _subset_data(self, inputs, targets):
+        """
+        Helper method to return the list of data iterables (inputs followed by targets if supervised) for a subset.
+        """
+        data = list(raise_to_list(inputs))
+        if targets is not None and not self.unsupervised:
+            data += raise_to_list(targets)
+        return data
+
+    def _get_input_storage(self, n_model_inputs):
+        """
+        Helper method to return the (dtypes, scales, offsets) lists of the compact storage for each of the model's
+        inputs from the dataset, or None if the dataset's inputs aren't stored in a compact dtype.
+        """
+        dtype = getattr(self.dataset, 'inputs_dtype', None)
+        if dtype is None:
+            return None
+        if self.augment:
+            log.info("The augmented minibatches are already decoded, so the inputs aren't passed in their storage "
+                     "dtype %s.", str(dtype))
+            return None
+        n_inputs = len(raise_to_list(self.dataset.train_inputs))
+        storage = []
+        for value in (dtype, getattr(self.dataset, 'inputs_scale', None), getattr(self.dataset, 'inputs_offset', None)):
+            value = list(value) if isinstance(value, (list, tuple)) else [value] * n_inputs
+            # the mask made for bucketed sequences (the last model input) isn't from the dataset
+            storage.append(value + [None] * (n_model_inputs - n_inputs))
+        return storage
+
+    def _get_shuffle_indices(self):
+        """
+        Helper method to draw a new order of the training examples for this epoch (if shuffling). For shared
+        training data, the order is set in the shuffle_index shared variable instead of returned.
+        """
+        if not self.shuffle:
+            return None
+        shared_subset = self.shared_subsets.get("train")
+        if shared_subset is not None:
+            self.shuffle_index.set_value(shuffle_indices(shared_subset[1], self.shuffle_block), borrow=True)
+            return None
+        n_examples = min([d.shape[0] for d in self._subset_data(self.dataset.train_inputs,
+                                                                 self.dataset.train_targets)])
+        return shuffle_indices(n_examples, self.shuffle_block)
 
     def get_decay_params(self):
         """
@@ -615,3 +1297,13 @@ def clip_gradients(gradients, grad_clip=5., hard_clip=False):
         return clipgrads
     else:
         return gradients
+
+def _check_input_count(subset, inputs, data):
+    """
+    Checks that there is one data array (or variable) given for each of the function inputs of the subset,
+    instead of silently leaving inputs without data or binding the data to the wrong inputs.
+    """
+    assert len(inputs) == len(data), \
+        "The %s functions take %d inputs (the model inputs followed by the loss targets), but the %s data has " \
+        "%d arrays (the dataset inputs followed by the targets). Make sure the dataset subset matches the " \
+        "model and loss." % (subset, len(inputs), subset, len(data))
@@ -32,7 +32,8 @@ class RMSProp(Optimizer):
                  save_freq=None, stop_threshold=None, stop_patience=None,
                  learning_rate=1e-6, lr_decay=None, lr_decay_factor=None,
                  decay=0.95, max_scaling=1e5,
-                 grad_clip=None, hard_clip=False):
+                 grad_clip=None, hard_clip=False,
+                 **kwargs):
         """
         Initialize RMSProp.
 
@@ -78,6 +79,8 @@ class RMSProp(Optimizer):
         # need to call the Optimizer constructor
         initial_parameters = locals().copy()
         initial_parameters.pop('self')
+        # pass any extra Optimizer keyword arguments along to the superclass
+        initial_parameters.update(initial_parameters.pop('kwargs'))
         super(RMSProp, self).__init__(**initial_parameters)
 
         assert max_scaling > 0., "Max_scaling needs to be > 0."
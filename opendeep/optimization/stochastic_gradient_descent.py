@@ -23,7 +23,8 @@ class SGD(Optimizer):
                  save_freq=None, stop_threshold=None, stop_patience=None,
                  learning_rate=.1, lr_decay="exponential", lr_decay_factor=.995,
                  momentum=0.5, momentum_decay="linear", momentum_factor=0, nesterov_momentum=True,
-                 grad_clip=None, hard_clip=False):
+                 grad_clip=None, hard_clip=False,
+                 **kwargs):
         """
         Initialize SGD.
 
@@ -74,6 +75,8 @@ class SGD(Optimizer):
         # superclass init
         initial_parameters = locals().copy()
         initial_parameters.pop('self')
+        # pass any extra Optimizer keyword arguments along to the superclass
+        initial_parameters.update(initial_parameters.pop('kwargs'))
         super(SGD, self).__init__(**initial_parameters)
 
         # Momentum - smoothing over the parameter changes (see Hinton)
@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+import unittest
+import numpy
+import theano
+import theano.tensor as T
+from opendeep.data.dataset_memory import NumpyDataset
+from opendeep.models.single_layer.basic import Dense
+from opendeep.monitor.monitor import Monitor
+from opendeep.optimization.loss import MSE
+from opendeep.optimization.optimizer import Optimizer
+
+
+class RecordingOptimizer(Optimizer):
+    """
+    Records every (subset, epoch, means) the optimizer reports.
+    """
+    def _report_monitors(self, subset, current_mean_monitors, monitors_outservice_dict, plot, epoch):
+        self.reports.append((subset, epoch, dict(current_mean_monitors)))
+        super(RecordingOptimizer, self)._report_monitors(subset, current_mean_monitors, monitors_outservice_dict,
+                                                         plot, epoch)
+
+
+class FailingOptimizer(Optimizer):
+    """
+    Fails while computing the evaluation monitors.
+    """
+    def _compute_subset_means(self, subset, inputs, targets, monitors_dict, monitor_function):
+        raise RuntimeError("Failed to evaluate the %s subset." % subset)
+
+
+class TestAsyncEval(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = numpy.random.RandomState(1)
+        data = [rng.uniform(size=(10, n)).astype(theano.config.floatX) for n in (3, 2, 3, 2)]
+        self.dataset = NumpyDataset(data[0], data[1], valid_inputs=data[2], valid_targets=data[3])
+        self.model = Dense(inputs=((None, 3), T.matrix('x')), outputs=2, activation='linear', outdir=self.dir)
+        self.loss = MSE(inputs=self.model.get_outputs(), targets=T.matrix('y'))
+        self.monitor = Monitor('mse', self.loss.get_loss(), train=False, valid=True)
+        self.initial = self.model.get_param_values(borrow=False)
+
+    def _train(self, optimizer_class, **kwargs):
+        self.model.set_param_values(self.initial, borrow=False)
+        optimizer = optimizer_class(dataset=self.dataset, loss=self.loss, model=self.model, epochs=3, batch_size=4,
+                                    learning_rate=0.1, **kwargs)
+        optimizer.reports = []
+        optimizer.train(monitor_channels=[self.monitor])
+        return optimizer
+
+    def testEpochs(self):
+        expected = self._train(RecordingOptimizer, async_eval=False)
+        expected = {epoch: means for subset, epoch, means in expected.reports if subset == "valid"}
+        assert sorted(expected.keys()) == [1, 2, 3]
+        optimizer = self._train(RecordingOptimizer, async_eval=True)
+        found = [(epoch, means) for subset, epoch, means in optimizer.reports if subset == "valid"]
+        # evaluations can be skipped while the previous one runs, but each one is reported for the epoch it
+        # evaluated, with the parameters from the end of that epoch
+        assert len(found) > 0
+        for epoch, means in found:
+            assert numpy.allclose(means['mse'], expected[epoch]['mse']), \
+                "Epoch %d: expected %s, found %s" % (epoch, str(expected[epoch]), str(means))
+        assert optimizer.last_evaluation['valid'][0] == found[-1][0]
+        assert optimizer.eval_thread is None
+
+    def testError(self):
+        try:
+            self._train(FailingOptimizer, async_eval=True)
+            raise AssertionError("The failed evaluation wasn't raised from train().")
+        except RuntimeError as e:
+            assert "valid subset" in str(e), str(e)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
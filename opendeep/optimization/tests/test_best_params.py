@@ -0,0 +1,46 @@
+import unittest
+import numpy
+import theano.tensor as T
+from opendeep.models.single_layer.basic import Dense
+from opendeep.optimization.optimizer import Optimizer
+
+
+class TestBestParams(unittest.TestCase):
+    def setUp(self):
+        self.model = Dense(inputs=((None, 3), T.matrix('x')), outputs=2)
+
+    def _optimizer(self, device_best_params):
+        # only the best parameter helpers are tested, so skip compiling the training functions
+        optimizer = Optimizer.__new__(Optimizer)
+        optimizer.model = self.model
+        optimizer.device_best_params = device_best_params
+        optimizer.early_stop_threshold = 1.
+        optimizer.best_cost = numpy.inf
+        optimizer.best_params = None
+        optimizer.patience = 0
+        optimizer._compile_best_params(list(self.model.get_params().values()))
+        return optimizer
+
+    def _set_params(self, value):
+        self.model.set_param_values({name: numpy.ones_like(param) * value
+                                     for name, param in self.model.get_param_values().items()})
+
+    def testRoundTrip(self):
+        for device_best_params in [False, True]:
+            optimizer = self._optimizer(device_best_params)
+            assert (optimizer.best_shadows is not None) == device_best_params
+            optimizer._restore_best_params()
+            for cost, value in [(3., 1), (2., 2), (4., 3)]:
+                self._set_params(value)
+                optimizer._update_best(cost)
+            assert optimizer.best_cost == 2. and optimizer.patience == 1
+            for name, best in optimizer.get_best_param_values().items():
+                assert numpy.all(best == 2), "%s: found best %s" % (name, str(best))
+            # restoring puts the best parameters back in the model
+            optimizer._restore_best_params()
+            for name, value in self.model.get_param_values().items():
+                assert numpy.all(value == 2), "%s: restored %s" % (name, str(value))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+import theano
+import theano.tensor as T
+from opendeep.data.dataset_memory import NumpyDataset
+from opendeep.models import model as model_module
+from opendeep.models.single_layer.basic import Dense
+from opendeep.optimization.loss import MSE
+from opendeep.optimization import SGD
+
+
+def _fail(params_dict, path):
+    raise IOError("No space left on device.")
+
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = numpy.random.RandomState(1)
+        self.dataset = NumpyDataset(rng.uniform(size=(10, 3)).astype(theano.config.floatX),
+                                    rng.uniform(size=(10, 2)).astype(theano.config.floatX))
+        self.model = Dense(inputs=((None, 3), T.matrix('x')), outputs=2, activation='linear', outdir=self.dir)
+        self.loss = MSE(inputs=self.model.get_outputs(), targets=T.matrix('y'))
+
+    def testFailedCheckpoint(self):
+        write_params = model_module._write_pickle_params
+        model_module._write_pickle_params = _fail
+        try:
+            assert not self.model.save_params('failed')
+            for async_checkpoints in [False, True]:
+                optimizer = SGD(dataset=self.dataset, loss=self.loss, model=self.model, epochs=3, batch_size=4,
+                                save_freq=1, async_checkpoints=async_checkpoints)
+                # the failed checkpoints are logged, and training still runs every epoch
+                optimizer.train()
+                assert optimizer.epoch_counter == 3
+        finally:
+            model_module._write_pickle_params = write_params
+        checkpoints = [f for f in os.listdir(self.dir) if f.startswith('trained_epoch')]
+        assert checkpoints == [], "Found checkpoints %s" % str(checkpoints)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
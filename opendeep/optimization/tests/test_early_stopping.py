@@ -0,0 +1,51 @@
+import unittest
+import numpy
+import theano.tensor as T
+from opendeep.models.single_layer.basic import Dense
+from opendeep.optimization.optimizer import Optimizer
+
+
+class TestEarlyStopping(unittest.TestCase):
+    def setUp(self):
+        self.model = Dense(inputs=((None, 3), T.matrix('x')), outputs=2)
+        # only the early stopping helpers are tested, so skip compiling the training functions
+        self.optimizer = Optimizer.__new__(Optimizer)
+        self.optimizer.model = self.model
+        self.optimizer.early_stop_monitor = ('valid', 'error')
+        self.optimizer.early_stop_threshold = 1.
+        self.optimizer.best_cost = numpy.inf
+        self.optimizer.best_params = None
+        self.optimizer.best_shadows = None
+        self.optimizer.patience = 0
+        self.optimizer.last_evaluation = {}
+
+    def _set_params(self, value):
+        self.model.set_param_values({name: numpy.ones_like(param) * value
+                                     for name, param in self.model.get_param_values().items()})
+
+    def testEvaluationMonitor(self):
+        for epoch, error in enumerate([0.5, 0.3, 0.4, 0.35], 1):
+            self._set_params(epoch)
+            # the test subset isn't the early_stop_monitor
+            self.optimizer._record_evaluation('test', {'error': 0.}, epoch)
+            self.optimizer._record_evaluation('valid', {'error': numpy.float32(error)}, epoch)
+        assert self.optimizer.last_evaluation['valid'] == (4, {'error': numpy.float32(0.35)})
+        assert numpy.isclose(self.optimizer.best_cost, 0.3) and self.optimizer.patience == 2
+        assert numpy.isclose(self.optimizer.stop_cost, 0.35)
+        # the best parameters are the ones evaluated at the best monitor value
+        for value in self.optimizer.get_best_param_values().values():
+            assert numpy.all(value == 2), "Found best parameters %s" % str(value)
+
+    def testSnapshot(self):
+        # with asynchronous evaluation, the evaluated snapshot is kept instead of the current parameters
+        params = self.model.get_params()
+        self.optimizer.snapshot_shadows = self.optimizer._make_shadows(params.values(), "snapshot")
+        self._set_params(3)
+        self.optimizer._record_evaluation('valid', {'error': 0.2}, 1, from_snapshot=True)
+        for name, value in self.optimizer.get_best_param_values().items():
+            assert numpy.array_equal(value, self.optimizer.snapshot_shadows[params[name]].get_value())
+            assert not numpy.all(value == 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
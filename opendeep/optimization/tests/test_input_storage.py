@@ -0,0 +1,52 @@
+import unittest
+import numpy
+import theano
+import theano.tensor as T
+from opendeep.data.dataset_memory import NumpyDataset
+from opendeep.models.single_layer.basic import Dense
+from opendeep.optimization.optimizer import Optimizer
+
+
+class TestInputStorage(unittest.TestCase):
+    def setUp(self):
+        self.pixels = numpy.arange(24).reshape((8, 3)).astype('uint8')
+        self.labels = numpy.arange(8)
+        # only the helper methods are tested, so skip compiling the training functions
+        self.optimizer = Optimizer.__new__(Optimizer)
+        self.optimizer.augment = None
+
+    def testGetInputStorage(self):
+        self.optimizer.dataset = NumpyDataset(self.pixels, self.labels, inputs_dtype='uint8', inputs_scale=1 / 255.)
+        storage = self.optimizer._get_input_storage(1)
+        assert storage == [['uint8'], [1 / 255.], [None]], "Found storage %s" % str(storage)
+
+        # the mask for bucketed sequences is the last model input, and isn't stored compactly
+        storage = self.optimizer._get_input_storage(2)
+        assert storage == [['uint8', None], [1 / 255., None], [None, None]], "Found storage %s" % str(storage)
+
+        # augmented minibatches are already decoded
+        self.optimizer.augment = dict(flip=True)
+        assert self.optimizer._get_input_storage(1) is None
+
+        self.optimizer.augment = None
+        self.optimizer.dataset = NumpyDataset(self.pixels.astype(theano.config.floatX), self.labels)
+        assert self.optimizer._get_input_storage(1) is None
+
+    def testRunStorage(self):
+        model = Dense(inputs=((None, 3), T.matrix('x')), outputs=2, activation='linear')
+        floats = (self.pixels / 255.).astype(theano.config.floatX)
+        expected = model.run(floats)
+
+        # with an input storage, run takes both the compact and the regular inputs
+        model.set_input_storage('uint8', 1 / 255.)
+        assert numpy.allclose(model.run(self.pixels), expected, atol=1e-5)
+        assert numpy.allclose(model.run(floats), expected)
+
+        # clearing the storage removes the compact run function
+        model.set_input_storage(None)
+        assert model.input_storage is None and model.f_run_compact is None
+        assert numpy.allclose(model.run(floats), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import shutil
+import tempfile
+import unittest
+import numpy
+import theano
+import theano.tensor as T
+from opendeep.data.dataset_memory import NumpyDataset
+from opendeep.models.single_layer.basic import Dense
+from opendeep.optimization.loss import MSE
+from opendeep.optimization.optimizer import Optimizer, _check_input_count
+
+
+class TestSharedData(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = numpy.random.RandomState(1)
+        # 10 examples in minibatches of 4, so the last minibatch is a partial one of 2
+        self.dataset = NumpyDataset(rng.uniform(size=(10, 3)).astype(theano.config.floatX),
+                                    rng.uniform(size=(10, 2)).astype(theano.config.floatX))
+        self.model = Dense(inputs=((None, 3), T.matrix('x')), outputs=2, activation='linear', outdir=self.dir)
+        self.loss = MSE(inputs=self.model.get_outputs(), targets=T.matrix('y'))
+        self.initial = self.model.get_param_values(borrow=False)
+
+    def _train(self, **kwargs):
+        self.model.set_param_values(self.initial, borrow=False)
+        # the same shuffled orders for each run
+        numpy.random.seed(2)
+        optimizer = Optimizer(dataset=self.dataset, loss=self.loss, model=self.model, epochs=3, batch_size=4,
+                              learning_rate=0.1, **kwargs)
+        optimizer.train()
+        return optimizer, self.model.get_param_values(borrow=False)
+
+    def testSameMinibatches(self):
+        for shuffle in [False, True]:
+            _, host = self._train(shuffle=shuffle)
+            optimizer, shared = self._train(shuffle=shuffle, shared_data=True)
+            assert "train" in optimizer.shared_subsets
+            assert (optimizer.shuffle_index is not None) == shuffle
+            # the minibatches sliced on the device (in the same order) give the same parameter updates
+            for name, value in host.items():
+                assert numpy.allclose(value, shared[name], atol=1e-5), \
+                    "shuffle=%s: %s differs between the host and shared data" % (str(shuffle), name)
+
+    def testInputCount(self):
+        try:
+            _check_input_count("train", [T.matrix('x'), T.matrix('y')], [numpy.zeros((2, 3))])
+            raise AssertionError("Was able to give 1 data array for 2 inputs.")
+        except AssertionError as e:
+            assert "take 2 inputs" in str(e), str(e)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
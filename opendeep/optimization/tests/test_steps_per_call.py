@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+import unittest
+import numpy
+import theano
+import theano.tensor as T
+from opendeep.data.dataset_memory import NumpyDataset
+from opendeep.models.single_layer.basic import Dense
+from opendeep.optimization.loss import MSE
+from opendeep.optimization.optimizer import Optimizer
+
+
+class TestStepsPerCall(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = numpy.random.RandomState(1)
+        self.dataset = NumpyDataset(rng.uniform(size=(10, 3)).astype(theano.config.floatX),
+                                    rng.uniform(size=(10, 2)).astype(theano.config.floatX))
+        self.model = Dense(inputs=((None, 3), T.matrix('x')), outputs=2, activation='linear', outdir=self.dir)
+        self.loss = MSE(inputs=self.model.get_outputs(), targets=T.matrix('y'))
+        self.initial = self.model.get_param_values(borrow=False)
+
+    def _train(self, **kwargs):
+        self.model.set_param_values(self.initial, borrow=False)
+        optimizer = Optimizer(dataset=self.dataset, loss=self.loss, model=self.model, epochs=2, learning_rate=0.1,
+                              **kwargs)
+        optimizer.train()
+        return self.model.get_param_values(borrow=False)
+
+    def testSameUpdates(self):
+        # 5 minibatches of 2 end on a partial block of steps, and minibatches of 4 end on a partial minibatch
+        for batch_size, steps in [(2, 2), (2, 3), (4, 2)]:
+            for shared_data in [False, True]:
+                expected = self._train(batch_size=batch_size, shared_data=shared_data)
+                found = self._train(batch_size=batch_size, shared_data=shared_data, steps_per_call=steps)
+                for name, value in expected.items():
+                    assert numpy.allclose(value, found[name], atol=1e-5), \
+                        "%s differs with batch_size=%d, steps_per_call=%d, shared_data=%s" % \
+                        (name, batch_size, steps, str(shared_data))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
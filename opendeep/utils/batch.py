@@ -7,11 +7,13 @@ import logging
 import itertools
 # third party libraries
 import numpy
+from six.moves import zip
+from theano import config
 # internal imports
 
 log = logging.getLogger(__name__)
 
-def minibatch(iterable, batch_size=1, min_batch_size=1):
+def minibatch(iterable, batch_size=1, min_batch_size=1, indices=None, buffers=None):
     """
     This processes an iterable and yields batches of data of a given size (with a minimum size requirement).
 
@@ -23,6 +25,13 @@ def minibatch(iterable, batch_size=1, min_batch_size=1):
         The number of examples to pull from the iterable as a batch. Default is 1.
     min_batch_size : int, optional
         The minimum number of examples to pull from the iterable. Default is 1.
+    indices : array_like, optional
+        The order of example indices to gather the batches from (see :func:`numpy_minibatch`). This is only
+        possible for numpy arrays (or array-like objects).
+    buffers : int, optional
+        The number of preallocated buffers to fill batches in place for general iterables
+        (see :func:`iterable_minibatch`). Iterables with a `minibatches` method (like
+        :class:`opendeep.data.stream.WindowStream`) yield their own minibatches instead.
 
     Yields
     ------
@@ -32,17 +41,25 @@ def minibatch(iterable, batch_size=1, min_batch_size=1):
     assert 0 < min_batch_size <= batch_size, \
         "batch_size (%d) has to be larger than min_batch_size (%d) and they both have to be greater than zero!" % \
         (batch_size, min_batch_size)
-    # if our input is just a numpy array, use the faster minibatching function
-    if isinstance(iterable, numpy.ndarray):
+    # if our input is just a numpy array (or sliceable like one), use the faster minibatching function
+    if isinstance(iterable, numpy.ndarray) or is_array_like(iterable):
         # would prefer to use 'yield from' but that syntax is python >= 3.3 only
-        for chunk in numpy_minibatch(iterable, batch_size, min_batch_size):
+        for chunk in numpy_minibatch(iterable, batch_size, min_batch_size, indices):
+            yield chunk
+    # streams that can batch themselves without copies (like a WindowStream) yield their own minibatches
+    elif hasattr(iterable, 'minibatches'):
+        assert indices is None, "Can't gather batches from indices for an iterable that isn't array-like! " \
+                                "Found %s" % str(type(iterable))
+        for chunk in iterable.minibatches(batch_size, min_batch_size):
             yield chunk
     # otherwise for general iterators, use the generic minibatching function.
     else:
-        for chunk in iterable_minibatch(iterable, batch_size, min_batch_size):
+        assert indices is None, "Can't gather batches from indices for an iterable that isn't array-like! " \
+                                "Found %s" % str(type(iterable))
+        for chunk in iterable_minibatch(iterable, batch_size, min_batch_size, buffers):
             yield chunk
 
-def iterable_minibatch(iterable, batch_size=1, min_batch_size=1):
+def iterable_minibatch(iterable, batch_size=1, min_batch_size=1, buffers=None):
     """
     This processes an iterable and yields batches of data of a given size (with a minimum size requirement).
 
@@ -54,6 +71,11 @@ def iterable_minibatch(iterable, batch_size=1, min_batch_size=1):
         The number of examples to pull from the iterable as a batch. Default is 1.
     min_batch_size : int, optional
         The minimum number of examples to pull from the iterable. Default is 1.
+    buffers : int, optional
+        If given, batches are filled in place in a ring of this many preallocated numpy arrays (see
+        :class:`BatchBuffers`) instead of building a new array every batch. The yielded batches are views of the
+        buffers, so only the last `buffers` - 1 batches stay valid after the next one is yielded. All elements of
+        the iterable need the same shape.
 
     Yields
     ------
@@ -66,8 +88,12 @@ def iterable_minibatch(iterable, batch_size=1, min_batch_size=1):
 
     # solution modified from http://stackoverflow.com/questions/8991506/iterate-an-iterator-by-chunks-of-n-in-python
     it = iter(iterable)
+    batch_buffers = BatchBuffers(batch_size, buffers) if buffers else None
     while True:
-        chunk = list(itertools.islice(it, batch_size))
+        if batch_buffers is not None:
+            chunk = batch_buffers.fill(it)
+        else:
+            chunk = list(itertools.islice(it, batch_size))
         # if there was nothing returned by the slice, return
         if len(chunk) == 0:
             return
@@ -75,32 +101,271 @@ def iterable_minibatch(iterable, batch_size=1, min_batch_size=1):
         elif len(chunk) >= min_batch_size:
             yield numpy.asarray(chunk)
 
-def numpy_minibatch(numpy_array, batch_size=1, min_batch_size=1):
+def numpy_minibatch(numpy_array, batch_size=1, min_batch_size=1, indices=None):
     """
     Creates a minibatch generator over a numpy array. :func:`minibatch` delegates to this generator
-    when the input is a numpy.ndarray.
+    when the input is a numpy.ndarray. Array-like objects that have a `shape` and support slicing (like
+    :class:`opendeep.data.HDF5Array`) are sliced directly without being converted to a numpy array first.
 
     Parameters
     ----------
-    numpy_array : numpy.ndarray
+    numpy_array : numpy.ndarray or array-like
         A numpy array.
     batch_size : int, optional
         The number of examples to pull from the array as a batch. Default is 1.
     min_batch_size : int, optional
         The minimum number of examples to pull from the iterable. Default is 1.
+    indices : array_like, optional
+        The order of indices along the first dimension to gather the batches from (like a permutation from
+        :func:`shuffle_indices`). Each batch is gathered with fancy indexing, or sliced if its indices are
+        a contiguous range. Use the same `indices` for inputs and targets to keep them aligned.
 
     Yields
     ------
     numpy array
         A numpy array of the minibatch. It will yield over the first dimension of the input.
     """
-    numpy_array = numpy.asarray(numpy_array)
+    if not is_array_like(numpy_array):
+        numpy_array = numpy.asarray(numpy_array)
     assert 0 < min_batch_size <= batch_size, \
         "batch_size (%d) has to be larger than min_batch_size (%d) and they both have to be greater than zero!" % \
         (batch_size, min_batch_size)
+    if indices is not None:
+        indices = numpy.asarray(indices)
+        for i in iter(range((indices.shape[0] // batch_size) + 1)):
+            idx = indices[i * batch_size:(i + 1) * batch_size]
+            if idx.shape[0] >= min_batch_size:
+                yield numpy_array[_as_slice(idx)]
+        return
     # go through the first dimension of the input array.
     for i in iter(range((numpy_array.shape[0] // batch_size) + 1)):
         idx = i * batch_size
         data = numpy_array[idx:(idx + batch_size)]
         if data.shape[0] >= min_batch_size:
             yield data
+
+def bucket_minibatch(iterables, batch_size=1, min_batch_size=1, bucket_width=1, mask_dtype=None):
+    """
+    Groups variable-length sequences into minibatches of similar lengths, padded with zeros to the longest sequence
+    in each minibatch. Sequences are put in buckets by their length (`bucket_width` lengths per bucket), and a
+    minibatch is yielded as soon as its bucket is full - the leftover sequences in all buckets are batched together
+    (in order of length) at the end.
+
+    Parameters
+    ----------
+    iterables : list(iterable)
+        The list of iterables (like the inputs and targets) of sequences, with time as the first dimension. The
+        n-th elements of the iterables are batched together, and each one is padded to its own longest sequence.
+    batch_size : int, optional
+        The number of sequences in a minibatch.
+    min_batch_size : int, optional
+        The minimum number of sequences in a minibatch.
+    bucket_width : int, optional
+        The range of sequence lengths (from the first iterable) that go in the same bucket.
+    mask_dtype : str, optional
+        The dtype of the mask. Defaults to theano.config.floatX.
+
+    Yields
+    ------
+    tuple(list(numpy.ndarray), numpy.ndarray)
+        The list of padded time-major minibatches with shape (timesteps, batch, data...), one for each iterable,
+        and the (timesteps, batch) mask with 1 for the steps of each sequence (from the first iterable)
+        and 0 for the padding.
+    """
+    assert 0 < min_batch_size <= batch_size, \
+        "batch_size (%d) has to be larger than min_batch_size (%d) and they both have to be greater than zero!" % \
+        (batch_size, min_batch_size)
+    assert bucket_width > 0, "Need a bucket_width greater than 0, found %d" % bucket_width
+    mask_dtype = mask_dtype or config.floatX
+    buckets = {}
+    for example in zip(*iterables):
+        bucket = buckets.setdefault(len(example[0]) // bucket_width, [])
+        bucket.append(example)
+        if len(bucket) == batch_size:
+            yield _pad_sequences(bucket, mask_dtype)
+            del bucket[:]
+
+    leftovers = [example for key in sorted(buckets) for example in buckets[key]]
+    for i in range(0, len(leftovers), batch_size):
+        examples = leftovers[i:i + batch_size]
+        if len(examples) >= min_batch_size:
+            yield _pad_sequences(examples, mask_dtype)
+
+def _pad_sequences(examples, mask_dtype):
+    """
+    Helper method to pad a list of examples (tuples of sequences) into time-major minibatches and a mask.
+    """
+    lengths = [len(example[0]) for example in examples]
+    mask = numpy.zeros((max(lengths), len(examples)), dtype=mask_dtype)
+    for j, length in enumerate(lengths):
+        mask[:length, j] = 1
+    batches = []
+    for sequences in zip(*examples):
+        sequences = [numpy.asarray(sequence) for sequence in sequences]
+        batch = numpy.zeros((max(sequence.shape[0] for sequence in sequences), len(sequences)) +
+                            sequences[0].shape[1:], dtype=sequences[0].dtype)
+        for j, sequence in enumerate(sequences):
+            batch[:sequence.shape[0], j] = sequence
+        batches.append(batch)
+    return batches, mask
+
+def stack_minibatches(batches, steps=1):
+    """
+    Stacks consecutive minibatches into blocks of up to `steps` minibatches, so a function that scans over
+    the first dimension can take several minibatches in one call. Only minibatches with the same shapes can be
+    stacked, so a block ends early when the shapes change (like for the smaller last minibatch or bucketed sequences).
+
+    Parameters
+    ----------
+    batches : iterable
+        The iterable of minibatches, each one a list of arrays (like the inputs followed by the targets).
+    steps : int, optional
+        The maximum number of minibatches in a block.
+
+    Yields
+    ------
+    list(numpy.ndarray)
+        The stacked blocks, one for each array in the minibatches, with shape (block steps, batch, data...).
+    """
+    assert steps > 0, "Need at least 1 step per block, found %d" % steps
+    block, shapes = [], None
+    for batch in batches:
+        batch = [numpy.asarray(data) for data in batch]
+        batch_shapes = [data.shape for data in batch]
+        if block and (batch_shapes != shapes or len(block) == steps):
+            yield _stack_block(block)
+            block = []
+        block.append(batch)
+        shapes = batch_shapes
+    if block:
+        yield _stack_block(block)
+
+def _stack_block(block):
+    """
+    Helper method to stack a list of minibatches (lists of arrays with the same shapes) along a new first dimension.
+    """
+    return [numpy.asarray(datas) for datas in zip(*block)]
+
+def sequence_array(sequences):
+    """
+    Creates a 1D numpy object array holding variable-length sequences, so they can be used as a single
+    array-like input (like for :func:`bucket_minibatch`) instead of being concatenated.
+
+    Parameters
+    ----------
+    sequences : list
+        The list of sequences (numpy arrays with time as the first dimension).
+
+    Returns
+    -------
+    numpy.ndarray
+        The object array of sequences.
+    """
+    array = numpy.empty((len(sequences),), dtype=object)
+    for i, sequence in enumerate(sequences):
+        array[i] = sequence
+    return array
+
+class BatchBuffers(object):
+    """
+    A ring of preallocated numpy arrays for filling minibatches in place. The element shape and dtype are inferred
+    from the first element filled, and each call to `fill` uses the next buffer in the ring - so with two or more
+    buffers, the consumer can keep the previous batch while the next one is filled.
+
+    Parameters
+    ----------
+    batch_size : int
+        The maximum number of elements in a batch.
+    n_buffers : int, optional
+        The number of buffers to cycle through.
+    """
+    def __init__(self, batch_size, n_buffers=2):
+        assert n_buffers > 0, "Need at least 1 buffer, found %d" % n_buffers
+        self.batch_size = batch_size
+        self.n_buffers = n_buffers
+        self.buffers = None
+        self.index = 0
+
+    def fill(self, iterator):
+        """
+        Fills the next buffer with up to `batch_size` elements from the iterator.
+
+        Parameters
+        ----------
+        iterator : iterator
+            The iterator to pull elements from.
+
+        Returns
+        -------
+        numpy.ndarray
+            A view of the filled part of the buffer (with length 0 if the iterator was empty).
+        """
+        count = 0
+        buffer = None
+        for elem in itertools.islice(iterator, self.batch_size):
+            if buffer is None:
+                if self.buffers is None:
+                    elem = numpy.asarray(elem)
+                    self.buffers = [numpy.empty((self.batch_size,) + elem.shape, dtype=elem.dtype)
+                                    for _ in range(self.n_buffers)]
+                buffer = self.buffers[self.index]
+            buffer[count] = elem
+            count += 1
+        if buffer is None:
+            return numpy.empty((0,))
+        self.index = (self.index + 1) % self.n_buffers
+        return buffer[:count]
+
+def shuffle_indices(n, block_size=None, rng=numpy.random):
+    """
+    Creates a random permutation of the indices [0, n) to gather shuffled minibatches from.
+
+    Parameters
+    ----------
+    n : int
+        The number of indices (examples) to shuffle.
+    block_size : int, optional
+        If given, the indices are kept in contiguous blocks of this size and only the order of the blocks is
+        shuffled. This keeps reads sequential within each block (useful for numpy.memmap or HDF5 data on disk).
+    rng : numpy.random.RandomState, optional
+        The random number generator to use. Defaults to the global numpy.random.
+
+    Returns
+    -------
+    numpy.ndarray
+        The shuffled int64 indices.
+    """
+    if not block_size or block_size <= 1:
+        return rng.permutation(n).astype('int64')
+    starts = numpy.arange(0, n, block_size)
+    rng.shuffle(starts)
+    return numpy.concatenate(
+        [numpy.arange(start, min(start + block_size, n), dtype='int64') for start in starts]
+    ) if n > 0 else numpy.zeros((0,), dtype='int64')
+
+def _as_slice(indices):
+    """
+    Helper method to turn a contiguous, increasing range of indices into a slice (so the data can be viewed
+    instead of copied with fancy indexing).
+    """
+    if indices.shape[0] > 0 and indices[-1] - indices[0] == indices.shape[0] - 1 and \
+            numpy.all(numpy.diff(indices) == 1):
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return indices
+
+def is_array_like(input):
+    """
+    Determines if the input is an array-like object that can be sliced along its first dimension
+    (it has a `shape` and `__getitem__`), like a numpy array, numpy.memmap, or :class:`opendeep.data.HDF5Array`.
+
+    Parameters
+    ----------
+    input : object
+        The object to check.
+
+    Returns
+    -------
+    bool
+        Whether the input is array-like.
+    """
+    return hasattr(input, 'shape') and hasattr(input, '__getitem__')
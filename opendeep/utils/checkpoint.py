@@ -0,0 +1,155 @@
+"""
+This module provides atomic and background writing of checkpoint files (like saved model parameters).
+
+Files are written to a temporary file next to the destination and then renamed over it, so a crash in the middle
+of a write never leaves a corrupt checkpoint behind.
+"""
+# standard libraries
+import logging
+import os
+import sys
+import threading
+# third party
+import six
+from six.moves import queue
+# internal
+from opendeep.utils.file_ops import atomic_file
+
+log = logging.getLogger(__name__)
+
+# marker for the background writer to stop
+_STOP = object()
+
+
+def atomic_write(path, write_fn):
+    """
+    Writes a file by calling `write_fn` on a temporary path in the same directory, and then renaming the
+    temporary file to `path`. If the write fails, the temporary file is removed and `path` is left untouched.
+
+    Parameters
+    ----------
+    path : str
+        The destination filename.
+    write_fn : function
+        The function that takes a filename and writes the file contents to it.
+    """
+    with atomic_file(path) as tmp_path:
+        write_fn(tmp_path)
+
+class CheckpointWriter(object):
+    """
+    Writes checkpoint files atomically (see :func:`atomic_write`), optionally in a background thread so the
+    caller can continue (like training) while the file is serialized, and deletes old checkpoints by a retention
+    policy.
+
+    The caller should snapshot the values to write (like with `get_param_values(borrow=False)`) before passing the
+    write function, since they are serialized later. At most one write waits behind the one in progress - further
+    writes block until there is room.
+
+    A failed write is logged and doesn't stop the caller (or later writes) - the first failure is re-raised from
+    `wait()`.
+
+    Parameters
+    ----------
+    background : bool, optional
+        Whether to write the files in a background thread instead of in the calling thread.
+    keep_last : int, optional
+        If given, only the last `keep_last` checkpoints written are kept - older ones are deleted.
+    keep_best : bool, optional
+        Whether to never delete the checkpoint written with the lowest cost.
+    """
+    def __init__(self, background=True, keep_last=None, keep_best=False):
+        assert keep_last is None or keep_last > 0, "keep_last needs to be greater than 0, found %s" % str(keep_last)
+        self.background = background
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.paths = []
+        self.best_path = None
+        self.best_cost = None
+        self._queue = None
+        self._thread = None
+        self._error = None
+
+    def write(self, path, write_fn, cost=None):
+        """
+        Writes a checkpoint file (in the background if the writer is).
+
+        Parameters
+        ----------
+        path : str
+            The checkpoint filename.
+        write_fn : function
+            The function that takes a filename and writes the checkpoint to it.
+        cost : float, optional
+            The cost of the checkpoint, for keeping the best one.
+
+        Returns
+        -------
+        bool
+            Whether the checkpoint was written (or queued to be written in the background).
+        """
+        if not self.background:
+            return self._write(path, write_fn, cost)
+        if self._thread is None:
+            self._queue = queue.Queue(maxsize=1)
+            self._thread = threading.Thread(target=self._worker, name="CheckpointWriter")
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put((path, write_fn, cost))
+        return True
+
+    def wait(self):
+        """
+        Waits for the pending checkpoints to be written, and stops the background thread. The first exception
+        raised while writing (since the last `wait()`) is re-raised here.
+        """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+        self._raise_error()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            self._write(*item)
+
+    def _write(self, path, write_fn, cost):
+        """
+        Helper method to write the checkpoint atomically and apply the retention policy. Returns whether the
+        checkpoint was written.
+        """
+        try:
+            atomic_write(path, write_fn)
+        except Exception:
+            log.exception("Could not write the checkpoint %s", str(path))
+            if self._error is None:
+                self._error = sys.exc_info()
+            return False
+        log.debug("Wrote checkpoint %s", str(path))
+        if path in self.paths:
+            self.paths.remove(path)
+        self.paths.append(path)
+        if cost is not None and (self.best_cost is None or cost < self.best_cost):
+            self.best_cost = cost
+            self.best_path = path
+        if self.keep_last:
+            old_paths, self.paths = self.paths[:-self.keep_last], self.paths[-self.keep_last:]
+            for old_path in old_paths:
+                if self.keep_best and old_path == self.best_path:
+                    self.paths.insert(0, old_path)
+                    continue
+                try:
+                    os.remove(old_path)
+                    log.debug("Removed old checkpoint %s", str(old_path))
+                except OSError:
+                    log.warning("Could not remove old checkpoint %s", str(old_path))
+        return True
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            six.reraise(*error)
@@ -3,6 +3,7 @@ This module provides functions for constructing Theano and Opendeep variables.
 """
 # standard imports
 import logging
+from collections import OrderedDict
 # third-party libraries
 import numpy
 import theano
@@ -115,6 +116,80 @@ def dataset_shared(dataset, name=None, borrow=False, dtype=theano.config.floatX)
     #     return theano.tensor._shared(value=dataset, name=name, borrow=borrow)
     return theano.tensor._shared(value=dataset, name=name, borrow=borrow)
 
+def device_shared(value, name=None, borrow=False, dtype=None):
+    """
+    Transform `value` into a Theano shared variable that can live on the device (like float32 data on the GPU),
+    so minibatches can be sliced from it there instead of being copied over from the host every call. Unlike
+    `sharedX`, the value keeps its own dtype unless a `dtype` is given (useful for integer labels or compact
+    storage types).
+
+    Parameters
+    ----------
+    value : number, array, vector, matrix, or tensor
+        The input value to create into a Theano shared variable.
+    name : string, optional
+        The name for this shared variable.
+    borrow : bool, optional
+        The boolean `borrow` value to use in the Theano `shared` function.
+    dtype : string, optional
+        The `dtype` to convert the value to. If None, keeps the value's dtype.
+
+    Returns
+    -------
+    SharedVariable
+        The Theano shared variable of the input `value`.
+    """
+    value = numpy.asarray(value)
+    if dtype is not None and value.dtype != dtype:
+        value = theano._asarray(value, dtype=dtype)
+    return theano.shared(value=value, name=name, borrow=borrow)
+
+def compact_inputs(variables, dtype, scale=None, offset=None):
+    """
+    Creates input variables of a compact storage `dtype` (like uint8 images) for the given input variables, and the
+    `givens` that decode them inside the graph as ``cast(compact) * scale + offset``. Compiling a function with the
+    compact inputs and the givens lets it take the stored data directly, so only the compact data is copied for each
+    call and the conversion to the variables' dtype (like floatX) happens in the graph.
+
+    Parameters
+    ----------
+    variables : list(TensorVariable)
+        The input variables to make compact versions of.
+    dtype : str or list(str)
+        The storage dtype, or a list with the storage dtype for each variable (None to keep the variable as is).
+    scale : float or list(float), optional
+        The factor to multiply the cast inputs by (or a list with one for each variable).
+    offset : float or list(float), optional
+        The amount to add to the scaled inputs (or a list with one for each variable).
+
+    Returns
+    -------
+    tuple(list(TensorVariable), OrderedDict)
+        The list of input variables to compile with (the compact ones in place of the originals), and the
+        givens mapping each original variable to its decoded compact variable.
+    """
+    n = len(variables)
+    dtypes = dtype if isinstance(dtype, (list, tuple)) else [dtype] * n
+    scales = scale if isinstance(scale, (list, tuple)) else [scale] * n
+    offsets = offset if isinstance(offset, (list, tuple)) else [offset] * n
+    assert len(dtypes) == len(scales) == len(offsets) == n, \
+        "Need a storage dtype, scale, and offset for each of the %d inputs." % n
+    inputs = []
+    givens = OrderedDict()
+    for variable, dtype, scale, offset in zip(variables, dtypes, scales, offsets):
+        if dtype is None or (dtype == variable.dtype and scale is None and offset is None):
+            inputs.append(variable)
+            continue
+        compact = T.TensorType(dtype, variable.broadcastable)(name="%s_%s" % (variable.name or 'input', dtype))
+        decoded = T.cast(compact, variable.dtype)
+        if scale is not None:
+            decoded = decoded * numpy.asarray(scale, dtype=variable.dtype)
+        if offset is not None:
+            decoded = decoded + numpy.asarray(offset, dtype=variable.dtype)
+        inputs.append(compact)
+        givens[variable] = decoded
+    return inputs, givens
+
 def as_floatX(variable):
     """
     Casts a given variable into dtype `theano.config.floatX`. Numpy ndarrays will
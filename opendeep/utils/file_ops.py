@@ -25,7 +25,10 @@ UNKNOWN : int
 # standard imports
 import os
 import errno
+import hashlib
+import itertools
 from collections import Iterable
+from contextlib import contextmanager
 try:
     # For Python 3.0 and later
     from urllib.request import urlopen, urlretrieve
@@ -38,6 +41,7 @@ import logging
 import re
 import gzip
 # third party
+import numpy
 from six import string_types
 # internal
 from opendeep.utils.misc import raise_to_list
@@ -67,6 +71,8 @@ _types = {
     TXT: "TXT",
     UNKNOWN: "UNKNOWN"
 }
+# counter to keep temporary filenames unique within a process
+_tmp_ids = itertools.count()
 
 def get_filetype_string(filetype):
     """
@@ -158,6 +164,77 @@ def find_files(path, path_filter=None):
                 raise
 
 
+def file_cache_key(fnames, *args):
+    """
+    Creates a hash key for a list of files (with their sizes and modification times) and any other options, so
+    a cache built from the files is invalidated when one of them changes.
+
+    Parameters
+    ----------
+    fnames : list(str)
+        The files the cache is built from.
+    args
+        Any other (repr-able) options that change the cached contents.
+
+    Returns
+    -------
+    str
+        The hex digest key.
+    """
+    key = [repr(args)]
+    for fname in fnames:
+        stat = os.stat(fname)
+        key.append(repr((fname, stat.st_size, stat.st_mtime)))
+    return hashlib.sha1("\n".join(key).encode('utf-8')).hexdigest()
+
+@contextmanager
+def atomic_file(path):
+    """
+    Context manager that gives a unique temporary filename next to `path` (with the same extension) to write to,
+    and then renames the temporary file to `path` when the block finishes. If the block raises (or a generator
+    using it is closed early), the temporary file is removed and `path` is left untouched - so other processes
+    never see a partially written file.
+
+    Parameters
+    ----------
+    path : str
+        The destination filename.
+
+    Yields
+    ------
+    str
+        The temporary filename to write to.
+    """
+    root, ext = os.path.splitext(path)
+    tmp_path = "%s.tmp%d_%d%s" % (root, os.getpid(), next(_tmp_ids), ext)
+    try:
+        yield tmp_path
+        if hasattr(os, 'replace'):
+            os.replace(tmp_path, path)
+        else:
+            # os.rename can't replace an existing file on Windows
+            if os.name == 'nt' and os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def atomic_save_npy(filename, array):
+    """
+    Saves the array to a .npy file atomically (see :func:`atomic_file`).
+
+    Parameters
+    ----------
+    filename : str
+        The .npy filename to save to.
+    array : array_like
+        The array to save.
+    """
+    with atomic_file(filename) as tmp_path:
+        numpy.save(tmp_path, array)
+
 def init_empty_file(filename):
     """
     This function will create an empty file (containing an empty string) with the given filename. This is similar to
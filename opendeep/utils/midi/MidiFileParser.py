@@ -3,13 +3,30 @@
 from __future__ import absolute_import
 
 # std library
-from struct import unpack
+from struct import unpack, Struct
+
+# third party
+import numpy
 
 # uhh I don't really like this, but there are so many constants to 
 # import otherwise
 from .constants import *
 
 from .EventDispatcher import EventDispatcher
+from .RawInstreamFile import readVarFrom
+
+_LONG = Struct('>L')
+
+# number of data bytes for each channel message
+_CHANNEL_DATA_SIZES = {
+    PATCH_CHANGE:1,
+    CHANNEL_PRESSURE:1,
+    NOTE_OFF:2,
+    NOTE_ON:2,
+    AFTERTOUCH:2,
+    CONTINUOUS_CONTROLLER:2,
+    PITCH_BEND:2,
+}
 
 class MidiFileParser:
 
@@ -46,7 +63,7 @@ class MidiFileParser:
         header_chunk_zise = raw_in.readBew(4)
 
         # check if it is a proper midi file
-        if header_chunk_type != 'MThd':
+        if header_chunk_type != b'MThd':
             raise TypeError("It is not a valid midi file!")
 
         # Header values are at fixed locations, so no reason to be clever
@@ -173,6 +190,92 @@ class MidiFileParser:
 
 
 
+    def parseNotes(self):
+
+        """
+        Parses all track chunks straight from the raw bytes without
+        dispatching any events, and only keeps the notes and tempo
+        changes. Each note off (or note on with velocity 0) ends the
+        latest note with the same pitch if it is still playing - like
+        the midiread event handler.
+
+        Returns a tuple of int64 numpy arrays:
+        notes: (n_notes, 5) of note, start tick, end tick, start track,
+            end track. The end tick and track are -1 for notes that
+            never end.
+        tempos: (n_tempos, 3) of tick, tempo (microseconds per quarter
+            note), track - in the order they appear in the file.
+        """
+
+        buffer = self.raw_in.buffer
+        cursor = self.raw_in.getCursor()
+        running_status = self._running_status
+        pitches, starts, ends, start_tracks, end_tracks = [], [], [], [], []
+        tempos = []
+        # the index of the latest note for each pitch
+        latest = [-1] * 128
+
+        for track in range(self.nTracks):
+            # skip the track header
+            track_length = _LONG.unpack_from(buffer, cursor + 4)[0]
+            cursor += 8
+            track_endposition = cursor + track_length
+            tick = 0
+
+            while cursor < track_endposition:
+                time, cursor = readVarFrom(buffer, cursor)
+                tick += time
+
+                # be aware of running status!!!!
+                status = buffer[cursor]
+                if status & 0x80:
+                    running_status = status
+                    cursor += 1
+                else:
+                    status = running_status
+                hi_nible = status & 0xF0
+
+                if hi_nible == NOTE_ON or hi_nible == NOTE_OFF:
+                    note, velocity = buffer[cursor], buffer[cursor + 1]
+                    cursor += 2
+                    if hi_nible == NOTE_ON and velocity:
+                        latest[note] = len(pitches)
+                        pitches.append(note)
+                        starts.append(tick)
+                        ends.append(-1)
+                        start_tracks.append(track)
+                        end_tracks.append(-1)
+                    else:
+                        i = latest[note]
+                        if i >= 0 and ends[i] < 0:
+                            ends[i] = tick
+                            end_tracks[i] = track
+
+                elif status == META_EVENT:
+                    meta_type = buffer[cursor]
+                    meta_length, cursor = readVarFrom(buffer, cursor + 1)
+                    if meta_type == TEMPO:
+                        b1, b2, b3 = buffer[cursor:cursor + meta_length]
+                        tempos.append((tick, (b1<<16) + (b2<<8) + b3, track))
+                    cursor += meta_length
+
+                elif status == SYSTEM_EXCLUSIVE:
+                    sysex_length, cursor = readVarFrom(buffer, cursor)
+                    cursor += sysex_length - 1
+                    if cursor < len(buffer) and buffer[cursor] == END_OFF_EXCLUSIVE:
+                        cursor += 1
+
+                # system common events don't read any data
+                elif hi_nible != 0xF0:
+                    cursor += _CHANNEL_DATA_SIZES.get(hi_nible, 0)
+
+        self._running_status = running_status
+        self.raw_in.setCursor(cursor)
+        notes = numpy.asarray([pitches, starts, ends, start_tracks, end_tracks], dtype='int64').T
+        return notes, numpy.asarray(tempos, dtype='int64').reshape((-1, 3))
+
+
+
 if __name__ == '__main__':
 
     # get data
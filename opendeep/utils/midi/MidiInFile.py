@@ -48,6 +48,20 @@ class MidiInFile:
         p.parseMTrkChunks()
 
 
+    def readNotes(self):
+        """
+        Parses the file's notes and tempo changes into numpy arrays
+        without triggering events on the outStream (except the header).
+        Returns the (notes, tempos) arrays from
+        MidiFileParser.parseNotes and the division (ticks per quarter
+        note).
+        """
+        p = self.parser
+        p.parseMThdChunk()
+        notes, tempos = p.parseNotes()
+        return notes, tempos, p.division
+
+
     def setData(self, data=''):
         "Sets the data from a plain string"
         self.raw_in.setData(data)
@@ -2,11 +2,11 @@
 
 # standard library imports
 from __future__ import absolute_import
+from struct import Struct
 from six import string_types
 
-# custom import
-from .DataTypeConverters import readBew, readVar, varLen
-
+# big endian word readers for each number of bytes
+_BEW = {1: Struct('>B'), 2: Struct('>H'), 4: Struct('>L')}
 
 class RawInstreamFile:
     """
@@ -33,16 +33,19 @@ class RawInstreamFile:
                 # don't close the f
                 self.data = infile.read()
         else:
-            self.data = ''
+            self.data = b''
+        # the data as integer bytes (the same in python 2 and 3) for reading values without slicing
+        self.buffer = bytearray(self.data)
         # start at beginning ;-)
         self.cursor = 0
 
 
     # setting up data manually
     
-    def setData(self, data=''):
+    def setData(self, data=b''):
         "Sets the data from a string."
         self.data = data
+        self.buffer = bytearray(data)
     
     # cursor operations
 
@@ -76,7 +79,10 @@ class RawInstreamFile:
         Reads n bytes of date from the current cursor position.
         Moves cursor if move_cursor is true
         """
-        return readBew(self.nextSlice(n_bytes, move_cursor))
+        value = _BEW[n_bytes].unpack_from(self.buffer, self.cursor)[0]
+        if move_cursor:
+            self.cursor += n_bytes
+        return value
 
 
     def readVarLen(self):
@@ -84,14 +90,26 @@ class RawInstreamFile:
         Reads a variable length value from the current cursor position.
         Moves cursor if move_cursor is true
         """
-        MAX_VARLEN = 4 # Max value varlen can be
-        var = readVar(self.nextSlice(MAX_VARLEN, 0))
-        # only move cursor the actual bytes in varlen
-        self.moveCursor(varLen(var))
+        var, self.cursor = readVarFrom(self.buffer, self.cursor)
         return var
 
 
 
+def readVarFrom(buffer, cursor):
+    """
+    Reads a variable length value (at most 4 bytes) from a bytearray at the
+    cursor position. Returns the value and the position after it.
+    """
+    var = 0
+    for cursor in range(cursor, cursor + 4):
+        byte = buffer[cursor]
+        var = (var << 7) + (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return var, cursor + 1
+
+
+
 if __name__ == '__main__':
     test_file = 'test/midifiles/minimal.mid'
     fis = RawInstreamFile(test_file)
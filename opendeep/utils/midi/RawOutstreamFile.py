@@ -4,10 +4,7 @@
 from __future__ import absolute_import
 import sys
 from six import string_types
-try:
-    from StringIO import StringIO
-except ImportError:
-    from io import StringIO
+from io import BytesIO
 
 # custom import
 from .DataTypeConverters import writeBew, writeVar, fromBytes
@@ -21,7 +18,7 @@ class RawOutstreamFile:
     """
 
     def __init__(self, outfile=''):
-        self.buffer = StringIO()
+        self.buffer = BytesIO()
         self.outfile = outfile
 
 
@@ -30,6 +27,8 @@ class RawOutstreamFile:
 
     def writeSlice(self, str_slice):
         "Writes the next text slice to the raw data"
+        if not isinstance(str_slice, bytes):
+            str_slice = str_slice.encode('latin-1')
         self.buffer.write(str_slice)
         
         
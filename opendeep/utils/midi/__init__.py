@@ -14,44 +14,24 @@ from .MidiOutStream import MidiOutStream
 
 import numpy
 
+# tempo before any tempo change (microseconds per quarter note)
+DEFAULT_TEMPO = 500000
+# ticks per track when ordering events by (track, tick)
+_TRACK_TICKS = 1 << 40
+
 
 class midiread(MidiOutStream):
   def __init__(self, filename, r=(21, 109), dt=0.2):
-    self.notes = []
-    self._tempo = 500000
-    self.beat = 0
-    self.time = 0.0
-
-    midi_in = MidiInFile(self, filename)
-    midi_in.read()
-    self.notes = [n for n in self.notes if n[2] is not None]  # purge incomplete notes
-
-    length = int(numpy.ceil(max(zip(*self.notes)[2]) / dt))  # create piano-roll
-    self.piano_roll = numpy.zeros((length, r[1]-r[0]))
-    for n in self.notes:
-      self.piano_roll[int(numpy.ceil(n[1]/dt)) : int(numpy.ceil(n[2]/dt)), n[0]-r[0]] = 1
+    # (note, start seconds, end seconds) for each complete note
+    self.notes = read_notes(self, filename)
 
-  def abs_time_in_seconds(self):
-    return self.time + self._tempo * (self.abs_time() - self.beat) * 1e-6 / self.div
-
-  def tempo(self, value):
-    self.time = self.abs_time_in_seconds()
-    self.beat = self.abs_time()
-    self._tempo = value
+    # create piano-roll
+    pitches, starts, ends, length = note_steps(self.notes, r, dt)
+    self.piano_roll = piano_roll(pitches, starts, ends, length, r[1]-r[0])
 
   def header(self, format=0, nTracks=1, division=96):
     self.div = division
 
-  def note_on(self, channel=0, note=0x40, velocity=0x40):
-    self.notes.append([note, self.abs_time_in_seconds(), None])
-
-  def note_off(self, channel=0, note=0x40, velocity=0x40):
-    i = len(self.notes) - 1
-    while i >= 0 and self.notes[i][0] != note:
-      i -= 1
-    if i >= 0 and self.notes[i][2] is None:
-      self.notes[i][2] = self.abs_time_in_seconds()
-
   def sysex_event(*args):
     pass
 
@@ -59,31 +39,104 @@ class midiread(MidiOutStream):
     pass
 
 
+def read_notes(outstream, filename):
+  """
+  Parses the notes of a midi file (without triggering the note events on
+  the outstream) into a (n_notes, 3) float64 array of (note, start seconds,
+  end seconds). Notes that never end are purged.
+  """
+  notes, tempos, division = MidiInFile(outstream, filename).readNotes()
+  notes = notes[notes[:, 2] >= 0]
+  starts = tick_seconds(notes[:, 1], notes[:, 3], tempos, division)
+  ends = tick_seconds(notes[:, 2], notes[:, 4], tempos, division)
+  return numpy.stack([notes[:, 0].astype('float64'), starts, ends], axis=1)
+
+
+def tick_seconds(ticks, tracks, tempos, division):
+  """
+  Converts the absolute ticks of events in their tracks to seconds with the
+  tempo changes (tick, tempo, track) in the order they were parsed. The
+  tracks are parsed one after another, so each event uses the time and tempo
+  of the latest tempo change parsed before it - even from an earlier track.
+  """
+  # the time in seconds and tick of each tempo change
+  times = numpy.zeros((tempos.shape[0] + 1,), dtype='float64')
+  beats = numpy.zeros((tempos.shape[0] + 1,), dtype='int64')
+  rates = numpy.full((tempos.shape[0] + 1,), DEFAULT_TEMPO, dtype='int64')
+  for i, (tick, tempo, _) in enumerate(tempos):
+    times[i+1] = times[i] + rates[i] * (tick - beats[i]) * 1e-6 / division
+    beats[i+1] = tick
+    rates[i+1] = tempo
+
+  # find the latest tempo change before each event by ordering them by (track, tick)
+  change = numpy.searchsorted(tempos[:, 2] * _TRACK_TICKS + tempos[:, 0],
+                              tracks * _TRACK_TICKS + ticks, side='right')
+  return times[change] + rates[change] * (ticks - beats[change]) * 1e-6 / division
+
+
+def note_steps(notes, r=(21, 109), dt=0.2):
+  """
+  Converts (note, start seconds, end seconds) notes to the pitch index in the
+  range r and start/end timesteps of length dt. Returns the int arrays of
+  pitches, starts, and ends of the notes inside the range, and the number of
+  timesteps in the piece.
+  """
+  notes = numpy.asarray(notes, dtype='float64').reshape((-1, 3))
+  length = int(numpy.ceil(notes[:, 2].max() / dt)) if len(notes) else 0
+  pitches = notes[:, 0].astype('int64') - r[0]
+  # notes before the start of the piece are cut off at timestep 0
+  starts = numpy.maximum(numpy.ceil(notes[:, 1] / dt).astype('int64'), 0)
+  ends = numpy.ceil(notes[:, 2] / dt).astype('int64')
+  keep = (pitches >= 0) & (pitches < r[1]-r[0]) & (starts < ends)
+  return pitches[keep], starts[keep], ends[keep], length
+
+
+def piano_roll(pitches, starts, ends, length, n_pitches, dtype='float64'):
+  """
+  Rasterizes notes into a (length, n_pitches) piano-roll with 1 for each
+  pitch from its start timestep up to (not including) its end timestep.
+  """
+  # count the notes starting minus the notes ending at each timestep, so the
+  # running sum is the number of notes playing.
+  changes = numpy.zeros((length + 1, n_pitches), dtype='int32')
+  numpy.add.at(changes, (starts, pitches), 1)
+  numpy.add.at(changes, (ends, pitches), -1)
+  return (numpy.cumsum(changes[:-1], axis=0) > 0).astype(dtype)
+
+
+def roll_events(piano_roll):
+  """
+  Finds the note events of a piano-roll from numpy.diff over its frames.
+  Returns the int arrays of frames, pitch indices, and whether they are note
+  ons, ordered by frame with the note offs (of notes ending before that
+  frame) before the note ons.
+  """
+  roll = numpy.asarray(piano_roll) != 0
+  padded = numpy.zeros((roll.shape[0] + 2, roll.shape[1]), dtype='int8')
+  padded[1:-1] = roll
+  changes = numpy.diff(padded, axis=0)
+  frames, pitches = numpy.nonzero(changes)
+  ons = changes[frames, pitches] > 0
+  order = numpy.lexsort((pitches, ons, frames))
+  return frames[order], pitches[order], ons[order]
+
+
 def midiwrite(filename, piano_roll, r=(21, 109), dt=0.2, patch=0):
   midi = MidiOutFile(filename)
   midi.header(division=100)
   midi.start_of_track()
   midi.patch_change(channel=0, patch=patch)
-  t = 0
-  samples = [i.nonzero()[0] + r[0] for i in piano_roll]
-
-  for i in iter(range(len(samples))):
-    for f in samples[i]:
-      if i==0 or f not in samples[i-1]:
-        midi.update_time(t)
-        midi.note_on(channel=0, note=f, velocity=90)
-        t = 0
+  frames, pitches, ons = roll_events(piano_roll)
+  times = frames * int(dt*200)
+  deltas = numpy.diff(numpy.concatenate([[0], times]))
 
-    t += int(dt*200)
-
-    for f in samples[i]:
-      if i==len(samples)-1 or f not in samples[i+1]:
-        midi.update_time(t)
-        midi.note_off(channel=0, note=f, velocity=0)
-        t = 0
+  for delta, f, on in zip(deltas.tolist(), (pitches + r[0]).tolist(), ons.tolist()):
+    midi.update_time(delta)
+    if on:
+      midi.note_on(channel=0, note=f, velocity=90)
+    else:
+      midi.note_off(channel=0, note=f, velocity=0)
 
   midi.update_time(0)
   midi.end_of_track()
   midi.eof()
-
-
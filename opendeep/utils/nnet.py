@@ -7,10 +7,79 @@ Based on code from theano_alexnet
 # standard libraries
 import logging
 # third party libraries
-from theano.tensor import (concatenate, cast, sqr, alloc, set_subtensor)
+from theano.tensor import (concatenate, cast, sqr, alloc, set_subtensor, dot, take, switch)
 
 log = logging.getLogger(__name__)
 
+def is_index_input(input):
+    """
+    Determines if the input variable can hold indices (like token ids) - if it has an integer dtype. Index inputs
+    stand for one-hot vectors over their last dimension, so they have one less dimension than the one-hot input
+    they represent. Integer data isn't always indices (like uint8 pixels), so models only treat their inputs as
+    indices when asked to.
+
+    Parameters
+    ----------
+    input : tensor
+        The input variable.
+
+    Returns
+    -------
+    bool
+        Whether the input has an integer dtype.
+    """
+    return input.dtype.startswith('int') or input.dtype.startswith('uint')
+
+def input_dot(input, W, index_input=False):
+    """
+    Computes the dot product of the input with the weights matrix `W`. If `index_input`, the input holds integer
+    indices (see :func:`is_index_input`) that are treated as one-hot vectors and the rows of `W` are looked up
+    instead (an embedding lookup), which gives the same result without building or multiplying the one-hot matrix.
+    This is how the layers with an `index_input` option take token ids (like from :class:`opendeep.data.TextDataset`
+    with output='index') - it is opt-in, since integer inputs are otherwise multiplied like any other data. The
+    layers' input `shape` then describes the one-hot input, with the vocab size as the last dimension.
+
+    Parameters
+    ----------
+    input : tensor
+        The real-valued input with the last dimension matching the rows of `W`, or integer indices into the rows
+        of `W`.
+    W : shared variable
+        The weights matrix.
+    index_input : bool, optional
+        Whether the input holds indices into the rows of `W`.
+
+    Returns
+    -------
+    tensor
+        The result of dot(input, W) (with shape input.shape + W.shape[1:] for index inputs).
+    """
+    if index_input:
+        return take(W, input, axis=0)
+    return dot(input, W)
+
+def mask_step(mask_t, new, old):
+    """
+    Masks one timestep of a recurrent computation over padded sequences: keeps the `new` values for the sequences
+    in the batch that have this step (mask 1), and the `old` values for the ones that are padding (mask 0). Padded
+    steps don't change the state, so no gradient flows through them.
+
+    Parameters
+    ----------
+    mask_t : tensor
+        The (batch_size,) mask for the current timestep.
+    new : tensor
+        The (batch_size, n) values computed for the current timestep.
+    old : tensor
+        The (batch_size, n) values from the previous timestep.
+
+    Returns
+    -------
+    tensor
+        The masked (batch_size, n) values for the current timestep.
+    """
+    return switch(mask_t.dimshuffle(0, 'x'), new, old)
+
 def mirror_images(input, image_shape, cropsize, rand, flag_rand):
     """
     This takes an input batch of images (normally the input to a convolutional net),
@@ -77,6 +77,67 @@ class TestBatch(unittest.TestCase):
         except Exception as e:
             assert isinstance(e, AssertionError)
 
+    def testIterBuffers(self):
+        gen = (row for row in self.words)
+        batches = iterable_minibatch(gen, batch_size=4, buffers=2)
+        first = next(batches)
+        first_copy = numpy.array(first)
+        second = next(batches)
+        assert numpy.array_equal(first, first_copy), "The previous batch was overwritten."
+        assert numpy.array_equal(numpy.concatenate([first, second]), self.words)
+        assert first.dtype == self.words.dtype
+
+    def testShuffleIndices(self):
+        indices = shuffle_indices(10)
+        assert sorted(indices.tolist()) == list(range(10))
+
+        indices = shuffle_indices(10, block_size=4)
+        assert sorted(indices.tolist()) == list(range(10))
+        # each block should stay contiguous
+        blocks = numpy.split(indices, numpy.nonzero(numpy.diff(indices) != 1)[0] + 1)
+        assert all(block[0] % 4 == 0 for block in blocks), "Blocks weren't contiguous: %s" % str(indices)
+
+    def testNumpyIndices(self):
+        labels = numpy.arange(10)
+        indices = shuffle_indices(10)
+        batches = zip(numpy_minibatch(self.np, batch_size=3, indices=indices),
+                      numpy_minibatch(labels, batch_size=3, indices=indices))
+        i = 0
+        for x, y in batches:
+            # inputs and labels should stay aligned
+            assert numpy.array_equal(numpy.argmax(x, axis=1), y)
+            i += 1
+        assert i == 4
+
+    def testBucketMinibatch(self):
+        lengths = [5, 2, 6, 3, 1, 5]
+        inputs = sequence_array([numpy.ones((length, 3)) * length for length in lengths])
+        targets = sequence_array([numpy.arange(length) for length in lengths])
+        assert inputs.shape == (6,)
+
+        batches = list(bucket_minibatch([inputs, targets], batch_size=2, bucket_width=2))
+        # buckets are yielded as soon as they are full, then the leftovers go in order of length
+        found = [sorted(mask.sum(axis=0).astype('int64').tolist()) for _, mask in batches]
+        assert found == [[2, 3], [5, 5], [1, 6]], "Found bucketed lengths %s" % str(found)
+        for (x, y), mask in batches:
+            assert x.shape == (mask.shape[0], 2, 3) and y.shape == mask.shape
+            # the padding is zero and every real step has the sequence's values
+            assert numpy.array_equal(x[:, :, 0], mask * mask.sum(axis=0))
+            assert numpy.array_equal(y, mask * numpy.arange(mask.shape[0])[:, None])
+
+        batches = list(bucket_minibatch([inputs], batch_size=4, min_batch_size=3))
+        assert len(batches) == 1, "Expected 1 batch above the min_batch_size, found %d" % len(batches)
+
+    def testStackMinibatches(self):
+        labels = numpy.arange(10)
+        batches = zip(numpy_minibatch(self.np, batch_size=3), numpy_minibatch(labels, batch_size=3))
+        blocks = list(stack_minibatches(batches, steps=2))
+        # the full minibatches are stacked two at a time and the smaller last one gets its own block
+        found = [(x.shape, y.shape) for x, y in blocks]
+        assert found == [((2, 3, 10), (2, 3)), ((1, 3, 10), (1, 3)), ((1, 1, 10), (1, 1))], \
+            "Found block shapes %s" % str(found)
+        assert numpy.array_equal(numpy.concatenate([y.reshape(-1) for _, y in blocks]), labels)
+
     def tearDown(self):
         del self.np, self.words
 
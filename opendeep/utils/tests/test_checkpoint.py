@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+from opendeep.utils.checkpoint import atomic_write, CheckpointWriter
+
+
+def _write_text(text):
+    def write_fn(path):
+        with open(path, 'w') as f:
+            f.write(text)
+    return write_fn
+
+def _fail(path):
+    with open(path, 'w') as f:
+        f.write("partial")
+    raise IOError("Failed in the middle of writing.")
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def testAtomicWrite(self):
+        path = os.path.join(self.dir, 'params.pkl')
+        atomic_write(path, _write_text("first"))
+        try:
+            atomic_write(path, _fail)
+            raise AssertionError("The failed write didn't raise.")
+        except IOError:
+            pass
+        # the failed write should leave the old file untouched and no temporary files behind
+        with open(path) as f:
+            assert f.read() == "first"
+        assert os.listdir(self.dir) == ['params.pkl'], "Found files %s" % str(os.listdir(self.dir))
+
+    def testRetention(self):
+        for background in [False, True]:
+            writer = CheckpointWriter(background=background, keep_last=2, keep_best=True)
+            paths = [os.path.join(self.dir, '%s_%d.pkl' % (background, i)) for i in range(5)]
+            for path, cost in zip(paths, [3., 1., 2., 4., 5.]):
+                writer.write(path, _write_text(path), cost=cost)
+            writer.wait()
+            # the last two and the best (lowest cost) checkpoints are kept
+            found = [os.path.exists(path) for path in paths]
+            assert found == [False, True, False, True, True], "Found checkpoints %s" % str(found)
+
+    def testBackgroundError(self):
+        writer = CheckpointWriter(background=True)
+        writer.write(os.path.join(self.dir, 'params.pkl'), _fail)
+        try:
+            writer.wait()
+            raise AssertionError("The failed background write wasn't raised.")
+        except IOError:
+            pass
+
+    def testSynchronousError(self):
+        # a failed write is logged and returned instead of raised, so later writes still happen
+        writer = CheckpointWriter(background=False)
+        assert not writer.write(os.path.join(self.dir, 'failed.pkl'), _fail)
+        path = os.path.join(self.dir, 'params.pkl')
+        assert writer.write(path, _write_text("params"))
+        assert os.listdir(self.dir) == ['params.pkl'], "Found files %s" % str(os.listdir(self.dir))
+        try:
+            writer.wait()
+            raise AssertionError("The failed write wasn't raised from wait().")
+        except IOError:
+            pass
+        # the failure is only reported once
+        writer.wait()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import numpy
+import theano
+import theano.tensor as T
+from opendeep.utils.constructors import compact_inputs, dataset_shared, device_shared
+
+
+class TestConstructors(unittest.TestCase):
+    def setUp(self):
+        self.x = T.matrix('x')
+        self.y = T.lvector('y')
+        self.pixels = numpy.asarray([[0, 51, 255], [102, 204, 153]], dtype='uint8')
+
+    def testCompactInputs(self):
+        inputs, givens = compact_inputs([self.x, self.y], ['uint8', None], [1 / 255., None], [-0.5, None])
+        # only the float input is replaced by a uint8 one, decoded through the givens
+        assert inputs[0].dtype == 'uint8' and inputs[0].ndim == 2
+        assert inputs[1] is self.y
+        assert list(givens.keys()) == [self.x]
+        f = theano.function(inputs, [self.x, self.y + 1], givens=givens)
+        x, y = f(self.pixels, numpy.asarray([1, 2]))
+        assert x.dtype == self.x.dtype
+        assert numpy.allclose(x, self.pixels / 255. - 0.5), "Decoded %s" % str(x)
+        assert numpy.array_equal(y, [2, 3])
+
+        # a single dtype applies to every input, and inputs already in the dtype without scaling are kept
+        inputs, givens = compact_inputs([self.x, T.bmatrix('b')], 'int8')
+        assert inputs[0].dtype == 'int8' and inputs[1].name == 'b'
+        assert len(givens) == 1
+        f = theano.function(inputs[:1], self.x, givens=givens)
+        assert numpy.array_equal(f(numpy.asarray([[-3, 4]], dtype='int8')), [[-3, 4]])
+
+    def testDeviceShared(self):
+        # device_shared keeps the dtype unless one is given
+        labels = device_shared(numpy.arange(4), name='labels')
+        assert labels.dtype == 'int64' and labels.name == 'labels'
+        pixels = device_shared(self.pixels, dtype=theano.config.floatX)
+        assert pixels.dtype == theano.config.floatX
+        assert numpy.array_equal(pixels.get_value(), self.pixels)
+        # dataset_shared still keeps the input's dtype
+        assert dataset_shared(self.pixels).dtype == 'uint8'
+
+    def testMismatchedStorage(self):
+        try:
+            compact_inputs([self.x, self.y], ['uint8'])
+            raise AssertionError("Was able to make compact inputs without a dtype for each input.")
+        except Exception as e:
+            assert isinstance(e, AssertionError) and "storage dtype" in str(e)
+
+
+if __name__ == '__main__':
+    unittest.main()
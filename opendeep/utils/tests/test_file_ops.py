@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from opendeep.utils.file_ops import file_cache_key, atomic_file, atomic_save_npy
+
+
+class TestFileOps(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def testFileCacheKey(self):
+        fname = os.path.join(self.dir, 'data.txt')
+        with open(fname, 'w') as f:
+            f.write("first")
+        key = file_cache_key([fname], 'option')
+        assert key == file_cache_key([fname], 'option')
+        assert key != file_cache_key([fname], 'other option')
+        # changing the file (and its size) changes the key
+        with open(fname, 'w') as f:
+            f.write("second")
+        assert key != file_cache_key([fname], 'option')
+
+    def testAtomicSaveNpy(self):
+        fname = os.path.join(self.dir, 'data.npy')
+        atomic_save_npy(fname, numpy.arange(5))
+        assert numpy.array_equal(numpy.load(fname), numpy.arange(5))
+        try:
+            with atomic_file(fname) as tmp_path:
+                # the temporary file keeps the extension so numpy doesn't add another one
+                numpy.save(tmp_path, numpy.zeros(3))
+                raise IOError("Failed in the middle of writing.")
+        except IOError:
+            pass
+        # the failed write should leave the old file untouched and no temporary files behind
+        assert numpy.array_equal(numpy.load(fname), numpy.arange(5))
+        assert os.listdir(self.dir) == ['data.npy'], "Found files %s" % str(os.listdir(self.dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
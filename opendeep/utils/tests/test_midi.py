@@ -0,0 +1,88 @@
+import unittest
+import io
+import struct
+import numpy
+from opendeep.utils.midi import midiread, midiwrite, piano_roll, roll_events
+from opendeep.utils.midi.MidiInFile import MidiInFile
+from opendeep.utils.midi.MidiOutStream import MidiOutStream
+
+
+def _track(events):
+    return b'MTrk' + struct.pack('>L', len(events)) + events
+
+# a format 1 file with 2 tracks and 96 ticks per quarter note
+_TEMPO_TRACK = _track(b'\x00\xff\x51\x03\x07\xa1\x20'     # tempo 500000 at tick 0
+                      b'\x81\x40\xff\x51\x03\x0f\x42\x40'  # tempo 1000000 at tick 192
+                      b'\x00\xff\x2f\x00')
+_NOTES_TRACK = _track(b'\x00\x90\x3c\x40'   # 60 on at tick 0
+                      b'\x00\x40\x40'       # 64 on at tick 0 (running status)
+                      b'\x60\x3c\x00'       # 60 off at tick 96 (note on with velocity 0)
+                      b'\x00\xc0\x05'       # patch change
+                      b'\x20\x80\x40\x00'   # 64 off at tick 128
+                      b'\x00\x90\x43\x40'   # 67 on at tick 128, never turned off
+                      b'\x00\xff\x2f\x00')
+_FILE = b'MThd' + struct.pack('>LHHH', 6, 1, 2, 96) + _TEMPO_TRACK + _NOTES_TRACK
+
+
+class _NoteRecorder(MidiOutStream):
+    """
+    Records the notes from the event callbacks.
+    """
+    def __init__(self):
+        MidiOutStream.__init__(self)
+        self.notes = []
+
+    def note_on(self, channel=0, note=0x40, velocity=0x40):
+        self.notes.append([note, self.abs_time(), -1, self.get_current_track(), -1])
+
+    def note_off(self, channel=0, note=0x40, velocity=0x40):
+        for n in reversed(self.notes):
+            if n[0] == note:
+                if n[2] == -1:
+                    n[2], n[4] = self.abs_time(), self.get_current_track()
+                break
+
+
+class TestMidi(unittest.TestCase):
+
+    def testReadNotes(self):
+        notes, tempos, division = MidiInFile(MidiOutStream(), io.BytesIO(_FILE)).readNotes()
+        assert division == 96
+        expected = numpy.asarray([[60, 0, 96, 1, 1],
+                                  [64, 0, 128, 1, 1],
+                                  [67, 128, -1, 1, -1]], dtype='int64')
+        assert numpy.array_equal(notes, expected), "Expected\n%s\nfound\n%s" % (str(expected), str(notes))
+        expected = numpy.asarray([[0, 500000, 0], [192, 1000000, 0]], dtype='int64')
+        assert numpy.array_equal(tempos, expected), "Expected\n%s\nfound\n%s" % (str(expected), str(tempos))
+
+        # the same notes as parsing with the event callbacks
+        recorder = _NoteRecorder()
+        MidiInFile(recorder, io.BytesIO(_FILE)).read()
+        assert numpy.array_equal(numpy.asarray(recorder.notes, dtype='int64'), notes)
+
+    def testPianoRoll(self):
+        roll = piano_roll(pitches=numpy.asarray([0, 2, 0, 1]), starts=numpy.asarray([0, 1, 1, 3]),
+                          ends=numpy.asarray([2, 3, 4, 4]), length=4, n_pitches=3)
+        expected = numpy.asarray([[1, 0, 0], [1, 0, 1], [1, 0, 1], [1, 1, 0]], dtype='float64')
+        assert numpy.array_equal(roll, expected), "Expected\n%s\nfound\n%s" % (str(expected), str(roll))
+
+        frames, pitches, ons = roll_events(expected)
+        # note offs come before the note ons in the same frame
+        assert frames.tolist() == [0, 1, 3, 3, 4, 4] and pitches.tolist() == [0, 2, 2, 1, 0, 1] and \
+            ons.tolist() == [True, True, False, True, False, False], str((frames, pitches, ons))
+
+    def testReadWrite(self):
+        roll = numpy.zeros((6, 88))
+        roll[0:3, 39] = 1
+        roll[2:6, 43] = 1
+        roll[4, 46] = 1
+        f = io.BytesIO()
+        midiwrite(f, roll, dt=0.5)
+        read = midiread(io.BytesIO(f.getvalue()), dt=0.5)
+        assert numpy.array_equal(read.piano_roll, roll), "Expected\n%s\nfound\n%s" % \
+                                                         (str(roll.nonzero()), str(read.piano_roll.nonzero()))
+        assert read.notes.shape == (3, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()